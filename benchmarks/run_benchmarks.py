@@ -0,0 +1,310 @@
+"""
+Benchmarks every simulation engine in the repository across food web size, horizon and ensemble size.
+
+Each case runs in its own Python process (engines from different versions share module names, and a
+fresh process gives a clean peak memory reading). Results are written as JSON so runs from different
+commits can be compared with --compare.
+
+Usage:
+    python benchmarks/run_benchmarks.py                       # default grid, writes benchmark_results.json
+    python benchmarks/run_benchmarks.py --engines v3_ensemble --species 11 1000 --steps 100
+    python benchmarks/run_benchmarks.py --compare old_results.json --output new_results.json
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# directory each engine lives in, the web size it is fixed to (if any), and the largest
+# species x steps x ensemble_size product it is run at by default
+ENGINES = {
+    'v1_scalar': {'directory': 'v1', 'fixed_species': 3, 'max_work': 3e6},
+    'v1_ensemble': {'directory': 'v1', 'fixed_species': 3, 'max_work': 3e9},
+    'v2_scalar': {'directory': 'v2', 'fixed_species': None, 'max_work': 3e6},
+    'v3_scalar': {'directory': 'v3', 'fixed_species': None, 'max_work': 3e7},
+    'v3_ensemble': {'directory': 'v3', 'fixed_species': None, 'max_work': 3e9},
+    'v3_numba': {'directory': 'v3', 'fixed_species': None, 'max_work': 3e9},
+}
+
+SPECIES_COUNTS = [3, 11, 100, 1000, 5000]
+TIME_STEPS = [100, 10_000, 1_000_000]
+ENSEMBLE_SIZES = [1, 100, 10_000, 100_000]
+
+# largest state (ensemble_size x species float64 values) a vectorized engine is asked to hold
+MAX_STATE_BYTES = 2e9
+
+
+def build_cases(engines, species_counts, time_steps, ensemble_sizes, work_scale=1.0):
+    """
+    Lists the benchmark cases to run, dropping combinations that are too large for an engine.
+
+    Parameters:
+    - engines: Engine names (keys of ENGINES).
+    - species_counts / time_steps / ensemble_sizes: Values to combine.
+    - work_scale: Multiplies every engine's 'max_work' limit.
+
+    Returns:
+    - List of case dictionaries with 'engine', 'species', 'time_steps' and 'ensemble_size'.
+    """
+    cases = []
+    for engine in engines:
+        fixed_species = ENGINES[engine]['fixed_species']
+        engine_species_counts = [fixed_species] if fixed_species else species_counts
+        for species, steps, ensemble_size in itertools.product(engine_species_counts, time_steps, ensemble_sizes):
+            if species * steps * ensemble_size > ENGINES[engine]['max_work'] * work_scale:
+                continue
+            if species * ensemble_size * 8 > MAX_STATE_BYTES:
+                continue
+            cases.append({'engine': engine, 'species': species, 'time_steps': steps, 'ensemble_size': ensemble_size})
+    return cases
+
+
+def prepare_case(case, working_directory):
+    """
+    Imports the engine for a case and builds its inputs, returning a function that runs the whole case.
+
+    Parameters:
+    - case: Case dictionary from build_cases.
+    - working_directory: Scratch directory for engines that write files.
+
+    Returns:
+    - Tuple of (run, skipped_reason): run is a zero-argument function, or None with a reason to skip.
+    """
+    engine, species, steps, ensemble_size = case['engine'], case['species'], case['time_steps'], case['ensemble_size']
+
+    if engine == 'v1_scalar':
+        from batchsims import run_simulation_with_gas_exchange
+        initial_conditions = {'slime_goop': 1, 'mushrooms': 1, 'cave_beetles': 1, 'CO2': 100, 'O2': 100}
+        growth_rates = {'slime_goop_growth_rate': 0.5, 'mushrooms_growth_rate': 0.5, 'cave_beetles_growth_rate': 0.5}
+
+        def run():
+            for _ in range(ensemble_size):
+                run_simulation_with_gas_exchange(steps, initial_conditions, growth_rates)
+        return run, None
+
+    if engine == 'v1_ensemble':
+        import numpy as np
+        from gas_ensemble import run_ensemble_with_gas_exchange
+        initial_populations = np.ones((ensemble_size, 3))
+        growth_rates = np.full((ensemble_size, 3), 0.5)
+        return lambda: run_ensemble_with_gas_exchange(steps, initial_populations, growth_rates), None
+
+    # every other engine runs a synthetic web of the requested size
+    from generate_web import generate_food_web
+    food_web = generate_food_web(species, time_steps=steps, seed=0)
+
+    if engine == 'v2_scalar':
+        from generate_web import save_food_web
+        from sim_web_v2 import load_and_simulate_food_web
+        file_path = os.path.join(working_directory, 'foodweb.json')
+        save_food_web(food_web, file_path)
+
+        def run():
+            # the v2 engine prints its results and writes a CSV next to the current directory each call
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(ensemble_size):
+                    load_and_simulate_food_web(file_path)
+        return run, None
+
+    if engine == 'v3_scalar':
+        from sim_foodweb import run_one_simulation
+
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(ensemble_size):
+                    run_one_simulation(food_web['species'], food_web['initial_resource_levels'],
+                                       food_web['simulation_parameters'])
+        return run, None
+
+    from compiled_web import compile_food_web
+    compiled_web = compile_food_web(food_web)
+
+    if engine == 'v3_ensemble':
+        import numpy as np
+        from ensemble import run_ensemble
+        populations = np.tile(compiled_web['initial_populations'], (ensemble_size, 1))
+        return lambda: run_ensemble(compiled_web, steps, populations), None
+
+    if engine == 'v3_numba':
+        from fast_kernel import NUMBA_AVAILABLE, run_fast_simulation
+        if not NUMBA_AVAILABLE:
+            return None, 'numba is not installed'
+        run_fast_simulation(compiled_web, 1)  # compile before timing
+
+        def run():
+            for _ in range(ensemble_size):
+                run_fast_simulation(compiled_web, steps)
+        return run, None
+
+    raise ValueError(f"unknown engine '{engine}'")
+
+
+def run_case(case):
+    """
+    Runs one benchmark case in the current process. Called in a fresh process by run_case_in_subprocess.
+
+    Parameters:
+    - case: Case dictionary from build_cases.
+
+    Returns:
+    - The case dictionary extended with 'elapsed_seconds', 'steps_per_second' (simulated steps across
+      the whole ensemble per second), 'per_run_latency_seconds', 'max_rss_bytes' and
+      'peak_memory_bytes' (growth of the resident set while the case ran), or with 'skipped'.
+    """
+    engine_directory = os.path.join(REPOSITORY_ROOT, ENGINES[case['engine']]['directory'])
+    sys.path[:0] = [engine_directory, os.path.join(REPOSITORY_ROOT, 'v3')]
+
+    with tempfile.TemporaryDirectory() as working_directory:
+        os.chdir(working_directory)
+        try:
+            run, skipped_reason = prepare_case(case, working_directory)
+        except ImportError as error:
+            run, skipped_reason = None, f"missing dependency: {error}"
+        if run is None:
+            return {**case, 'skipped': skipped_reason}
+
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        rss_unit = 1 if sys.platform == 'darwin' else 1024
+        baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * rss_unit
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * rss_unit
+
+    return {
+        **case,
+        'elapsed_seconds': elapsed,
+        'steps_per_second': case['time_steps'] * case['ensemble_size'] / elapsed,
+        'per_run_latency_seconds': elapsed / case['ensemble_size'],
+        'max_rss_bytes': max_rss,
+        'peak_memory_bytes': max_rss - baseline_rss,
+    }
+
+
+def run_case_in_subprocess(case, timeout):
+    """
+    Runs one benchmark case in a fresh Python process.
+
+    Parameters:
+    - case: Case dictionary from build_cases.
+    - timeout: Seconds before the case is abandoned.
+
+    Returns:
+    - The result dictionary from run_case, or the case with 'skipped' if it failed or timed out.
+    """
+    try:
+        completed = subprocess.run([sys.executable, os.path.abspath(__file__), '--case', json.dumps(case)],
+                                   capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {**case, 'skipped': f"timed out after {timeout} s"}
+    if completed.returncode != 0:
+        return {**case, 'skipped': completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'failed'}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def benchmark_metadata():
+    """
+    Describes the machine and code version a benchmark run used, so results can be compared fairly.
+
+    Returns:
+    - Dictionary with the time, git commit, Python, NumPy and platform versions.
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPOSITORY_ROOT, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'numpy': numpy_version,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+    }
+
+
+def case_key(result):
+    return (result['engine'], result['species'], result['time_steps'], result['ensemble_size'])
+
+
+def print_header(with_speedup=False):
+    print(f"{'engine':<12} {'species':>7} {'steps':>9} {'ensemble':>8} {'steps/s':>12} {'latency (s)':>12} "
+          f"{'peak MB':>8}" + (f" {'speedup':>8}" if with_speedup else ''))
+
+
+def print_result(result, baseline_result=None):
+    """
+    Prints one case, with the speedup over a baseline run of the same case when one is given.
+
+    Parameters:
+    - result: Result dictionary from run_case.
+    - baseline_result: Optional result dictionary for the same case from an earlier run.
+    """
+    line = f"{result['engine']:<12} {result['species']:>7} {result['time_steps']:>9} {result['ensemble_size']:>8} "
+    if 'skipped' in result:
+        print(line + f"skipped: {result['skipped']}")
+        return
+    line += (f"{result['steps_per_second']:>12.4g} {result['per_run_latency_seconds']:>12.4g} "
+             f"{result['peak_memory_bytes'] / 1e6:>8.1f}")
+    if baseline_result is not None and 'skipped' not in baseline_result:
+        line += f" {result['steps_per_second'] / baseline_result['steps_per_second']:>7.2f}x"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--engines', nargs='+', default=list(ENGINES), choices=list(ENGINES))
+    parser.add_argument('--species', nargs='+', type=int, default=SPECIES_COUNTS)
+    parser.add_argument('--steps', nargs='+', type=int, default=TIME_STEPS)
+    parser.add_argument('--ensembles', nargs='+', type=int, default=ENSEMBLE_SIZES)
+    parser.add_argument('--work-scale', type=float, default=1.0,
+                        help="multiply each engine's largest species x steps x ensemble product")
+    parser.add_argument('--timeout', type=float, default=600, help='seconds allowed per case')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help='earlier results file to report speedups against')
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+
+    if arguments.case:
+        print(json.dumps(run_case(json.loads(arguments.case))))
+        return
+
+    cases = build_cases(arguments.engines, arguments.species, arguments.steps, arguments.ensembles,
+                        arguments.work_scale)
+    results = []
+    print_header()
+    for case in cases:
+        results.append(run_case_in_subprocess(case, arguments.timeout))
+        print_result(results[-1])
+
+    with open(arguments.output, 'w') as file:
+        json.dump({'metadata': benchmark_metadata(), 'results': results}, file, indent=2)
+    print(f"\nResults written to {arguments.output}")
+
+    if arguments.compare:
+        with open(arguments.compare, 'r') as file:
+            baseline = {case_key(result): result for result in json.load(file)['results']}
+        print()
+        print_header(with_speedup=True)
+        for result in results:
+            print_result(result, baseline.get(case_key(result)))
+
+
+if __name__ == '__main__':
+    main()
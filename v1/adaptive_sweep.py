@@ -0,0 +1,182 @@
+import itertools
+
+import numpy as np
+
+from gas_ensemble import SPECIES_COLUMNS, run_ensemble_with_gas_exchange
+from sweep import gas_exchange_inputs
+
+# What a run ends up doing; outcome arrays hold indexes into this list
+OUTCOME_CLASSES = ['stable', 'oscillating', 'extinct', 'divergent']
+STABLE, OSCILLATING, EXTINCT, DIVERGENT = range(len(OUTCOME_CLASSES))
+# Phase map value for points inside a cell that was never resolved
+UNRESOLVED = -1
+
+DEFAULT_OUTCOME_CRITERIA = {
+    'tail_steps': 20,  # final steps that are looked at to classify a run
+    'stability_tolerance': 1e-6,  # largest relative change over the tail that counts as settled
+    'extinction_threshold': 1e-9,  # every species at or below this counts as died out
+    'overflow_threshold': 1e12,  # any population above this (or inf / nan) counts as exploded
+}
+
+
+def classify_outcomes(trajectories, criteria=None):
+    """
+    Classifies runs by what their populations do over the last steps.
+
+    Only the species columns are looked at: the gases keep drifting long after the populations
+    have settled, and never feed back into them.
+
+    Parameters:
+    - trajectories: (N, time_steps, 5) trajectories in ENSEMBLE_COLUMNS order.
+    - criteria: Optional dictionary of criteria (see DEFAULT_OUTCOME_CRITERIA; missing keys use the defaults).
+
+    Returns:
+    - An (N,) array of indexes into OUTCOME_CLASSES.
+    """
+    criteria = {**DEFAULT_OUTCOME_CRITERIA, **(criteria or {})}
+    tail = trajectories[:, -criteria['tail_steps']:, :len(SPECIES_COLUMNS)]
+    final_populations = tail[:, -1]
+
+    outcomes = np.full(len(trajectories), OSCILLATING)
+    with np.errstate(invalid='ignore'):
+        change = np.abs(tail - final_populations[:, None, :]) / np.maximum(np.abs(final_populations[:, None, :]), 1)
+    outcomes[np.all(change <= criteria['stability_tolerance'], axis=(1, 2))] = STABLE
+    outcomes[np.all(final_populations <= criteria['extinction_threshold'], axis=1)] = EXTINCT
+    outcomes[~np.all(tail <= criteria['overflow_threshold'], axis=(1, 2))] = DIVERGENT  # also catches nan
+    return outcomes
+
+
+def simulate_outcomes(parameters, simulation_count, time_steps, criteria=None):
+    """
+    Runs a batch of v1 gas exchange simulations and classifies them (see classify_outcomes).
+
+    Parameters:
+    - parameters: Dictionary of parameter name -> scalar or (simulation_count,) array
+      (see sweep.gas_exchange_inputs for the names).
+    - simulation_count: Number of simulations N.
+    - time_steps: Number of steps in each simulation.
+    - criteria: Optional outcome criteria.
+
+    Returns:
+    - An (N,) array of indexes into OUTCOME_CLASSES.
+    """
+    ensemble_results = run_ensemble_with_gas_exchange(time_steps, **gas_exchange_inputs(parameters, simulation_count),
+                                                      record_trajectories=True)
+    return classify_outcomes(ensemble_results['trajectories'], criteria)
+
+
+def run_adaptive_sweep(parameter_ranges, fixed_parameters=None, time_steps=100, initial_points=9, max_depth=4,
+                       criteria=None):
+    """
+    Maps outcome classes over a box of parameters, spending runs on the boundaries between classes.
+
+    The box starts as a coarse grid of initial_points values per axis. A cell whose corners
+    all end the same way is taken to be that class throughout; a cell whose corners disagree
+    is split in half along every axis and its new corners are simulated, down to max_depth
+    halvings. Each round simulates all of its new points as one ensemble.
+
+    Parameters:
+    - parameter_ranges: Dictionary of parameter name -> (low, high), e.g. {'growth_rate': (1.0, 3.5),
+      'slime_goop_initial': (1, 400)} (see sweep.gas_exchange_inputs for the names).
+    - fixed_parameters: Optional dictionary of parameter name -> value for the parameters not varied.
+    - time_steps: Number of steps in each simulation.
+    - initial_points: Points per axis of the coarse grid.
+    - max_depth: Number of times a cell can be halved. The finest grid has
+      (initial_points - 1) * 2**max_depth + 1 points per axis.
+    - criteria: Optional outcome criteria (see DEFAULT_OUTCOME_CRITERIA).
+
+    Returns:
+    - A dictionary with:
+      - 'parameter_names': names of the axes, in parameter_ranges order.
+      - 'axes': list of (resolution,) arrays, the values of the finest grid along each axis.
+      - 'coordinates': (M, axes) indexes into 'axes' of every simulated point.
+      - 'points': (M, axes) parameter values of every simulated point.
+      - 'outcomes': (M,) indexes into OUTCOME_CLASSES.
+      - 'cells': dictionary of 'lower' (C, axes) corner coordinates, 'size' (C,) and 'outcome'
+        (C,) of the cells refinement stopped at (UNRESOLVED where corners still disagree).
+    """
+    names = list(parameter_ranges)
+    dimension = len(names)
+    resolution = (initial_points - 1) * 2 ** max_depth + 1
+    axes = [np.linspace(low, high, resolution) for low, high in parameter_ranges.values()]
+    corner_offsets = np.array(list(itertools.product([0, 1], repeat=dimension)), dtype=np.int64)
+
+    outcomes = {}  # finest-grid coordinates -> outcome
+    size = 2 ** max_depth
+    cells = np.array(list(itertools.product(range(0, resolution - 1, size), repeat=dimension)), dtype=np.int64)
+    leaf_lower, leaf_size, leaf_outcome = [], [], []
+
+    while len(cells):
+        ## simulate the corners not seen yet
+        corners = cells[:, None, :] + corner_offsets * size
+        new_points = np.array([point for point in dict.fromkeys(map(tuple, corners.reshape(-1, dimension)))
+                               if point not in outcomes], dtype=np.int64).reshape(-1, dimension)
+        if len(new_points):
+            parameters = {**(fixed_parameters or {}),
+                          **{name: axis[new_points[:, j]] for j, (name, axis) in enumerate(zip(names, axes))}}
+            new_outcomes = simulate_outcomes(parameters, len(new_points), time_steps, criteria)
+            outcomes.update(zip(map(tuple, new_points), new_outcomes))
+
+        ## keep uniform cells, split the others
+        corner_outcomes = np.array([[outcomes[tuple(corner)] for corner in cell_corners] for cell_corners in corners])
+        uniform = np.all(corner_outcomes == corner_outcomes[:, :1], axis=1)
+        settled = uniform if size > 1 else np.ones(len(cells), dtype=bool)
+        leaf_lower.append(cells[settled])
+        leaf_size.append(np.full(settled.sum(), size))
+        leaf_outcome.append(np.where(uniform[settled], corner_outcomes[settled, 0], UNRESOLVED))
+
+        size //= 2
+        cells = (cells[~settled][:, None, :] + corner_offsets * size).reshape(-1, dimension)
+
+    coordinates = np.array(list(outcomes), dtype=np.int64).reshape(-1, dimension)
+    return {
+        'parameter_names': names,
+        'axes': axes,
+        'coordinates': coordinates,
+        'points': np.column_stack([axis[coordinates[:, j]] for j, axis in enumerate(axes)]),
+        'outcomes': np.array(list(outcomes.values()), dtype=np.int64),
+        'cells': {
+            'lower': np.concatenate(leaf_lower),
+            'size': np.concatenate(leaf_size),
+            'outcome': np.concatenate(leaf_outcome),
+        },
+    }
+
+
+def phase_map(adaptive_sweep):
+    """
+    Fills in the outcome at every point of the finest grid from an adaptive sweep: uniform cells
+    are painted with their class, and simulated points keep their own outcome.
+
+    Parameters:
+    - adaptive_sweep: Output of run_adaptive_sweep.
+
+    Returns:
+    - An integer array shaped like the finest grid (one axis per parameter) of indexes into
+      OUTCOME_CLASSES.
+    """
+    cells = adaptive_sweep['cells']
+    phases = np.full(tuple(len(axis) for axis in adaptive_sweep['axes']), UNRESOLVED)
+    for lower, size, outcome in zip(cells['lower'], cells['size'], cells['outcome']):
+        if outcome != UNRESOLVED:
+            phases[tuple(slice(start, start + size + 1) for start in lower)] = outcome
+    phases[tuple(adaptive_sweep['coordinates'].T)] = adaptive_sweep['outcomes']
+    return phases
+
+
+## TEST STATEMENTS WHEN I CALL THIS SCRIPT FROM COMMAND LINE
+if __name__ == '__main__':
+    adaptive_sweep = run_adaptive_sweep({'growth_rate': (1.0, 3.5), 'slime_goop_initial': (1, 400)},
+                                        fixed_parameters={'carrying_capacity': 100, 'mushrooms_initial': 0,
+                                                          'cave_beetles_initial': 0},
+                                        initial_points=9, max_depth=4)
+    phases = phase_map(adaptive_sweep)
+    print(f"{len(adaptive_sweep['outcomes'])} simulations for a {phases.shape[0]} x {phases.shape[1]} phase map "
+          f"({phases.size} points on a uniform grid)")
+    for outcome, count in zip(OUTCOME_CLASSES, np.bincount(phases.ravel(), minlength=len(OUTCOME_CLASSES))):
+        print(f"{outcome}: {count / phases.size:.1%} of the map")
+
+    # growth rate down the rows, initial slime goop across the columns
+    symbols = np.array(list('SOXD'))
+    for row in phases[::8, ::2]:
+        print(''.join(symbols[row]))
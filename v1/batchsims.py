@@ -1,6 +1,7 @@
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+
+from result_store import final_states_frame, run_sweep_to_store
 
 def run_simulation(time_steps, initial_conditions, growth_rates, carrying_capacities):
     """
@@ -87,86 +88,35 @@ def run_simulation_with_gas_exchange(time_steps, initial_conditions, growth_rate
 
 
 
-# Define ranges for initial populations and growth rates
-initial_populations_range = range(1, 11)
-growth_rates_range = np.arange(1.0, 2.6, 0.2)
-
-# Define a fixed carrying capacity for simplicity
-carrying_capacity_base = 100
-
-# Placeholder for simulation results
-simulation_results = []
-
-simulation_id = 1
-
-# Iterate over all combinations of initial conditions and growth rates
-for slime_goop_initial in initial_populations_range:
-    for mushrooms_initial in initial_populations_range:
-        for cave_beetles_initial in initial_populations_range:
-            for growth_rate in growth_rates_range:
-                # Define initial conditions and growth rates for this simulation
-                initial_conditions = {
-                    'slime_goop': slime_goop_initial,
-                    'mushrooms': mushrooms_initial,
-                    'cave_beetles': cave_beetles_initial,
-                    'CO2': 100,
-                    'O2': 100,
-                    'simulation_id': simulation_id
-                }
-                growth_rates = {
-                    'slime_goop_growth_rate': growth_rate,
-                    'mushrooms_growth_rate': growth_rate,
-                    'cave_beetles_growth_rate': growth_rate
-                }
-                carrying_capacities = {
-                    'slime_goop_capacity': carrying_capacity_base,
-                    'mushrooms_capacity': carrying_capacity_base,
-                    'cave_beetles_capacity': carrying_capacity_base
-                }
-                
-                # Run the simulation
-                df_result = run_simulation_with_gas_exchange(
-                    100,
-                    initial_conditions,
-                    growth_rates
-                )
-
-                simulation_id += 1
-                
-                # Record the results
-                final_population = df_result.iloc[-1].to_dict()
-                final_population.update({
-                    'slime_goop_initial': slime_goop_initial,
-                    'mushrooms_initial': mushrooms_initial,
-                    'cave_beetles_initial': cave_beetles_initial,
-                    'growth_rate': growth_rate
-                })
-                simulation_results.append(final_population)
-
-# Convert results to DataFrame for analysis
-df_simulation_results = pd.DataFrame(simulation_results)
-
-# Specify the filename
-filename = 'batch_simulation_data.csv'
-
-# Save the DataFrame to a CSV file
-df_simulation_results.to_csv(filename, index=False)
-
-print(f"Simulation data has been saved to '{filename}'.")
-
-
-
-
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-# Example scatter plot for slime goop final population vs initial population
-plt.figure(figsize=(10, 6))
-sns.scatterplot(x='slime_goop_initial', y='slime_goop', hue='growth_rate', data=df_simulation_results, palette='viridis')
-plt.title('Final Slime Goop Population vs Initial Population')
-plt.xlabel('Initial Slime Goop Population')
-plt.ylabel('Final Slime Goop Population')
-plt.legend(title='Growth Rate', bbox_to_anchor=(1.05, 1), loc='upper left')
-plt.tight_layout()
-plt.show()
-
+if __name__ == '__main__':
+    # Define ranges for initial populations and growth rates
+    initial_populations_range = range(1, 11)
+    growth_rates_range = np.arange(1.0, 2.6, 0.2)
+
+    # Run every combination of initial populations and growth rates, keeping each full trajectory
+    # in a memory-mapped store (simulation IDs count through the grid like nested loops would)
+    parameter_grid = {
+        'slime_goop_initial': initial_populations_range,
+        'mushrooms_initial': initial_populations_range,
+        'cave_beetles_initial': initial_populations_range,
+        'growth_rate': growth_rates_range,
+    }
+    store_path = 'batch_simulation.store'
+    store = run_sweep_to_store(parameter_grid, store_path, time_steps=100)
+    print(f"Simulation data has been saved to '{store_path}'.")
+
+    # Final state of every simulation, with its parameters
+    df_simulation_results = final_states_frame(store)
+
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    # Example scatter plot for slime goop final population vs initial population
+    plt.figure(figsize=(10, 6))
+    sns.scatterplot(x='slime_goop_initial', y='slime_goop', hue='growth_rate', data=df_simulation_results, palette='viridis')
+    plt.title('Final Slime Goop Population vs Initial Population')
+    plt.xlabel('Initial Slime Goop Population')
+    plt.ylabel('Final Slime Goop Population')
+    plt.legend(title='Growth Rate', bbox_to_anchor=(1.05, 1), loc='upper left')
+    plt.tight_layout()
+    plt.show()
@@ -0,0 +1,162 @@
+import numpy as np
+
+# Column order of the population blocks passed to and returned from the ensemble
+SPECIES_COLUMNS = ['slime_goop', 'mushrooms', 'cave_beetles']
+GAS_COLUMNS = ['CO2', 'O2']
+ENSEMBLE_COLUMNS = SPECIES_COLUMNS + GAS_COLUMNS
+
+SLIME_GOOP, MUSHROOMS, CAVE_BEETLES = range(len(SPECIES_COLUMNS))
+
+
+# Why a run stopped; stop_reasons arrays hold indexes into this list
+TERMINATION_REASONS = ['completed', 'converged', 'extinct', 'diverged']
+COMPLETED, CONVERGED, EXTINCT, DIVERGED = range(len(TERMINATION_REASONS))
+
+DEFAULT_TERMINATION_CRITERIA = {
+    'check_every': 5,  # steps between checks
+    'convergence_tolerance': 1e-6,  # largest relative change over one step that counts as settled
+    'extinction_threshold': 1e-9,  # every species at or below this counts as died out
+    'overflow_threshold': 1e12,  # any column above this (or inf / nan) counts as exploded
+}
+
+
+def check_termination(previous_states, states, criteria):
+    """
+    Classifies each row of an ensemble against the termination criteria.
+
+    Convergence compares consecutive steps, so a run cycling with a period that divides
+    check_every is not mistaken for a settled one.
+
+    Parameters:
+    - previous_states: (N, 5) states one step before, in ENSEMBLE_COLUMNS order.
+    - states: (N, 5) current states, in ENSEMBLE_COLUMNS order.
+    - criteria: Dictionary of termination criteria (see DEFAULT_TERMINATION_CRITERIA).
+
+    Returns:
+    - An (N,) array of indexes into TERMINATION_REASONS, COMPLETED meaning "keep running".
+    """
+    reasons = np.full(len(states), COMPLETED)
+    change = np.abs(states - previous_states) / np.maximum(np.abs(states), 1)
+    reasons[np.all(change <= criteria['convergence_tolerance'], axis=1)] = CONVERGED
+    reasons[np.all(states[:, :len(SPECIES_COLUMNS)] <= criteria['extinction_threshold'], axis=1)] = EXTINCT
+    reasons[~np.all(states <= criteria['overflow_threshold'], axis=1)] = DIVERGED  # also catches nan
+    return reasons
+
+
+def run_ensemble_with_gas_exchange(time_steps, initial_populations, growth_rates,
+                                   initial_co2=100, initial_o2=100, carrying_capacities=np.inf,
+                                   record_trajectories=False, termination_criteria=None):
+    """
+    Runs many copies of run_simulation_with_gas_exchange (batchsims.py) at once, stepping
+    every simulation in lockstep as rows of 2-D arrays.
+
+    Parameters:
+    - time_steps: Number of steps in each simulation (row 0 is the initial state, as in the scalar version).
+    - initial_populations: (N, 3) array of initial populations in SPECIES_COLUMNS order.
+    - growth_rates: (N, 3) array of growth rates in SPECIES_COLUMNS order.
+    - initial_co2: Initial CO2 level, a scalar or an (N,) array.
+    - initial_o2: Initial O2 level, a scalar or an (N,) array.
+    - carrying_capacities: Carrying capacities, a scalar or an array broadcastable to (N, 3).
+      Defaults to no limit, which is what the scalar version ends up using.
+    - record_trajectories: If True, also return every step instead of only the final one.
+    - termination_criteria: Optional dictionary of criteria (see DEFAULT_TERMINATION_CRITERIA; missing
+      keys use the defaults). Every 'check_every' steps, runs that have settled, died out or exploded
+      are stopped and dropped from the arrays being stepped. A stopped run keeps the state it had
+      when it stopped; in recorded trajectories that state is repeated for the remaining steps.
+
+    Returns:
+    - A dictionary with:
+      - 'states': (N, 5) final states in ENSEMBLE_COLUMNS order.
+      - 'stop_steps': (N,) step each run stopped at (time_steps - 1 for runs that went the distance).
+      - 'stop_reasons': (N,) indexes into TERMINATION_REASONS (all COMPLETED without criteria).
+      - 'trajectories': (N, time_steps, 5) full trajectories, only if record_trajectories is True.
+    """
+    populations = np.array(initial_populations, dtype=float)
+    growth_rates = np.asarray(growth_rates, dtype=float)
+    ensemble_size = populations.shape[0]
+    co2 = np.broadcast_to(np.asarray(initial_co2, dtype=float), (ensemble_size,)).copy()
+    o2 = np.broadcast_to(np.asarray(initial_o2, dtype=float), (ensemble_size,)).copy()
+    carrying_capacities = np.broadcast_to(np.asarray(carrying_capacities, dtype=float), populations.shape)
+
+    if record_trajectories:
+        trajectories = np.zeros((ensemble_size, time_steps, len(ENSEMBLE_COLUMNS)))
+        trajectories[:, 0, :len(SPECIES_COLUMNS)] = populations
+        trajectories[:, 0, len(SPECIES_COLUMNS)] = co2
+        trajectories[:, 0, len(SPECIES_COLUMNS) + 1] = o2
+
+    final_states = np.zeros((ensemble_size, len(ENSEMBLE_COLUMNS)))
+    stop_steps = np.full(ensemble_size, time_steps - 1)
+    stop_reasons = np.full(ensemble_size, COMPLETED)
+    active_rows = np.arange(ensemble_size)  # original row of each simulation still being stepped
+    if termination_criteria is not None:
+        criteria = {**DEFAULT_TERMINATION_CRITERIA, **termination_criteria}
+
+    for t in range(1, time_steps):
+        is_check = termination_criteria is not None and t % criteria['check_every'] == 0 and t < time_steps - 1
+        if is_check:
+            previous_states = np.column_stack([populations, co2, o2])
+
+        # Apply logistic growth formula, ensuring populations don't go negative
+        populations = np.maximum(populations + growth_rates * populations * (1 - populations / carrying_capacities), 0)
+
+        # Slime Goop consumes CO2 and produces O2, Mushrooms and Cave Beetles do the opposite
+        co2 += -0.1 * populations[:, SLIME_GOOP] + 0.05 * (populations[:, MUSHROOMS] + populations[:, CAVE_BEETLES])
+        o2 += 0.1 * populations[:, SLIME_GOOP] - 0.05 * (populations[:, MUSHROOMS] + populations[:, CAVE_BEETLES])
+        co2 = np.maximum(co2, 0)
+        o2 = np.maximum(o2, 0)
+
+        if record_trajectories:
+            trajectories[active_rows, t, :len(SPECIES_COLUMNS)] = populations
+            trajectories[active_rows, t, len(SPECIES_COLUMNS)] = co2
+            trajectories[active_rows, t, len(SPECIES_COLUMNS) + 1] = o2
+
+        if is_check:
+            states = np.column_stack([populations, co2, o2])
+            reasons = check_termination(previous_states, states, criteria)
+            stopped = reasons != COMPLETED
+            if stopped.any():
+                stopped_rows = active_rows[stopped]
+                final_states[stopped_rows] = states[stopped]
+                stop_steps[stopped_rows] = t
+                stop_reasons[stopped_rows] = reasons[stopped]
+                if record_trajectories:
+                    trajectories[stopped_rows, t + 1:] = states[stopped][:, None, :]
+
+                # Drop finished runs from the active set
+                running = ~stopped
+                active_rows = active_rows[running]
+                populations, growth_rates = populations[running], growth_rates[running]
+                co2, o2 = co2[running], o2[running]
+                carrying_capacities = carrying_capacities[running]
+                if len(active_rows) == 0:
+                    break
+
+    final_states[active_rows] = np.column_stack([populations, co2, o2])
+    ensemble_results = {'states': final_states, 'stop_steps': stop_steps, 'stop_reasons': stop_reasons}
+    if record_trajectories:
+        ensemble_results['trajectories'] = trajectories
+    return ensemble_results
+
+
+def build_parameter_grid(initial_populations_range, growth_rates_range):
+    """
+    Builds the full factorial grid used by batchsims.py, in the same order as its nested loops
+    (slime goop, then mushrooms, then cave beetles initial populations, then growth rate).
+
+    Parameters:
+    - initial_populations_range: Values to try for each species' initial population.
+    - growth_rates_range: Values to try for the shared growth rate.
+
+    Returns:
+    - Tuple of (initial_populations, growth_rates), each an (N, 3) array.
+    """
+    slime_goop, mushrooms, cave_beetles, growth_rate = np.meshgrid(
+        np.asarray(initial_populations_range, dtype=float),
+        np.asarray(initial_populations_range, dtype=float),
+        np.asarray(initial_populations_range, dtype=float),
+        np.asarray(growth_rates_range, dtype=float),
+        indexing='ij',
+    )
+    initial_populations = np.column_stack([slime_goop.ravel(), mushrooms.ravel(), cave_beetles.ravel()])
+    growth_rates = np.repeat(growth_rate.ravel()[:, None], len(SPECIES_COLUMNS), axis=1)
+    return initial_populations, growth_rates
@@ -1,12 +1,11 @@
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
 
-# Load your DataFrame here, assuming it's already loaded as df
-df = pd.read_csv('batch_simulation_data.csv')
+from result_store import load_trajectory, open_result_store
 
-# Assuming 'simulation_id' is a column used to distinguish between different simulations
-simulation_ids = df['simulation_id'].unique()
+# Open the sweep written by batchsims.py; only the trajectories we plot are read from disk
+store = open_result_store('batch_simulation.store')
+simulation_ids = np.arange(1, store['manifest']['simulation_count'] + 1)
 
 # Select 3 random simulations to visualize
 selected_ids = np.random.choice(simulation_ids, size=3, replace=False)
@@ -14,7 +13,7 @@ selected_ids = np.random.choice(simulation_ids, size=3, replace=False)
 plt.figure(figsize=(14, 8))
 
 for i, sim_id in enumerate(selected_ids, start=1):
-    sim_data = df[df['simulation_id'] == sim_id]
+    sim_data = load_trajectory(store, sim_id)
     
     # Ensuring we're plotting using DataFrame index correctly
     plt.subplot(3, 1, i)
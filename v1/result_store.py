@@ -0,0 +1,224 @@
+import json
+import numbers
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from gas_ensemble import ENSEMBLE_COLUMNS
+from sweep import check_parameter_names, grid_parameters, grid_shape, run_gas_exchange_chunk
+
+# Bump when the layout of a store directory changes
+STORE_FORMAT_VERSION = 1
+
+
+def grid_value_key(value):
+    """
+    Returns the key a grid value is indexed under: numbers are rounded to 10 decimals, so
+    1.5999999999999999 from np.arange(1.0, 2.6, 0.2) and a typed 1.6 find the same point, and other values
+    (e.g. strings) are used as they are.
+    """
+    if isinstance(value, numbers.Real) and not isinstance(value, bool):
+        return round(float(value), 10)
+    return value
+
+
+def create_result_store(store_path, parameter_grid, time_steps, columns=ENSEMBLE_COLUMNS):
+    """
+    Creates an empty on-disk store for the full trajectories of a parameter sweep.
+
+    A store is a directory with:
+    - manifest.json: the parameter grid, number of steps and column names.
+    - trajectories.npy: one (time_steps, columns) block per simulation, in simulation ID order.
+    - final_states.npy: the last step of every simulation, for plots over the whole sweep.
+
+    Both arrays are plain .npy files, so they are memory-mapped rather than read: looking up one
+    simulation reads only its own block, however many simulations the sweep has.
+
+    Parameters:
+    - store_path: Directory to create.
+    - parameter_grid: Dictionary of parameter name -> sequence of values (see sweep.grid_shape).
+      Simulation ID i (1-based, see sweep.grid_parameters) is stored in row i - 1.
+    - time_steps: Number of steps recorded per simulation.
+    - columns: Names of the recorded columns.
+
+    Returns:
+    - The store dictionary (see open_result_store), open for writing.
+
+    Raises:
+    - ValueError if a grid parameter has the name of a column.
+    """
+    check_parameter_names(parameter_grid, columns)
+    os.makedirs(store_path, exist_ok=True)
+    simulation_count = int(np.prod(grid_shape(parameter_grid)))
+    manifest = {
+        'format_version': STORE_FORMAT_VERSION,
+        'parameter_grid': {name: np.asarray(values).tolist() for name, values in parameter_grid.items()},
+        'time_steps': time_steps,
+        'columns': list(columns),
+        'simulation_count': simulation_count,
+    }
+    np.lib.format.open_memmap(os.path.join(store_path, 'trajectories.npy'), mode='w+',
+                              shape=(simulation_count, time_steps, len(columns)))
+    np.lib.format.open_memmap(os.path.join(store_path, 'final_states.npy'), mode='w+',
+                              shape=(simulation_count, len(columns)))
+    with open(os.path.join(store_path, 'manifest.json'), 'w') as file:
+        json.dump(manifest, file, indent=2)
+    return open_result_store(store_path, mode='r+')
+
+
+def open_result_store(store_path, mode='r'):
+    """
+    Opens a result store.
+
+    Parameters:
+    - store_path: Store directory.
+    - mode: 'r' to read, 'r+' to also write simulations into it.
+
+    Returns:
+    - A store dictionary with the 'manifest', the memory-mapped 'trajectories'
+      (simulations, time_steps, columns) and 'final_states' (simulations, columns), and
+      'value_index', which maps each parameter's values (as grid_value_key) to their position on its axis.
+    """
+    with open(os.path.join(store_path, 'manifest.json'), 'r') as file:
+        manifest = json.load(file)
+    if manifest.get('format_version') != STORE_FORMAT_VERSION:
+        raise ValueError(f"{store_path} was written by an incompatible version of result_store")
+    return {
+        'path': store_path,
+        'manifest': manifest,
+        'trajectories': np.load(os.path.join(store_path, 'trajectories.npy'), mmap_mode=mode),
+        'final_states': np.load(os.path.join(store_path, 'final_states.npy'), mmap_mode=mode),
+        'value_index': {name: {grid_value_key(value): i for i, value in enumerate(values)}
+                        for name, values in manifest['parameter_grid'].items()},
+    }
+
+
+def write_simulations(store, first_id, trajectories):
+    """
+    Writes the trajectories of consecutive simulations into a store opened for writing.
+
+    Parameters:
+    - store: Store dictionary from create_result_store or open_result_store(mode='r+').
+    - first_id: Simulation ID of the first trajectory.
+    - trajectories: (n, time_steps, columns) array.
+    """
+    rows = slice(first_id - 1, first_id - 1 + len(trajectories))
+    store['trajectories'][rows] = trajectories
+    store['final_states'][rows] = trajectories[:, -1, :]
+
+
+def lookup_simulation_id(store, **parameters):
+    """
+    Finds the simulation ID of one point of the grid.
+
+    Parameters:
+    - store: Store dictionary.
+    - parameters: One value per grid parameter, e.g. slime_goop_initial=3, ..., growth_rate=1.4.
+      Values must be on the grid; numbers are matched after rounding to 10 decimals (see
+      grid_value_key), so 1.6 finds 1.5999999999999999 from np.arange.
+
+    Returns:
+    - The simulation ID (row + 1).
+    """
+    coordinates = []
+    for name, index in store['value_index'].items():
+        if name not in parameters:
+            raise KeyError(f"missing grid parameter '{name}'")
+        value = parameters[name]
+        position = index.get(grid_value_key(value))
+        if position is None:
+            raise KeyError(f"{name}={value} is not on the grid")
+        coordinates.append(position)
+    return int(np.ravel_multi_index(coordinates, grid_shape(store['manifest']['parameter_grid']))) + 1
+
+
+def load_trajectory(store, simulation_id):
+    """
+    Returns one simulation's full trajectory, reading only its block from disk.
+
+    Parameters:
+    - store: Store dictionary.
+    - simulation_id: Simulation ID (1-based).
+
+    Returns:
+    - A (time_steps, columns) DataFrame, indexed by time step.
+    """
+    return pd.DataFrame(np.array(store['trajectories'][simulation_id - 1]), columns=store['manifest']['columns'])
+
+
+def final_states_frame(store):
+    """
+    Returns the final state of every simulation with its parameters, like the rows of the old
+    batch_simulation_data.csv.
+
+    Returns:
+    - A DataFrame with 'simulation_id', one column per grid parameter and the final state columns.
+    """
+    manifest = store['manifest']
+    simulation_ids = np.arange(1, manifest['simulation_count'] + 1)
+    df_final = pd.DataFrame({'simulation_id': simulation_ids,
+                             **grid_parameters(manifest['parameter_grid'], simulation_ids)})
+    final_states = np.asarray(store['final_states'])
+    for j, name in enumerate(manifest['columns']):
+        df_final[name] = final_states[:, j]
+    return df_final
+
+
+def store_gas_exchange_chunk(store_path, first_id, last_id):
+    """
+    Runs one chunk of a sweep with the v1 gas exchange ensemble and writes its trajectories
+    straight into the store, so workers never send trajectories back to the parent process.
+    """
+    store = open_result_store(store_path, mode='r+')
+    manifest = store['manifest']
+    trajectories = run_gas_exchange_chunk(manifest['parameter_grid'], first_id, last_id, manifest['time_steps'],
+                                          record_trajectories=True)
+    write_simulations(store, first_id, trajectories)
+    store['trajectories'].flush()
+    store['final_states'].flush()
+
+
+def run_sweep_to_store(parameter_grid, store_path, time_steps=100, chunk_size=1000, max_workers=None):
+    """
+    Runs every combination in a parameter grid and records full trajectories in a result store.
+
+    Parameters:
+    - parameter_grid: Dictionary of parameter name -> sequence of values (see sweep.grid_shape).
+    - store_path: Store directory to create (an existing store there is overwritten).
+    - time_steps: Number of steps in each simulation.
+    - chunk_size: Number of simulations handed to a worker at a time.
+    - max_workers: Number of worker processes. Defaults to the number of CPUs; 1 runs in-process.
+
+    Returns:
+    - The store dictionary, open for reading.
+    """
+    store = create_result_store(store_path, parameter_grid, time_steps)
+    simulation_count = store['manifest']['simulation_count']
+    del store  # flush the empty arrays before the workers open them
+    first_ids = list(range(1, simulation_count + 1, chunk_size))
+    last_ids = [min(first_id + chunk_size - 1, simulation_count) for first_id in first_ids]
+
+    if max_workers == 1 or len(first_ids) <= 1:
+        list(map(store_gas_exchange_chunk, [store_path] * len(first_ids), first_ids, last_ids))
+    else:
+        # Must be called from under `if __name__ == '__main__':` on platforms that spawn workers
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(store_gas_exchange_chunk, [store_path] * len(first_ids), first_ids, last_ids))
+
+    return open_result_store(store_path)
+
+
+## TEST STATEMENTS WHEN I CALL THIS SCRIPT FROM COMMAND LINE
+if __name__ == '__main__':
+    parameter_grid = {
+        'slime_goop_initial': range(1, 11),
+        'mushrooms_initial': range(1, 11),
+        'cave_beetles_initial': range(1, 11),
+        'growth_rate': np.arange(1.0, 2.6, 0.2),
+    }
+    store = run_sweep_to_store(parameter_grid, 'batch_simulation.store', chunk_size=500)
+    sim_id = lookup_simulation_id(store, slime_goop_initial=3, mushrooms_initial=5, cave_beetles_initial=7, growth_rate=1.4)
+    print(f"simulation {sim_id}:")
+    print(load_trajectory(store, sim_id).head())
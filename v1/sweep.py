@@ -0,0 +1,185 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from gas_ensemble import ENSEMBLE_COLUMNS, SPECIES_COLUMNS, run_ensemble_with_gas_exchange
+
+# Result columns of run_gas_exchange_chunk when it is given termination criteria
+TERMINATION_COLUMNS = ENSEMBLE_COLUMNS + ['stop_step', 'stop_reason']
+
+
+def grid_shape(parameter_grid):
+    """
+    Returns the number of values along each axis of a parameter grid.
+
+    Parameters:
+    - parameter_grid: Dictionary of parameter name -> sequence of values, e.g.
+      {'slime_goop_initial': range(1, 11), ..., 'growth_rate': np.arange(1.0, 2.6, 0.2)}.
+      Axes are iterated in dictionary order, the last axis changing fastest.
+
+    Returns:
+    - Tuple with the length of each axis.
+    """
+    return tuple(len(values) for values in parameter_grid.values())
+
+
+def grid_parameters(parameter_grid, simulation_ids):
+    """
+    Decodes simulation IDs back into the parameter values they stand for.
+
+    A simulation ID is 1 + the row-major index of its grid coordinates, so it only depends on
+    where the run sits in the grid and matches the counter used by batchsims.py's nested loops.
+
+    Parameters:
+    - parameter_grid: Dictionary of parameter name -> sequence of values.
+    - simulation_ids: Array of simulation IDs.
+
+    Returns:
+    - Dictionary of parameter name -> array of values, one entry per simulation ID.
+    """
+    coordinates = np.unravel_index(np.asarray(simulation_ids) - 1, grid_shape(parameter_grid))
+    return {name: np.asarray(values)[axis_coordinates]
+            for (name, values), axis_coordinates in zip(parameter_grid.items(), coordinates)}
+
+
+def check_parameter_names(parameter_grid, result_columns):
+    """
+    Makes sure no grid parameter would overwrite a result column (or 'simulation_id') in a
+    results frame.
+
+    Raises:
+    - ValueError naming the clashing parameters.
+    """
+    clashing = [name for name in parameter_grid if name in result_columns or name == 'simulation_id']
+    if clashing:
+        raise ValueError(f"grid parameters {clashing} have the names of result columns; "
+                         f"initial gas levels are 'CO2_initial' and 'O2_initial'")
+
+
+def gas_exchange_inputs(parameters, simulation_count):
+    """
+    Turns named sweep parameters into the inputs of run_ensemble_with_gas_exchange.
+
+    Recognised names are '<species>_initial' (default 1), 'growth_rate' shared by all species
+    (default 0) or '<species>_growth_rate', 'carrying_capacity' shared by all species (default
+    no limit) or '<species>_capacity', and 'CO2_initial' / 'O2_initial' gas levels (default 100).
+
+    Parameters:
+    - parameters: Dictionary of parameter name -> scalar or (simulation_count,) array.
+    - simulation_count: Number of simulations N.
+
+    Returns:
+    - Dictionary of keyword arguments: (N, 3) 'initial_populations', 'growth_rates' and
+      'carrying_capacities', and (N,) 'initial_co2' and 'initial_o2'.
+    """
+    def column(name, default):
+        return np.broadcast_to(np.asarray(parameters.get(name, default), dtype=float), (simulation_count,))
+
+    shared_growth_rate = column('growth_rate', 0)
+    shared_capacity = column('carrying_capacity', np.inf)
+    return {
+        'initial_populations': np.column_stack([column(f"{species}_initial", 1) for species in SPECIES_COLUMNS]),
+        'growth_rates': np.column_stack([column(f"{species}_growth_rate", shared_growth_rate)
+                                         for species in SPECIES_COLUMNS]),
+        'carrying_capacities': np.column_stack([column(f"{species}_capacity", shared_capacity)
+                                                for species in SPECIES_COLUMNS]),
+        'initial_co2': column('CO2_initial', 100),
+        'initial_o2': column('O2_initial', 100),
+    }
+
+
+def run_gas_exchange_chunk(parameter_grid, first_id, last_id, time_steps, termination_criteria=None,
+                           record_trajectories=False):
+    """
+    Runs one chunk of a sweep with the v1 gas exchange ensemble.
+
+    Each species takes its initial population from '<species>_initial' (default 1) and its
+    growth rate from '<species>_growth_rate', falling back to a shared 'growth_rate' (default 0).
+    'CO2_initial' and 'O2_initial' axes set the initial gas levels (default 100).
+
+    Parameters:
+    - parameter_grid: Dictionary of parameter name -> sequence of values.
+    - first_id: First simulation ID of the chunk.
+    - last_id: Last simulation ID of the chunk (inclusive).
+    - time_steps: Number of steps in each simulation.
+    - termination_criteria: Optional early termination criteria passed to the ensemble. Bind it with
+      functools.partial to use it as run_parameter_sweep's simulate_chunk.
+    - record_trajectories: If True, return every step rather than only the final state.
+
+    Returns:
+    - An array of final states in ENSEMBLE_COLUMNS order, one row per simulation ID, or in
+      TERMINATION_COLUMNS order (with the stop step and TERMINATION_REASONS index) if criteria are given.
+    - With record_trajectories, the (chunk, time_steps, 5) trajectories instead (runs stopped early
+      repeat their final state).
+    """
+    parameters = grid_parameters(parameter_grid, np.arange(first_id, last_id + 1))
+    ensemble_results = run_ensemble_with_gas_exchange(time_steps,
+                                                      **gas_exchange_inputs(parameters, last_id - first_id + 1),
+                                                      record_trajectories=record_trajectories,
+                                                      termination_criteria=termination_criteria)
+    if record_trajectories:
+        return ensemble_results['trajectories']
+    if termination_criteria is None:
+        return ensemble_results['states']
+    return np.column_stack([ensemble_results['states'], ensemble_results['stop_steps'],
+                            ensemble_results['stop_reasons']])
+
+
+def run_parameter_sweep(parameter_grid, time_steps=100, chunk_size=1000, max_workers=None,
+                        simulate_chunk=run_gas_exchange_chunk, result_columns=ENSEMBLE_COLUMNS):
+    """
+    Runs every combination in a parameter grid, spreading chunks of the grid over a process pool.
+
+    The grid is split into consecutive ranges of simulation IDs. Each worker decodes its IDs into
+    parameters itself, so only the grid description and two integers are sent to it. Results are
+    gathered in ID order regardless of which worker finishes first.
+
+    Parameters:
+    - parameter_grid: Dictionary of parameter name -> sequence of values (see grid_shape).
+    - time_steps: Number of steps in each simulation.
+    - chunk_size: Number of simulations handed to a worker at a time.
+    - max_workers: Number of worker processes. Defaults to the number of CPUs; 1 runs in-process.
+    - simulate_chunk: Module-level function (parameter_grid, first_id, last_id, time_steps) -> 2-D array.
+    - result_columns: Column names of the arrays returned by simulate_chunk.
+
+    Returns:
+    - A DataFrame with a 'simulation_id' column, one column per grid parameter and the result columns.
+
+    Raises:
+    - ValueError if a grid parameter has the name of a result column.
+    """
+    check_parameter_names(parameter_grid, result_columns)
+    simulation_count = int(np.prod(grid_shape(parameter_grid)))
+    first_ids = list(range(1, simulation_count + 1, chunk_size))
+    last_ids = [min(first_id + chunk_size - 1, simulation_count) for first_id in first_ids]
+    chunk_count = len(first_ids)
+
+    if max_workers == 1 or chunk_count <= 1:
+        chunk_results = list(map(simulate_chunk, [parameter_grid] * chunk_count, first_ids, last_ids,
+                                 [time_steps] * chunk_count))
+    else:
+        # Must be called from under `if __name__ == '__main__':` on platforms that spawn workers
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            chunk_results = list(executor.map(simulate_chunk, [parameter_grid] * chunk_count, first_ids, last_ids,
+                                              [time_steps] * chunk_count))
+
+    simulation_ids = np.arange(1, simulation_count + 1)
+    df_results = pd.DataFrame({'simulation_id': simulation_ids, **grid_parameters(parameter_grid, simulation_ids)})
+    results = np.concatenate(chunk_results) if chunk_results else np.zeros((0, len(result_columns)))
+    for j, name in enumerate(result_columns):
+        df_results[name] = results[:, j]
+
+    return df_results
+
+
+## TEST STATEMENTS WHEN I CALL THIS SCRIPT FROM COMMAND LINE
+if __name__ == '__main__':
+    parameter_grid = {
+        'slime_goop_initial': range(1, 11),
+        'mushrooms_initial': range(1, 11),
+        'cave_beetles_initial': range(1, 11),
+        'growth_rate': np.arange(1.0, 2.6, 0.2),
+    }
+    df_sweep = run_parameter_sweep(parameter_grid, chunk_size=500)
+    print(df_sweep.tail())
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The v1 modules import each other by name, as when a script is run from this directory
+VERSION_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, VERSION_DIRECTORY)
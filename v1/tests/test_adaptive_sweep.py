@@ -0,0 +1,43 @@
+import numpy as np
+
+from adaptive_sweep import (DIVERGENT, EXTINCT, OSCILLATING, STABLE, UNRESOLVED, classify_outcomes, phase_map,
+                            run_adaptive_sweep, simulate_outcomes)
+
+RANGES = {'growth_rate': (1.0, 3.5), 'slime_goop_initial': (1, 400)}
+FIXED = {'carrying_capacity': 100, 'mushrooms_initial': 0, 'cave_beetles_initial': 0}
+
+
+def test_classify_outcomes():
+    steps = np.arange(30)[None, :, None]
+    trajectories = np.concatenate([
+        np.full((1, 30, 5), 7.0),
+        np.where(steps % 2 == 0, 5.0, 9.0) * np.ones((1, 30, 5)),
+        np.concatenate([np.zeros((1, 30, 3)), np.full((1, 30, 2), 50.0)], axis=2),
+        np.full((1, 30, 5), np.nan),
+        10.0 ** (steps / 2) * np.ones((1, 30, 5)),
+    ])
+    np.testing.assert_array_equal(classify_outcomes(trajectories), [STABLE, OSCILLATING, EXTINCT, DIVERGENT, DIVERGENT])
+
+
+def test_phase_map_matches_uniform_grid():
+    adaptive_sweep = run_adaptive_sweep(RANGES, fixed_parameters=FIXED, initial_points=5, max_depth=2)
+    phases = phase_map(adaptive_sweep)
+    assert phases.shape == (17, 17)
+    assert len(adaptive_sweep['outcomes']) < phases.size / 2
+
+    growth_rate, slime_goop_initial = np.meshgrid(*adaptive_sweep['axes'], indexing='ij')
+    brute_force = simulate_outcomes({**FIXED, 'growth_rate': growth_rate.ravel(),
+                                     'slime_goop_initial': slime_goop_initial.ravel()}, phases.size, 100)
+    assert not np.any(phases == UNRESOLVED)
+    np.testing.assert_array_equal(phases, brute_force.reshape(phases.shape))
+    assert len(np.unique(phases)) > 1  # the map has boundaries to refine
+
+
+def test_simulated_points_are_unique_and_on_the_grid():
+    adaptive_sweep = run_adaptive_sweep(RANGES, fixed_parameters=FIXED, initial_points=3, max_depth=3)
+    coordinates = adaptive_sweep['coordinates']
+    assert len(np.unique(coordinates, axis=0)) == len(coordinates)
+    np.testing.assert_array_equal(adaptive_sweep['points'][:, 0], adaptive_sweep['axes'][0][coordinates[:, 0]])
+    # the coarse grid is always simulated
+    coarse = set(map(tuple, coordinates[np.all(coordinates % 8 == 0, axis=1)]))
+    assert coarse == {(i, j) for i in range(0, 17, 8) for j in range(0, 17, 8)}
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from batchsims import run_simulation_with_gas_exchange
+from gas_ensemble import (CONVERGED, COMPLETED, DEFAULT_TERMINATION_CRITERIA, DIVERGED, ENSEMBLE_COLUMNS, EXTINCT,
+                      SPECIES_COLUMNS, build_parameter_grid, check_termination, run_ensemble_with_gas_exchange)
+
+
+def test_consecutive_steps_of_a_cycle_are_not_converged():
+    # a period-5 cycle sampled 5 steps apart looks settled; consecutive steps do not
+    cycle = np.array([[1.0, 2, 3, 4, 5], [2, 3, 4, 5, 1], [3, 4, 5, 1, 2], [4, 5, 1, 2, 3], [5, 1, 2, 3, 4]])
+    reasons = check_termination(cycle[[4]], cycle[[0]], DEFAULT_TERMINATION_CRITERIA)
+    assert reasons[0] == COMPLETED
+
+
+def test_check_termination_reasons():
+    previous = np.array([[1.0, 1, 1, 50, 50], [1e-12, 0, 0, 50, 50], [1, 1, 1, 50, 50], [1, 1, 1, 50, 50]])
+    states = np.array([[1.0, 1, 1, 50, 50], [0, 0, 0, 50, 50], [2e12, 1, 1, 50, 50], [2, 1, 1, 50, 50]])
+    reasons = check_termination(previous, states, DEFAULT_TERMINATION_CRITERIA)
+    assert list(reasons) == [CONVERGED, EXTINCT, DIVERGED, COMPLETED]
+
+
+@pytest.mark.parametrize('record_trajectories', [False, True])
+@pytest.mark.parametrize('termination_criteria', [None, {}])
+def test_one_return_shape(record_trajectories, termination_criteria):
+    initial_populations, growth_rates = build_parameter_grid([0, 1, 5], [0.5, 2.0])
+    results = run_ensemble_with_gas_exchange(50, initial_populations, growth_rates,
+                                             record_trajectories=record_trajectories,
+                                             termination_criteria=termination_criteria)
+    assert results['states'].shape == (len(initial_populations), 5)
+    assert results['stop_steps'].shape == results['stop_reasons'].shape == (len(initial_populations),)
+    assert ('trajectories' in results) == record_trajectories
+    if record_trajectories:
+        np.testing.assert_array_equal(results['trajectories'][:, -1], results['states'])
+
+
+def test_early_termination_keeps_final_states():
+    initial_populations, growth_rates = build_parameter_grid([0, 1, 5], [0.5, 2.0])
+    full = run_ensemble_with_gas_exchange(200, initial_populations, growth_rates)
+    stopped = run_ensemble_with_gas_exchange(200, initial_populations, growth_rates, termination_criteria={})
+    assert np.all(full['stop_reasons'] == COMPLETED)
+    assert np.any(stopped['stop_reasons'] != COMPLETED)
+    finished = stopped['stop_reasons'] == COMPLETED
+    np.testing.assert_array_equal(stopped['states'][finished], full['states'][finished])
+    extinct = stopped['stop_reasons'] == EXTINCT
+    assert np.all(stopped['states'][extinct, :3] == 0)
+
+
+def test_ensemble_matches_scalar_simulations():
+    initial_populations, growth_rates = build_parameter_grid([0, 1, 7], [1.0, 1.8])
+    results = run_ensemble_with_gas_exchange(30, initial_populations, growth_rates, initial_co2=80, initial_o2=120,
+                                             record_trajectories=True)
+    for row, (populations, rates) in enumerate(zip(initial_populations, growth_rates)):
+        initial_conditions = {**dict(zip(SPECIES_COLUMNS, populations)), 'CO2': 80, 'O2': 120}
+        scalar_rates = {f"{species}_growth_rate": rate for species, rate in zip(SPECIES_COLUMNS, rates)}
+        df_scalar = run_simulation_with_gas_exchange(30, initial_conditions, scalar_rates)
+        np.testing.assert_allclose(results['trajectories'][row], df_scalar[ENSEMBLE_COLUMNS].to_numpy(), rtol=1e-12)
+
+
+def test_parameter_grid_follows_nested_loops():
+    initial_populations, growth_rates = build_parameter_grid(range(1, 4), [1.0, 1.2])
+    expected = [(slime_goop, mushrooms, cave_beetles, growth_rate)
+                for slime_goop in range(1, 4) for mushrooms in range(1, 4) for cave_beetles in range(1, 4)
+                for growth_rate in [1.0, 1.2]]
+    np.testing.assert_array_equal(np.column_stack([initial_populations, growth_rates[:, 0]]), expected)
+    assert np.all(growth_rates == growth_rates[:, :1])
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from gas_ensemble import ENSEMBLE_COLUMNS
+from result_store import (final_states_frame, load_trajectory, lookup_simulation_id, open_result_store,
+                          run_sweep_to_store)
+from sweep import run_gas_exchange_chunk, run_parameter_sweep
+
+GRID = {
+    'slime_goop_initial': [1, 5],
+    'mushrooms_initial': [1, 2, 3],
+    'growth_rate': np.arange(0.1, 0.35, 0.1),  # 0.1, 0.2, 0.30000000000000004
+}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return run_sweep_to_store(GRID, str(tmp_path / 'sweep.store'), time_steps=10, chunk_size=5, max_workers=1)
+
+
+def test_lookup_rounds_grid_values(store):
+    assert GRID['growth_rate'][2] != 0.3
+    assert lookup_simulation_id(store, slime_goop_initial=1, mushrooms_initial=1, growth_rate=0.1) == 1
+    assert lookup_simulation_id(store, slime_goop_initial=5, mushrooms_initial=3, growth_rate=0.3) == 18
+    assert lookup_simulation_id(store, slime_goop_initial=5.0, mushrooms_initial=np.int64(2),
+                                growth_rate=GRID['growth_rate'][1]) == 14
+
+
+@pytest.mark.parametrize('value', [1.3, 'fast', None])
+def test_lookup_of_value_off_the_grid(store, value):
+    with pytest.raises(KeyError, match='not on the grid'):
+        lookup_simulation_id(store, slime_goop_initial=1, mushrooms_initial=1, growth_rate=value)
+
+
+def test_lookup_of_missing_parameter(store):
+    with pytest.raises(KeyError, match='missing grid parameter'):
+        lookup_simulation_id(store, slime_goop_initial=1, mushrooms_initial=1)
+
+
+def test_store_matches_direct_runs(store):
+    reopened = open_result_store(store['path'])
+    trajectories = run_gas_exchange_chunk(GRID, 1, 18, 10, record_trajectories=True)
+    np.testing.assert_array_equal(reopened['trajectories'], trajectories)
+    np.testing.assert_array_equal(load_trajectory(reopened, 14).to_numpy(), trajectories[13])
+
+    df_final = final_states_frame(reopened)
+    df_sweep = run_parameter_sweep(GRID, time_steps=10, max_workers=1)
+    np.testing.assert_array_equal(df_final[['simulation_id', *GRID, *ENSEMBLE_COLUMNS]].to_numpy(), df_sweep.to_numpy())
@@ -0,0 +1,48 @@
+import functools
+
+import numpy as np
+import pytest
+
+from gas_ensemble import ENSEMBLE_COLUMNS
+from sweep import TERMINATION_COLUMNS, grid_parameters, grid_shape, run_gas_exchange_chunk, run_parameter_sweep
+
+GRID = {
+    'slime_goop_initial': [1, 5],
+    'mushrooms_initial': [1, 2, 3],
+    'growth_rate': np.arange(1.0, 1.5, 0.2),
+    'CO2_initial': [50, 100],
+}
+
+
+def test_grid_parameters_decode_ids_in_nested_loop_order():
+    assert grid_shape(GRID) == (2, 3, 3, 2)
+    parameters = grid_parameters(GRID, np.array([1, 2, 36]))
+    assert list(parameters['slime_goop_initial']) == [1, 1, 5]
+    assert list(parameters['CO2_initial']) == [50, 100, 100]
+
+
+def test_gas_axes_do_not_collide_with_result_columns():
+    df_sweep = run_parameter_sweep(GRID, time_steps=10, chunk_size=7, max_workers=1)
+    assert list(df_sweep.columns) == ['simulation_id', *GRID, *ENSEMBLE_COLUMNS]
+    assert len(df_sweep) == 36
+    # the initial CO2 level is kept next to the final one
+    assert set(df_sweep['CO2_initial']) == {50, 100}
+
+
+def test_clashing_parameter_names_are_rejected():
+    with pytest.raises(ValueError):
+        run_parameter_sweep({'CO2': [50, 100]}, time_steps=10, max_workers=1)
+
+
+def test_chunking_and_workers_do_not_change_results():
+    single = run_parameter_sweep(GRID, time_steps=20, chunk_size=1000, max_workers=1)
+    pooled = run_parameter_sweep(GRID, time_steps=20, chunk_size=5, max_workers=2)
+    np.testing.assert_array_equal(single.to_numpy(), pooled.to_numpy())
+
+
+def test_chunk_with_termination_columns():
+    simulate_chunk = functools.partial(run_gas_exchange_chunk, termination_criteria={})
+    df_sweep = run_parameter_sweep(GRID, time_steps=50, max_workers=1, simulate_chunk=simulate_chunk,
+                                   result_columns=TERMINATION_COLUMNS)
+    assert set(df_sweep['stop_reason']) <= {0, 1, 2, 3}
+    assert df_sweep['stop_step'].max() <= 49
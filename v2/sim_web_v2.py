@@ -65,15 +65,13 @@ def load_and_simulate_food_web(file_path):
     return results
 
 # Example usage
-file_path = 'foodweb.json'
-results = load_and_simulate_food_web(file_path)
+if __name__ == '__main__':
+    file_path = 'foodweb.json'
+    results = load_and_simulate_food_web(file_path)
 
 
 
-import copy
-import random
-
-def tweak_species_info(species_info, growth_rate_delta=0.1, population_delta=10):
+def tweak_species_info(species_info, growth_rate_delta=0.1, population_delta=10, rng=None):
     """
     Creates a copy of the species info and tweaks growth rates and initial populations.
     
@@ -81,22 +79,27 @@ def tweak_species_info(species_info, growth_rate_delta=0.1, population_delta=10)
     - species_info: List of dictionaries, each containing species data.
     - growth_rate_delta: Maximum change to apply to the growth rate.
     - population_delta: Maximum change to apply to the initial population.
+    - rng: Optional np.random.Generator to draw from, e.g. np.random.default_rng(seed) for
+      reproducible tweaks. Defaults to a freshly seeded one.
     
     Returns:
-    - A new list of species info with tweaked values.
+    - A new list of species info with tweaked values. The input list is not modified.
     """
-    tweaked_species_info = copy.deepcopy(species_info)  # Make a deep copy to avoid altering the original list
-    
-    for species in tweaked_species_info:
-        # Apply a random adjustment within +/- the delta for the growth rate
-        growth_rate_adjustment = random.uniform(-growth_rate_delta, growth_rate_delta)
-        species['growth_rate'] = max(1, species['growth_rate'] + growth_rate_adjustment)  # Ensure growth rate stays at least 1
-        
-        # Apply a random adjustment within +/- the delta for the initial population
-        population_adjustment = random.randint(-population_delta, population_delta)
-        species['initial_population'] = max(1, species['initial_population'] + population_adjustment)  # Ensure population stays positive
-    
-    return tweaked_species_info
+    if rng is None:
+        rng = np.random.default_rng()
+
+    # Draw the adjustments for every species at once, within +/- the deltas
+    growth_rates = np.array([species['growth_rate'] for species in species_info], dtype=float)
+    initial_populations = np.array([species['initial_population'] for species in species_info])
+    growth_rate_adjustments = rng.uniform(-growth_rate_delta, growth_rate_delta, len(species_info))
+    population_adjustments = rng.integers(-population_delta, population_delta, len(species_info), endpoint=True)
+
+    # Ensure growth rates stay at least 1 and populations stay positive
+    growth_rates = np.maximum(1, growth_rates + growth_rate_adjustments).tolist()
+    initial_populations = np.maximum(1, initial_populations + population_adjustments).tolist()
+
+    return [{**species, 'growth_rate': growth_rate, 'initial_population': initial_population}
+            for species, growth_rate, initial_population in zip(species_info, growth_rates, initial_populations)]
 
 def evaluate_stability(species_populations):
     """
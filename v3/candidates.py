@@ -0,0 +1,135 @@
+import numpy as np
+
+from compiled_web import load_compiled_food_web
+
+# Candidates drawn from one random stream; a worker generates whole blocks on its own
+DEFAULT_BLOCK_SIZE = 1024
+
+
+def child_sequence(seed_sequence, index):
+    """
+    Returns the index-th child of seed_sequence, exactly as seed_sequence.spawn() would hand out, but
+    without spawning the ones before it. Any process that knows the root entropy can rebuild any child.
+
+    Parameters:
+    - seed_sequence: Root np.random.SeedSequence.
+    - index: Index of the child.
+
+    Returns:
+    - An np.random.SeedSequence.
+    """
+    return np.random.SeedSequence(seed_sequence.entropy, spawn_key=seed_sequence.spawn_key + (index,))
+
+
+def block_rng(seed_sequence, block_index):
+    """
+    Returns the random stream of one block of candidates: the block_index-th child of seed_sequence.
+
+    Parameters:
+    - seed_sequence: Root np.random.SeedSequence.
+    - block_index: Index of the block.
+
+    Returns:
+    - An np.random.Generator.
+    """
+    return np.random.default_rng(child_sequence(seed_sequence, block_index))
+
+
+def tweak_parameters(growth_rates, initial_populations, candidate_count, rng, growth_rate_delta=0.1,
+                     population_delta=10):
+    """
+    Draws candidates around a set of parameters, like v2's tweak_species_info but for a whole block
+    at once: growth rates move by a uniform amount in [-growth_rate_delta, growth_rate_delta] and
+    initial populations by a whole number in [-population_delta, population_delta], both clamped
+    to at least 1. Either delta may also be a (species,) array of per-species step sizes; population
+    steps are rounded down to whole numbers.
+
+    Parameters:
+    - growth_rates: (species,) growth rates to tweak.
+    - initial_populations: (species,) initial populations to tweak.
+    - candidate_count: Number of candidates N.
+    - rng: np.random.Generator to draw from.
+    - growth_rate_delta: Largest change to a growth rate.
+    - population_delta: Largest change to an initial population.
+
+    Returns:
+    - Tuple of (growth_rates, initial_populations), each (N, species).
+    """
+    shape = (candidate_count, len(growth_rates))
+    population_delta = np.floor(population_delta).astype(np.int64)
+    tweaked_growth_rates = np.maximum(1, growth_rates + rng.uniform(-growth_rate_delta, growth_rate_delta, shape))
+    tweaked_populations = np.maximum(1, initial_populations + rng.integers(-population_delta, population_delta, shape,
+                                                                           endpoint=True))
+    return tweaked_growth_rates, tweaked_populations
+
+
+def candidate_block(growth_rates, initial_populations, seed_sequence, block_index, candidate_count,
+                    block_size=DEFAULT_BLOCK_SIZE, growth_rate_delta=0.1, population_delta=10):
+    """
+    Generates one block of generate_candidates' output on its own, e.g. inside a worker process.
+
+    Parameters:
+    - growth_rates / initial_populations: (species,) parameters to tweak.
+    - seed_sequence: Root np.random.SeedSequence shared by all blocks.
+    - block_index: Which block to generate.
+    - candidate_count: Total number of candidates (the last block may be short).
+    - block_size: Candidates per block.
+    - growth_rate_delta / population_delta: See tweak_parameters.
+
+    Returns:
+    - Tuple of (growth_rates, initial_populations) for candidates block_index * block_size onwards.
+    """
+    block_count = min(block_size, candidate_count - block_index * block_size)
+    return tweak_parameters(growth_rates, initial_populations, block_count, block_rng(seed_sequence, block_index),
+                            growth_rate_delta, population_delta)
+
+
+def generate_candidates(compiled_web, candidate_count, seed=None, block_size=DEFAULT_BLOCK_SIZE,
+                        growth_rate_delta=0.1, population_delta=10, growth_rates=None, initial_populations=None):
+    """
+    Generates tweaked candidates of a food web's parameters, reproducibly.
+
+    Candidates are drawn in blocks of block_size, each from its own stream spawned from the seed, so
+    the candidates only depend on the seed and the block size: workers that each generate a share of
+    the blocks with candidate_block get exactly the same candidates as one process would.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - candidate_count: Number of candidates N.
+    - seed: Seed (an int or np.random.SeedSequence). Without one, every call draws fresh candidates.
+    - block_size: Candidates per random stream.
+    - growth_rate_delta / population_delta: See tweak_parameters.
+    - growth_rates / initial_populations: Optional (species,) parameters to tweak. Default to the
+      compiled ones.
+
+    Returns:
+    - Tuple of (growth_rates, initial_populations), each (N, species).
+    """
+    if growth_rates is None:
+        growth_rates = compiled_web['growth_rates']
+    if initial_populations is None:
+        initial_populations = compiled_web['initial_populations']
+    seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+
+    blocks = [candidate_block(growth_rates, initial_populations, seed_sequence, block_index, candidate_count,
+                              block_size, growth_rate_delta, population_delta)
+              for block_index in range(-(-candidate_count // block_size))]
+    if not blocks:
+        species_count = len(growth_rates)
+        return np.zeros((0, species_count)), np.zeros((0, species_count))
+    return np.concatenate([block[0] for block in blocks]), np.concatenate([block[1] for block in blocks])
+
+
+## TEST STATEMENTS WHEN I CALL THIS SCRIPT FROM COMMAND LINE
+if __name__ == '__main__':
+    import time
+
+    compiled_web = load_compiled_food_web('food_web.json')
+    start = time.perf_counter()
+    growth_rates, initial_populations = generate_candidates(compiled_web, 100_000, seed=42)
+    print(f"{len(growth_rates)} candidates in {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+    # a worker that only generates block 3 gets the same rows
+    block_growth_rates, _ = candidate_block(compiled_web['growth_rates'], compiled_web['initial_populations'],
+                                            np.random.SeedSequence(42), 3, 100_000)
+    print("block 3 reproduced:", np.array_equal(block_growth_rates, growth_rates[3 * DEFAULT_BLOCK_SIZE:4 * DEFAULT_BLOCK_SIZE]))
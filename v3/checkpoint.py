@@ -0,0 +1,167 @@
+import copy
+import hashlib
+import io
+import json
+
+import numpy as np
+
+from compiled_web import apply_step, initial_state, load_compiled_food_web
+
+
+def snapshot_state(state):
+    """
+    Takes an independent copy of an engine state, so the original can keep running.
+
+    Parameters:
+    - state: State dictionary with 'populations', 'resources', 'step' and optionally 'rng_state'.
+
+    Returns:
+    - A copy of the state that shares no arrays with the original.
+    """
+    return copy.deepcopy(state)
+
+
+def serialize_state(state):
+    """
+    Packs an engine state into compact bytes.
+
+    Parameters:
+    - state: State dictionary with 'populations', 'resources', 'step' and optionally 'rng_state'.
+
+    Returns:
+    - Bytes holding a compressed .npz archive of the state.
+    """
+    buffer = io.BytesIO()
+    np.savez_compressed(
+        buffer,
+        populations=state['populations'],
+        resources=state['resources'],
+        step=np.array(state['step']),
+        rng_state=np.array(json.dumps(state.get('rng_state'))),
+    )
+    return buffer.getvalue()
+
+
+def deserialize_state(data):
+    """
+    Unpacks bytes written by serialize_state.
+
+    Parameters:
+    - data: Bytes from serialize_state.
+
+    Returns:
+    - The state dictionary.
+    """
+    with np.load(io.BytesIO(data)) as archive:
+        state = {
+            'populations': archive['populations'],
+            'resources': archive['resources'],
+            'step': int(archive['step']),
+        }
+        rng_state = json.loads(str(archive['rng_state']))
+    if rng_state is not None:
+        state['rng_state'] = rng_state
+    return state
+
+
+def branch_rng_states(rng_state, branch_count):
+    """
+    Derives one independent random stream per branch from a state's 'rng_state'.
+
+    The branches' streams are the children np.random.SeedSequence.spawn hands out for a seed taken
+    from the parent's bit generator state, so the same checkpoint always forks into the same
+    streams, and no two branches (nor a branch and the parent) draw the same numbers.
+
+    Parameters:
+    - rng_state: Bit generator state, as in initial_state's 'rng_state'.
+    - branch_count: Number of branches.
+
+    Returns:
+    - A list of branch_count bit generator states of the same kind.
+    """
+    bit_generator = getattr(np.random, rng_state['bit_generator'])
+    entropy = int.from_bytes(hashlib.sha256(json.dumps(rng_state, sort_keys=True).encode()).digest(), 'big')
+    return [bit_generator(seed_sequence).state for seed_sequence in np.random.SeedSequence(entropy).spawn(branch_count)]
+
+
+def state_rng(rng_state):
+    """
+    Rebuilds a random generator from a state's 'rng_state', so draws resume where the state left off.
+
+    Parameters:
+    - rng_state: Bit generator state, as in initial_state's 'rng_state'.
+
+    Returns:
+    - An np.random.Generator; its bit_generator.state is the advanced state to store back.
+    """
+    bit_generator = getattr(np.random, rng_state['bit_generator'])()
+    bit_generator.state = rng_state
+    return np.random.Generator(bit_generator)
+
+
+def fork_state(state, branch_count, independent_streams=True):
+    """
+    Copies one engine state into a batch of identical branches, one row per branch.
+
+    Change individual rows (e.g. state['resources'][i, co2_column] += 100) to set up each
+    "what if" scenario, then advance the whole batch together with advance_state.
+
+    Parameters:
+    - state: A single (unbatched) state dictionary.
+    - branch_count: Number of branches.
+    - independent_streams: For a seeded state, give every branch its own random stream (see
+      branch_rng_states). With False, every branch replays the parent's stream, which isolates the
+      effect of the per-branch changes from random differences.
+
+    Returns:
+    - A state dictionary whose 'populations' and 'resources' have a leading axis of length
+      branch_count, and whose 'rng_state' (if seeded) is a list of one state per branch.
+    """
+    branches = snapshot_state(state)
+    branches['populations'] = np.tile(state['populations'], (branch_count, 1))
+    branches['resources'] = np.tile(state['resources'], (branch_count, 1))
+    if state.get('rng_state') is not None:
+        if independent_streams:
+            branches['rng_state'] = branch_rng_states(state['rng_state'], branch_count)
+        else:
+            branches['rng_state'] = [copy.deepcopy(state['rng_state']) for _ in range(branch_count)]
+    return branches
+
+
+def advance_state(compiled_web, state, steps, growth_rates=None):
+    """
+    Resumes a (single or batched) engine state for a number of steps.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - state: State dictionary, e.g. from snapshot_state, deserialize_state or fork_state.
+    - steps: Number of steps to run.
+    - growth_rates: Optional growth rates, (species,) or one row per branch.
+
+    Returns:
+    - A new state dictionary 'steps' steps later. The input state is left untouched.
+    """
+    populations, resources = state['populations'], state['resources']
+    for _ in range(steps):
+        populations, resources = apply_step(compiled_web, populations, resources, growth_rates)
+
+    advanced_state = {key: copy.deepcopy(value) for key, value in state.items()
+                      if key not in ('populations', 'resources')}
+    advanced_state.update({'populations': populations, 'resources': resources, 'step': state['step'] + steps})
+    return advanced_state
+
+
+## TEST STATEMENTS WHEN I CALL THIS SCRIPT FROM COMMAND LINE
+if __name__ == '__main__':
+    compiled_web = load_compiled_food_web('food_web.json')
+
+    # simulate the shared prefix once
+    shared_prefix = advance_state(compiled_web, initial_state(compiled_web, seed=0), 150)
+    checkpoint = serialize_state(shared_prefix)
+    print(f"checkpoint at step {shared_prefix['step']}: {len(checkpoint)} bytes")
+
+    # branch: what if the player adds 0, 100, 200 or 300 CO2 at step 150?
+    branches = fork_state(deserialize_state(checkpoint), 4)
+    branches['resources'][:, compiled_web['resource_names'].index('CO2')] += np.arange(4) * 100
+    branches = advance_state(compiled_web, branches, 50)
+    print(branches['step'], branches['populations'].sum(axis=1))
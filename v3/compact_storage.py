@@ -0,0 +1,125 @@
+import numpy as np
+
+from compiled_web import load_compiled_food_web
+
+# Largest value the log_uint16 format can tell apart; anything above (and inf / nan) gets the overflow code
+LOG_UINT16_MAX_VALUE = 1e12
+LOG_UINT16_OVERFLOW = np.iinfo(np.uint16).max
+LOG_UINT16_LEVELS = LOG_UINT16_OVERFLOW - 1  # codes 0 .. 65534 cover [0, LOG_UINT16_MAX_VALUE]
+
+# How recorded trajectories can be stored, from exact to most compact
+RECORD_FORMATS = {
+    'float64': np.float64,  # 8 bytes per value, exact
+    'float32': np.float32,  # 4 bytes per value, see record_error_bound
+    'log_uint16': np.uint16,  # 2 bytes per value, log-scaled, for plots and visualization only
+}
+
+
+def record_error_bound(record_format, max_value=LOG_UINT16_MAX_VALUE):
+    """
+    Documented worst-case error of storing a value in a record format.
+
+    - float64: exact.
+    - float32: relative error at most 2**-24 (about 6e-8) for magnitudes between 1.2e-38 and
+      3.4e38; larger values are stored as inf.
+    - log_uint16: values v in [0, max_value] are stored as round(log1p(v) / log1p(max_value) * 65534),
+      so 1 + v is recovered within a factor exp(±log1p(max_value) / 131068): a relative error of
+      about 2.1e-4 on 1 + v for the default max_value of 1e12 (i.e. within 2.1e-4 * (1 + v) of v).
+      Negative values are stored as 0, values above max_value (and inf / nan) as the overflow code,
+      which decodes to inf.
+
+    Parameters:
+    - record_format: A key of RECORD_FORMATS.
+    - max_value: Top of the log_uint16 range.
+
+    Returns:
+    - The relative error bound as a float (for log_uint16, relative to 1 + v).
+    """
+    if record_format == 'float64':
+        return 0.0
+    if record_format == 'float32':
+        return 2.0 ** -24
+    if record_format == 'log_uint16':
+        return float(np.expm1(np.log1p(max_value) / (2 * LOG_UINT16_LEVELS)))
+    raise ValueError(f"unknown record format {record_format!r}; expected one of {list(RECORD_FORMATS)}")
+
+
+def encode_values(values, record_format, max_value=LOG_UINT16_MAX_VALUE):
+    """
+    Converts float values to a record format (see record_error_bound for the error introduced).
+
+    Parameters:
+    - values: Array of values.
+    - record_format: A key of RECORD_FORMATS.
+    - max_value: Top of the log_uint16 range.
+
+    Returns:
+    - An array of RECORD_FORMATS[record_format] values.
+    """
+    if record_format != 'log_uint16':
+        with np.errstate(over='ignore'):
+            return np.asarray(values).astype(RECORD_FORMATS[record_format])
+    values = np.asarray(values, dtype=float)
+    with np.errstate(invalid='ignore'):
+        scaled = np.log1p(np.maximum(values, 0)) * (LOG_UINT16_LEVELS / np.log1p(max_value))
+        in_range = values <= max_value  # False for nan as well
+    return np.where(in_range, np.rint(np.where(in_range, scaled, 0)), LOG_UINT16_OVERFLOW).astype(np.uint16)
+
+
+def decode_values(codes, record_format, max_value=LOG_UINT16_MAX_VALUE):
+    """
+    Converts recorded values back to float64 (the inverse of encode_values, up to its error).
+    """
+    if record_format != 'log_uint16':
+        return np.asarray(codes, dtype=np.float64)
+    codes = np.asarray(codes)
+    values = np.expm1(codes * (np.log1p(max_value) / LOG_UINT16_LEVELS))
+    return np.where(codes == LOG_UINT16_OVERFLOW, np.inf, values)
+
+
+def cast_food_web(compiled_web, dtype):
+    """
+    Returns a copy of a compiled food web whose float arrays have the given dtype, so the engine
+    computes in that precision instead of promoting every step back to float64.
+
+    With float32 each step rounds to about 6e-8 relative error, and there is no bound on how that
+    compounds: typical runs stay within about 1e-6 of float64 runs, but a run that passes close to
+    a threshold (a population reaching 0, a switch of limiting resource) or is chaotic (growth
+    rates far above 1) can take the other branch and end up far from its float64 counterpart.
+    Use float32 state for ensemble statistics, not for reproducing individual runs.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - dtype: np.float32 or np.float64.
+
+    Returns:
+    - The cast compiled food web (the same one if nothing changes).
+    """
+    dtype = np.dtype(dtype)
+    if compiled_web['growth_rates'].dtype == dtype:
+        return compiled_web
+    cast_web = dict(compiled_web)
+    for key in ['resource_exchange', 'predation', 'breathe_rates', 'growth_rates', 'initial_populations',
+                'initial_resources']:
+        cast_web[key] = compiled_web[key].astype(dtype)
+    return cast_web
+
+
+## TEST STATEMENTS WHEN I CALL THIS SCRIPT FROM COMMAND LINE
+if __name__ == '__main__':
+    from ensemble import run_ensemble
+
+    compiled_web = load_compiled_food_web('food_web.json')
+    populations = np.tile(compiled_web['initial_populations'], (1000, 1))
+    growth_rates = np.random.default_rng(0).uniform(1.0, 1.2, size=populations.shape)
+    exact = run_ensemble(compiled_web, 100, populations, growth_rates=growth_rates, record_trajectories=True)
+
+    for dtype, record_format in [(np.float64, 'float32'), (np.float64, 'log_uint16'), (np.float32, 'float32')]:
+        compact = run_ensemble(compiled_web, 100, populations, growth_rates=growth_rates, record_trajectories=True,
+                               dtype=dtype, record_format=record_format)
+        decoded = decode_values(compact['trajectories'], record_format)
+        relative_error = np.abs(decoded - exact['trajectories']) / (1 + np.abs(exact['trajectories']))
+        print(f"{np.dtype(dtype).name} state, {record_format} trajectories: "
+              f"{compact['trajectories'].nbytes / exact['trajectories'].nbytes:.0%} of the memory, "
+              f"median / largest error {np.median(relative_error):.2g} / {relative_error.max():.2g} "
+              f"(recording bound {record_error_bound(record_format):.2g})")
@@ -0,0 +1,380 @@
+import json
+import numpy as np
+
+# SciPy is optional: without it every food web is compiled to dense arrays
+try:
+    from scipy import sparse as scipy_sparse
+    SCIPY_AVAILABLE = True
+except ImportError:
+    scipy_sparse = None
+    SCIPY_AVAILABLE = False
+
+# Webs whose relation matrices are at most this full are compiled to sparse (CSR) matrices
+DEFAULT_DENSITY_THRESHOLD = 0.05
+
+
+def compile_food_web(food_web, use_sparse=None, density_threshold=DEFAULT_DENSITY_THRESHOLD):
+    """
+    Compiles a food web dictionary (as loaded from food_web.json) into NumPy arrays
+    so a simulation step becomes a handful of matrix-vector operations instead of nested
+    loops over species and resources.
+
+    Parameters:
+    - food_web: Dictionary with 'species', 'initial_resource_levels' and 'simulation_parameters'.
+      Species without a 'breathe_rate' (e.g. v2/foodweb.json) breathe at a rate of 1.
+    - use_sparse: True to store the relation matrices as scipy.sparse CSR matrices, False for dense
+      arrays, None to decide from the density of the predator/prey and consume relations. Large
+      generated webs where each predator has a handful of prey should be sparse: a step then costs
+      time proportional to the number of edges rather than species squared.
+    - density_threshold: With use_sparse=None, compile to sparse matrices when SciPy is installed and
+      at most this fraction of the possible predator/prey and consume edges exist.
+
+    Returns:
+    - A dictionary with:
+      - species_names / resource_names: column order of every array below.
+      - sparse: whether the four relation matrices below are CSR matrices.
+      - consumes / produces: (species, resources) boolean masks.
+      - resource_exchange: (species, resources) net change in each resource per individual
+        (+breathe_rate for produced, -breathe_rate for consumed).
+      - prey_mask: (predator, prey) boolean adjacency matrix.
+      - predation: (predator, prey) amount of each prey eaten per predator individual
+        (each predator eats one unit split evenly across its prey).
+      - breathe_rates, growth_rates, initial_populations: per-species vectors.
+      - initial_resources: per-resource vector.
+      - time_steps: default number of steps from 'simulation_parameters'.
+    """
+    species_data = food_web['species']
+    initial_resource_levels = food_web['initial_resource_levels']
+
+    species_names = [species['name'] for species in species_data]
+    resource_names = list(initial_resource_levels.keys())
+    species_index = {name: i for i, name in enumerate(species_names)}
+    resource_index = {name: j for j, name in enumerate(resource_names)}
+
+    species_count = len(species_names)
+    resource_count = len(resource_names)
+
+    # collect every relation as (row, column) edges first, so huge webs never need a dense matrix
+    consume_edges, produce_edges, prey_edges = [], [], []
+    for i, species in enumerate(species_data):
+        # resources that are not tracked in initial_resource_levels are ignored, as in v2
+        consume_edges.extend((i, resource_index[resource]) for resource in dict.fromkeys(species['consumes'])
+                             if resource in resource_index)
+        produce_edges.extend((i, resource_index[resource]) for resource in dict.fromkeys(species['produces'])
+                             if resource in resource_index)
+        for prey_name in dict.fromkeys(species['prey']):
+            if prey_name not in species_index:
+                raise ValueError(f"{species['name']} preys on unknown species '{prey_name}'")
+            prey_edges.append((i, species_index[prey_name]))
+
+    breathe_rates = np.array([species.get('breathe_rate', 1) for species in species_data], dtype=float)
+    growth_rates = np.array([species['growth_rate'] for species in species_data], dtype=float)
+    initial_populations = np.array([species['initial_population'] for species in species_data], dtype=float)
+    initial_resources = np.array([initial_resource_levels[name] for name in resource_names], dtype=float)
+
+    if use_sparse is None:
+        density = (len(prey_edges) + len(consume_edges)) / max(species_count * (species_count + resource_count), 1)
+        use_sparse = SCIPY_AVAILABLE and density <= density_threshold
+    if use_sparse and not SCIPY_AVAILABLE:
+        raise ImportError("use_sparse=True needs scipy")
+
+    def relation_matrix(edges, values, shape):
+        rows = np.array([row for row, _ in edges], dtype=np.int64)
+        columns = np.array([column for _, column in edges], dtype=np.int64)
+        if use_sparse:
+            return scipy_sparse.csr_matrix((values[rows] if len(edges) else [], (rows, columns)), shape=shape)
+        matrix = np.zeros(shape, dtype=values.dtype)
+        matrix[rows, columns] = values[rows]
+        return matrix
+
+    prey_counts = np.bincount([predator for predator, _ in prey_edges], minlength=species_count)
+    always = np.ones(species_count, dtype=bool)
+
+    consumes = relation_matrix(consume_edges, always, (species_count, resource_count))
+    produces = relation_matrix(produce_edges, always, (species_count, resource_count))
+    prey_mask = relation_matrix(prey_edges, always, (species_count, species_count))
+    resource_exchange = (relation_matrix(produce_edges, breathe_rates, (species_count, resource_count))
+                         - relation_matrix(consume_edges, breathe_rates, (species_count, resource_count)))
+    predation = relation_matrix(prey_edges, 1 / np.maximum(prey_counts, 1), (species_count, species_count))
+
+    return {
+        'species_names': species_names,
+        'resource_names': resource_names,
+        'sparse': bool(use_sparse),
+        'consumes': consumes,
+        'produces': produces,
+        'resource_exchange': resource_exchange,
+        'prey_mask': prey_mask,
+        'predation': predation,
+        'breathe_rates': breathe_rates,
+        'growth_rates': growth_rates,
+        'initial_populations': initial_populations,
+        'initial_resources': initial_resources,
+        'time_steps': food_web['simulation_parameters']['time_steps'],
+    }
+
+
+def dense_food_web(compiled_web):
+    """
+    Returns a compiled food web with every relation matrix as a dense NumPy array.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web, sparse or not.
+
+    Returns:
+    - The same compiled food web if it is already dense, otherwise a dense copy.
+    """
+    if not compiled_web['sparse']:
+        return compiled_web
+    densified = {**compiled_web, 'sparse': False}
+    for key in ['consumes', 'produces', 'resource_exchange', 'prey_mask', 'predation']:
+        densified[key] = compiled_web[key].toarray()
+    return densified
+
+
+def dense_relation(compiled_web, key):
+    """
+    Returns one relation matrix of a compiled food web as a dense NumPy array, without densifying
+    the others (the species x species ones can be huge).
+
+    Parameters:
+    - compiled_web: Output of compile_food_web, sparse or not.
+    - key: Name of the relation matrix, e.g. 'consumes'.
+
+    Returns:
+    - The matrix itself if the web is dense, otherwise a dense copy.
+    """
+    matrix = compiled_web[key]
+    return matrix.toarray() if compiled_web['sparse'] else matrix
+
+
+def relation_product(compiled_web, values, key):
+    """
+    Multiplies rows of per-species values by one of the compiled relation matrices, dense or sparse.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - values: (..., species) array.
+    - key: 'resource_exchange' or 'predation'.
+
+    Returns:
+    - values @ compiled_web[key], shaped (..., columns of the matrix).
+    """
+    matrix = compiled_web[key]
+    if not compiled_web['sparse']:
+        return values @ matrix
+    rows = values.reshape(-1, values.shape[-1])
+    return (matrix.T @ rows.T).T.reshape(values.shape[:-1] + (matrix.shape[1],))
+
+
+def row_minimum(compiled_web, values, key):
+    """
+    For every species, the smallest of the values its row of a relation mask points at.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - values: (..., columns) array, e.g. resource levels for 'consumes' or populations for 'prey_mask'.
+    - key: 'consumes' or 'prey_mask'.
+
+    Returns:
+    - A (..., species) array, inf for species whose row is empty.
+    """
+    mask = compiled_web[key]
+    if not compiled_web['sparse']:
+        return np.where(mask, values[..., None, :], np.inf).min(axis=-1)
+
+    minimum = np.full(values.shape[:-1] + (mask.shape[0],), np.inf, dtype=values.dtype)
+    row_lengths = np.diff(mask.indptr)
+    nonempty_rows = np.flatnonzero(row_lengths)
+    if len(nonempty_rows):
+        # edges are stored row by row, so each non-empty row is one contiguous segment
+        minimum[..., nonempty_rows] = np.minimum.reduceat(values[..., mask.indices], mask.indptr[nonempty_rows], axis=-1)
+    return minimum
+
+
+def load_compiled_food_web(file_path):
+    """
+    Loads a food web JSON file and compiles it.
+
+    Parameters:
+    - file_path: Path to a food web JSON file.
+
+    Returns:
+    - The compiled food web (see compile_food_web).
+    """
+    with open(file_path, 'r') as file:
+        food_web = json.load(file)
+    return compile_food_web(food_web)
+
+
+def initial_state(compiled_web, seed=None):
+    """
+    Builds the engine state at step 0 from the compiled food web.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - seed: Optional seed. When given, the state also carries 'rng_state', the bit generator state of
+      np.random.default_rng(seed), so random draws can be snapshotted and resumed with the state.
+
+    Returns:
+    - A state dictionary with 'populations', 'resources' and 'step' (and 'rng_state' if seeded).
+    """
+    state = {
+        'populations': compiled_web['initial_populations'].copy(),
+        'resources': compiled_web['initial_resources'].copy(),
+        'step': 0,
+    }
+    if seed is not None:
+        state['rng_state'] = np.random.default_rng(seed).bit_generator.state
+    return state
+
+
+def breathe(compiled_web, populations, resources, breathe_rates=None):
+    """
+    Breathing phase: every species consumes and produces resources in proportion to its population.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - populations: (..., species) populations.
+    - resources: (..., resources) resource levels.
+    - breathe_rates: Optional (species,) or (..., species) breathe rates replacing the compiled ones,
+      e.g. one row per run of an ensemble.
+
+    Returns:
+    - The new (..., resources) resource levels, floored at 0.
+    """
+    if breathe_rates is None:
+        return np.maximum(resources + relation_product(compiled_web, populations, 'resource_exchange'), 0)
+    breathing = populations * breathe_rates
+    exchange = relation_product(compiled_web, breathing, 'produces') - relation_product(compiled_web, breathing, 'consumes')
+    return np.maximum(resources + exchange, 0)
+
+
+def eat(compiled_web, populations):
+    """
+    Predation phase: every predator individual eats one unit split evenly across its prey.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - populations: (..., species) populations.
+
+    Returns:
+    - The new (..., species) populations, floored at 0.
+    """
+    return np.maximum(populations - relation_product(compiled_web, populations, 'predation'), 0)
+
+
+def reproduce(compiled_web, populations, resources, growth_rates):
+    """
+    Growth phase: logistic growth N + r*N*(1 - N/K), where K is the smallest level among the
+    resources a species consumes and the prey it eats. Species with K == 0 keep their population.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - populations: (..., species) populations.
+    - resources: (..., resources) resource levels.
+    - growth_rates: (species,) or (..., species) growth rates.
+
+    Returns:
+    - The new (..., species) populations, floored at 0.
+    """
+    ## calculate carrying capacity from consumed resources and available prey
+    resource_capacity = row_minimum(compiled_web, resources, 'consumes')
+    prey_capacity = row_minimum(compiled_web, populations, 'prey_mask')
+    carrying_capacity = np.minimum(resource_capacity, prey_capacity)
+
+    ## reproduce
+    has_capacity = carrying_capacity > 0
+    safe_capacity = np.where(has_capacity, carrying_capacity, 1.0)
+    grown = populations + growth_rates * populations * (1 - populations / safe_capacity)
+    return np.maximum(np.where(has_capacity, grown, populations), 0)
+
+
+def apply_step(compiled_web, populations, resources, growth_rates=None, breathe_rates=None):
+    """
+    Advances populations and resource levels by one step.
+
+    All arrays may carry leading batch dimensions: populations of shape (..., species) and
+    resources of shape (..., resources) are stepped together, one row per simulation.
+
+    The step has three phases, each using the output of the previous one:
+    1. everyone breathes: resources change by populations @ resource_exchange (floored at 0).
+    2. everyone eats: each prey loses populations @ predation (floored at 0).
+    3. everyone reproduces: logistic growth N + r*N*(1 - N/K), where K is the smallest level
+       among the resources a species consumes and the prey it eats. Species with K == 0
+       keep their population unchanged, as in v2/sim_web_v2.py.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - populations: Array of species populations, shape (..., species).
+    - resources: Array of resource levels, shape (..., resources).
+    - growth_rates: Optional growth rates, shape (species,) or (..., species).
+      Defaults to the compiled growth rates.
+    - breathe_rates: Optional breathe rates, shape (species,) or (..., species).
+      Defaults to the compiled breathe rates (baked into resource_exchange).
+
+    Returns:
+    - Tuple of (new_populations, new_resources).
+    """
+    if growth_rates is None:
+        growth_rates = compiled_web['growth_rates']
+
+    resources = breathe(compiled_web, populations, resources, breathe_rates)
+    populations = eat(compiled_web, populations)
+    populations = reproduce(compiled_web, populations, resources, growth_rates)
+    return populations, resources
+
+
+def step(compiled_web, state):
+    """
+    Advances an engine state by one step (see apply_step for the update rule).
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - state: State dictionary with 'populations', 'resources' and 'step'.
+
+    Returns:
+    - A new state dictionary one step later. Any other keys (such as 'rng_state') are carried over.
+    """
+    populations, resources = apply_step(compiled_web, state['populations'], state['resources'])
+    return {**state, 'populations': populations, 'resources': resources, 'step': state['step'] + 1}
+
+
+def run_compiled_simulation(compiled_web, time_steps=None, populations=None, resources=None):
+    """
+    Runs the compiled food web for a number of steps and records every step.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - time_steps: Number of steps to run. Defaults to the compiled 'time_steps'.
+    - populations: Optional starting populations. Defaults to the compiled initial populations.
+    - resources: Optional starting resource levels. Defaults to the compiled initial resources.
+
+    Returns:
+    - A NumPy array of shape (time_steps, species + resources) where row t holds the
+      populations followed by the resource levels after step t, as in v2/sim_web_v2.py.
+    """
+    if time_steps is None:
+        time_steps = compiled_web['time_steps']
+    if populations is None:
+        populations = compiled_web['initial_populations']
+    if resources is None:
+        resources = compiled_web['initial_resources']
+
+    species_count = len(compiled_web['species_names'])
+    results = np.zeros((time_steps, species_count + len(compiled_web['resource_names'])))
+
+    for t in range(time_steps):
+        populations, resources = apply_step(compiled_web, populations, resources)
+        results[t, :species_count] = populations
+        results[t, species_count:] = resources
+
+    return results
+
+
+## TEST STATEMENTS WHEN I CALL THIS SCRIPT FROM COMMAND LINE
+if __name__ == '__main__':
+    compiled_web = load_compiled_food_web('food_web.json')
+    results = run_compiled_simulation(compiled_web)
+    print(compiled_web['species_names'] + compiled_web['resource_names'])
+    print(results[-1])
@@ -0,0 +1,337 @@
+import hashlib
+import json
+import os
+import uuid
+
+import numpy as np
+
+from compiled_web import SCIPY_AVAILABLE, compile_food_web, scipy_sparse
+
+# Bump when the layout of the cache directory or of compiled webs changes, so old caches are rebuilt
+CACHE_FORMAT_VERSION = 1
+
+# Required fields of a food web config and the JSON types they must have
+FOOD_WEB_SCHEMA = {
+    'simulation_parameters': dict,
+    'initial_resource_levels': dict,
+    'species': list,
+}
+SPECIES_SCHEMA = {
+    'name': str,
+    'consumes': list,
+    'produces': list,
+    'prey': list,
+    'initial_population': (int, float),
+    'growth_rate': (int, float),
+}
+OPTIONAL_SPECIES_SCHEMA = {
+    'breathe_rate': (int, float),
+}
+
+RELATION_KEYS = ['consumes', 'produces', 'resource_exchange', 'prey_mask', 'predation']
+VECTOR_KEYS = ['breathe_rates', 'growth_rates', 'initial_populations', 'initial_resources']
+
+# Compiled webs already loaded by this process, keyed by cache path and load options
+_loaded_webs = {}
+
+
+def validate_food_web(food_web):
+    """
+    Checks a food web config against FOOD_WEB_SCHEMA / SPECIES_SCHEMA before it is compiled.
+
+    Parameters:
+    - food_web: Dictionary as loaded from a food web JSON file.
+
+    Raises:
+    - ValueError listing every problem found (missing fields, wrong types, duplicate names,
+      unknown prey, negative values).
+    """
+    problems = []
+
+    def check_type(value, expected, where):
+        # bool is an int in Python but never a valid number here
+        if isinstance(value, bool) or not isinstance(value, expected):
+            problems.append(f"{where} should be {getattr(expected, '__name__', 'a number')}, got {value!r}")
+            return False
+        return True
+
+    if not isinstance(food_web, dict):
+        raise ValueError("a food web config must be a JSON object")
+    for key, expected in FOOD_WEB_SCHEMA.items():
+        if key not in food_web:
+            problems.append(f"missing '{key}'")
+        else:
+            check_type(food_web[key], expected, key)
+    if problems:
+        raise ValueError("invalid food web config:\n- " + "\n- ".join(problems))
+
+    time_steps = food_web['simulation_parameters'].get('time_steps')
+    if check_type(time_steps, int, 'simulation_parameters.time_steps') and time_steps < 0:
+        problems.append("simulation_parameters.time_steps is negative")
+    for resource, level in food_web['initial_resource_levels'].items():
+        check_type(level, (int, float), f"initial_resource_levels.{resource}")
+
+    names = set()
+    for i, species in enumerate(food_web['species']):
+        if not check_type(species, dict, f"species[{i}]"):
+            continue
+        where = f"species[{i}] ({species.get('name', '?')})"
+        for key, expected in SPECIES_SCHEMA.items():
+            if key not in species:
+                problems.append(f"{where} is missing '{key}'")
+            else:
+                check_type(species[key], expected, f"{where}.{key}")
+        for key, expected in OPTIONAL_SPECIES_SCHEMA.items():
+            if key in species:
+                check_type(species[key], expected, f"{where}.{key}")
+        if isinstance(species.get('initial_population'), (int, float)) and species['initial_population'] < 0:
+            problems.append(f"{where} has a negative initial_population")
+        if species.get('name') in names:
+            problems.append(f"{where} is listed twice")
+        names.add(species.get('name'))
+
+    for i, species in enumerate(food_web['species']):
+        if isinstance(species, dict) and isinstance(species.get('prey'), list):
+            for prey_name in species['prey']:
+                if prey_name not in names:
+                    problems.append(f"species[{i}] ({species.get('name', '?')}) preys on unknown species '{prey_name}'")
+
+    if problems:
+        raise ValueError("invalid food web config:\n- " + "\n- ".join(problems))
+
+
+def compiled_cache_path(file_path):
+    """
+    Returns where the compiled cache of a food web JSON file lives: a '<file>.compiled' directory
+    next to it.
+    """
+    return f"{file_path}.compiled"
+
+
+def file_digest(file_path):
+    """
+    Returns the hex SHA-256 of a file's contents.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def replace_file(file_path, write):
+    """
+    Writes a file atomically: write(file) fills a temporary file in the same directory, which then
+    replaces file_path in one step. Readers see the old file or the new one, never a partial one,
+    and concurrent writers each install a complete file (the last one wins).
+
+    Parameters:
+    - file_path: File to write.
+    - write: Function taking the open binary file.
+    """
+    temporary_path = f"{file_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temporary_path, 'xb') as file:
+            write(file)
+        os.replace(temporary_path, file_path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+
+def write_manifest(cache_path, manifest):
+    """
+    Atomically writes the manifest.json of a cache directory (see replace_file).
+    """
+    replace_file(os.path.join(cache_path, 'manifest.json'), lambda file: file.write(json.dumps(manifest).encode()))
+
+
+def save_compiled_food_web(compiled_web, cache_path, source=None):
+    """
+    Writes a compiled food web as a directory of .npy arrays plus a manifest.json.
+
+    Plain .npy files (rather than one compressed .npz) are used so load_compiled_cache can memory-map
+    them. Sparse relation matrices are stored through their CSR components.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - cache_path: Directory to write. It is created if needed and existing entries are overwritten.
+    - source: Optional dictionary describing the source JSON file ('sha256', 'mtime_ns', 'size',
+      'use_sparse'), stored in the manifest to decide later whether the cache is still valid.
+    """
+    os.makedirs(cache_path, exist_ok=True)
+    manifest_path = os.path.join(cache_path, 'manifest.json')
+    # without a manifest the directory is never read, so a crash below cannot leave a mixed cache behind
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    arrays = {key: compiled_web[key] for key in VECTOR_KEYS}
+    for key in RELATION_KEYS:
+        matrix = compiled_web[key]
+        if compiled_web['sparse']:
+            arrays[f"{key}.data"] = matrix.data
+            arrays[f"{key}.indices"] = matrix.indices
+            arrays[f"{key}.indptr"] = matrix.indptr
+        else:
+            arrays[key] = matrix
+    for key, array in arrays.items():
+        # replaced rather than overwritten, so another process memory-mapping the old file is unaffected
+        replace_file(os.path.join(cache_path, f"{key}.npy"),
+                     lambda file, array=array: np.save(file, np.ascontiguousarray(array)))
+
+    manifest = {
+        'format_version': CACHE_FORMAT_VERSION,
+        'source': source or {},
+        'species_names': compiled_web['species_names'],
+        'resource_names': compiled_web['resource_names'],
+        'sparse': compiled_web['sparse'],
+        'time_steps': compiled_web['time_steps'],
+        'arrays': sorted(arrays),
+    }
+    write_manifest(cache_path, manifest)
+
+
+def read_manifest(cache_path):
+    """
+    Returns the manifest of a compiled cache directory, or None if there is no usable one.
+    """
+    try:
+        with open(os.path.join(cache_path, 'manifest.json'), 'r') as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('format_version') != CACHE_FORMAT_VERSION:
+        return None
+    return manifest
+
+
+def load_compiled_cache(cache_path, mmap_mode=None, manifest=None):
+    """
+    Loads a compiled food web written by save_compiled_food_web.
+
+    Parameters:
+    - cache_path: Cache directory.
+    - mmap_mode: None to read the arrays into memory, or a np.load mmap_mode ('r' is the useful one)
+      to memory-map them, so only the parts of a large web that are touched are read from disk.
+    - manifest: The directory's manifest if it has already been read.
+
+    Returns:
+    - The compiled food web (see compile_food_web).
+    """
+    if manifest is None:
+        manifest = read_manifest(cache_path)
+        if manifest is None:
+            raise ValueError(f"{cache_path} is not a compiled food web cache")
+    arrays = {key: np.load(os.path.join(cache_path, f"{key}.npy"), mmap_mode=mmap_mode)
+              for key in manifest['arrays']}
+
+    species_count = len(manifest['species_names'])
+    shapes = {
+        'consumes': (species_count, len(manifest['resource_names'])),
+        'produces': (species_count, len(manifest['resource_names'])),
+        'resource_exchange': (species_count, len(manifest['resource_names'])),
+        'prey_mask': (species_count, species_count),
+        'predation': (species_count, species_count),
+    }
+    if manifest['sparse'] and not SCIPY_AVAILABLE:
+        raise ImportError(f"{cache_path} holds a sparse food web, which needs scipy")
+
+    compiled_web = {
+        'species_names': manifest['species_names'],
+        'resource_names': manifest['resource_names'],
+        'sparse': manifest['sparse'],
+    }
+    for key in RELATION_KEYS:
+        if manifest['sparse']:
+            compiled_web[key] = scipy_sparse.csr_matrix(
+                (arrays[f"{key}.data"], arrays[f"{key}.indices"], arrays[f"{key}.indptr"]), shape=shapes[key])
+        else:
+            compiled_web[key] = arrays[key]
+    for key in VECTOR_KEYS:
+        compiled_web[key] = arrays[key]
+    compiled_web['time_steps'] = manifest['time_steps']
+    return compiled_web
+
+
+def load_cached_food_web(file_path, use_sparse=None, mmap_mode=None, cache_path=None):
+    """
+    Loads a food web JSON file as a compiled food web, parsing and compiling it only when it changed.
+
+    The first load validates the JSON (see validate_food_web), compiles it and writes the result to a
+    cache directory next to it (see compiled_cache_path). Later loads read the cached arrays instead,
+    and loads within the same process return the arrays already in memory. The cache is rebuilt
+    when the file's size or contents change; a file whose modification time changed but whose
+    contents did not (e.g. after a checkout) only has its hash checked.
+
+    Parameters:
+    - file_path: Path to a food web JSON file.
+    - use_sparse: Passed to compile_food_web. A cache compiled with a different setting is rebuilt.
+    - mmap_mode: None or a np.load mmap_mode, see load_compiled_cache.
+    - cache_path: Cache directory. Defaults to compiled_cache_path(file_path).
+
+    Returns:
+    - The compiled food web (see compile_food_web). Its arrays are shared between loads, so they
+      are read-only; assign new arrays to a copy of the dictionary to change parameters.
+    """
+    if cache_path is None:
+        cache_path = compiled_cache_path(file_path)
+    stat = os.stat(file_path)
+    memo_key = (os.path.abspath(cache_path), use_sparse, mmap_mode)
+
+    loaded = _loaded_webs.get(memo_key)
+    if loaded is not None and loaded[0] == (stat.st_mtime_ns, stat.st_size):
+        return dict(loaded[1])
+
+    manifest = read_manifest(cache_path)
+    source = manifest['source'] if manifest is not None else {}
+    is_valid = (manifest is not None and source.get('use_sparse') == use_sparse
+                and source.get('size') == stat.st_size)
+    if is_valid and source.get('mtime_ns') != stat.st_mtime_ns:
+        is_valid = source.get('sha256') == file_digest(file_path)
+        if is_valid:
+            manifest['source']['mtime_ns'] = stat.st_mtime_ns
+            write_manifest(cache_path, manifest)
+
+    if is_valid:
+        compiled_web = load_compiled_cache(cache_path, mmap_mode, manifest)
+    else:
+        with open(file_path, 'rb') as file:
+            contents = file.read()
+        food_web = json.loads(contents)
+        validate_food_web(food_web)
+        compiled_web = compile_food_web(food_web, use_sparse=use_sparse)
+        save_compiled_food_web(compiled_web, cache_path, {
+            'sha256': hashlib.sha256(contents).hexdigest(),
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'use_sparse': use_sparse,
+        })
+        if mmap_mode is not None:
+            compiled_web = load_compiled_cache(cache_path, mmap_mode)
+
+    for key in VECTOR_KEYS + RELATION_KEYS:
+        value = compiled_web[key]
+        for array in ([value.data, value.indices, value.indptr] if hasattr(value, 'indptr') else [value]):
+            array.flags.writeable = False
+    _loaded_webs[memo_key] = ((stat.st_mtime_ns, stat.st_size), compiled_web)
+    return dict(compiled_web)
+
+
+## TEST STATEMENTS WHEN I CALL THIS SCRIPT FROM COMMAND LINE
+if __name__ == '__main__':
+    import time
+
+    from compiled_web import load_compiled_food_web
+
+    start = time.perf_counter()
+    load_compiled_food_web('food_web.json')
+    print(f"parse and compile: {(time.perf_counter() - start) * 1e6:.0f} us")
+    load_cached_food_web('food_web.json')
+    _loaded_webs.clear()
+    start = time.perf_counter()
+    load_cached_food_web('food_web.json')
+    print(f"from the compiled cache: {(time.perf_counter() - start) * 1e6:.0f} us")
+    start = time.perf_counter()
+    load_cached_food_web('food_web.json')
+    print(f"already loaded: {(time.perf_counter() - start) * 1e6:.0f} us")
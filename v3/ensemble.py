@@ -0,0 +1,182 @@
+import numpy as np
+
+from compact_storage import RECORD_FORMATS, cast_food_web
+from compiled_web import apply_step, load_compiled_food_web
+from profiling import profiled_step
+from recording import create_recorder, freeze_rows, record_every, record_final, record_state, recorder_results
+
+# Why a run stopped; 'stop_reasons' arrays hold indexes into this list
+TERMINATION_REASONS = ['completed', 'converged', 'extinct', 'diverged']
+COMPLETED, CONVERGED, EXTINCT, DIVERGED = range(len(TERMINATION_REASONS))
+
+DEFAULT_TERMINATION_CRITERIA = {
+    'check_every': 5,  # steps between checks
+    'convergence_tolerance': 1e-6,  # largest relative change over one step that counts as settled
+    'extinction_threshold': 1e-9,  # every species at or below this counts as died out
+    'overflow_threshold': 1e12,  # any population or resource above this (or inf / nan) counts as exploded
+}
+
+
+def check_termination(previous_populations, previous_resources, populations, resources, criteria):
+    """
+    Classifies each run of an ensemble against the termination criteria.
+
+    Convergence compares consecutive steps, so a run cycling with a period that divides
+    check_every is not mistaken for a settled one.
+
+    Parameters:
+    - previous_populations / previous_resources: (N, species) and (N, resources) one step before.
+    - populations / resources: (N, species) and (N, resources) now.
+    - criteria: Dictionary of termination criteria (see DEFAULT_TERMINATION_CRITERIA).
+
+    Returns:
+    - An (N,) array of indexes into TERMINATION_REASONS, COMPLETED meaning "keep running".
+    """
+    states = np.concatenate([populations, resources], axis=1)
+    previous_states = np.concatenate([previous_populations, previous_resources], axis=1)
+
+    reasons = np.full(len(states), COMPLETED)
+    change = np.abs(states - previous_states) / np.maximum(np.abs(states), 1)
+    reasons[np.all(change <= criteria['convergence_tolerance'], axis=1)] = CONVERGED
+    reasons[np.all(populations <= criteria['extinction_threshold'], axis=1)] = EXTINCT
+    reasons[~np.all(states <= criteria['overflow_threshold'], axis=1)] = DIVERGED  # also catches nan
+    return reasons
+
+
+def run_ensemble(compiled_web, time_steps=None, populations=None, resources=None, growth_rates=None,
+                 record_trajectories=False, termination_criteria=None, profile=None, step_callback=None,
+                 dtype=np.float64, record_format='float64', record_policy=None, breathe_rates=None):
+    """
+    Runs N simulations of the same compiled food web in lockstep, one row per simulation.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - time_steps: Number of steps to run. Defaults to the compiled 'time_steps'.
+    - populations: (N, species) initial populations. Defaults to one run from the compiled initial populations.
+    - resources: (N, resources) or (resources,) initial resource levels. Defaults to the compiled ones.
+    - growth_rates: (N, species) or (species,) growth rates. Defaults to the compiled ones.
+    - record_trajectories: If True, also return every step, shaped (N, time_steps, species + resources)
+      with row t holding the state after step t, as in run_compiled_simulation. Shorthand for
+      record_policy=recording.record_every(1).
+    - termination_criteria: Optional dictionary of criteria (see DEFAULT_TERMINATION_CRITERIA; missing
+      keys use the defaults). Every 'check_every' steps, runs that have settled, died out or exploded
+      are stopped and dropped from the arrays being stepped. A stopped run keeps the state it had
+      when it stopped; in recorded trajectories that state is repeated for the remaining steps.
+    - profile: Optional profile dictionary from profiling.create_phase_profile. Time spent in each
+      phase of the step is added to it; pass the same profile to several calls to accumulate.
+    - step_callback: Optional function called as step_callback(steps_taken, populations, resources)
+      after every step, with the (active runs, ...) arrays. Both are off by default and add no
+      per-step cost then.
+    - dtype: Float type of the ensemble state. np.float32 halves the memory of the state and of the
+      arithmetic (see compact_storage.cast_food_web for the precision this costs).
+    - record_format: How recorded states are stored, a key of compact_storage.RECORD_FORMATS:
+      'float64', 'float32' (half the memory) or 'log_uint16' (a quarter, for visualization). Decode
+      them with compact_storage.decode_values; record_error_bound documents the error of each.
+    - record_policy: What to keep besides the final state, from the recording module:
+      record_final() (the default), record_every(k) for every k-th step, record_last(window) for
+      only the last steps, or record_statistics() for per-column running mean / variance / min /
+      max. Memory is allocated for what the policy keeps only.
+    - breathe_rates: Optional (N, species) or (species,) breathe rates. Defaults to the compiled ones.
+
+    Returns:
+    - A dictionary with 'populations' (N, species) and 'resources' (N, resources) final states,
+      'stop_steps' (N,) number of steps each run took, 'stop_reasons' (N,) indexes into
+      TERMINATION_REASONS, plus what the recording policy kept: 'trajectories',
+      'recent_trajectories' or 'statistics' (see recording.recorder_results).
+    """
+    if time_steps is None:
+        time_steps = compiled_web['time_steps']
+    if populations is None:
+        populations = compiled_web['initial_populations'][None, :]
+    if resources is None:
+        resources = compiled_web['initial_resources']
+    if growth_rates is None:
+        growth_rates = compiled_web['growth_rates']
+
+    if record_format not in RECORD_FORMATS:
+        raise ValueError(f"unknown record format {record_format!r}; expected one of {list(RECORD_FORMATS)}")
+    if record_trajectories and record_policy is not None:
+        raise ValueError("pass either record_trajectories or record_policy, not both")
+    if record_policy is None:
+        record_policy = record_every(1) if record_trajectories else record_final()
+    compiled_web = cast_food_web(compiled_web, dtype)
+    populations = np.array(populations, dtype=dtype)
+    ensemble_size, species_count = populations.shape
+    resources = np.broadcast_to(np.asarray(resources, dtype=dtype),
+                                (ensemble_size, len(compiled_web['resource_names']))).copy()
+    growth_rates = np.broadcast_to(np.asarray(growth_rates, dtype=dtype), populations.shape)
+    if breathe_rates is not None:
+        breathe_rates = np.broadcast_to(np.asarray(breathe_rates, dtype=dtype), populations.shape)
+
+    final_populations = np.zeros_like(populations)
+    final_resources = np.zeros_like(resources)
+    stop_steps = np.full(ensemble_size, time_steps)
+    stop_reasons = np.full(ensemble_size, COMPLETED)
+    active_rows = np.arange(ensemble_size)  # original row of each simulation still being stepped
+
+    recorder = create_recorder(record_policy, ensemble_size, time_steps, species_count + resources.shape[1],
+                               record_format)
+    is_recording = record_policy['policy'] != 'final'
+
+    if termination_criteria is not None:
+        criteria = {**DEFAULT_TERMINATION_CRITERIA, **termination_criteria}
+
+    if profile is None:
+        step_function = apply_step
+    else:
+        def step_function(compiled_web, populations, resources, growth_rates, breathe_rates):
+            return profiled_step(compiled_web, populations, resources, growth_rates, profile, breathe_rates)
+
+    for t in range(time_steps):
+        previous_populations, previous_resources = populations, resources
+        populations, resources = step_function(compiled_web, populations, resources, growth_rates, breathe_rates)
+        if step_callback is not None:
+            step_callback(t + 1, populations, resources)
+
+        if is_recording:
+            record_state(recorder, active_rows, t, populations, resources)
+
+        steps_taken = t + 1
+        if termination_criteria is None or steps_taken % criteria['check_every'] != 0 or steps_taken == time_steps:
+            continue
+
+        reasons = check_termination(previous_populations, previous_resources, populations, resources, criteria)
+        stopped = reasons != COMPLETED
+        if stopped.any():
+            stopped_rows = active_rows[stopped]
+            final_populations[stopped_rows] = populations[stopped]
+            final_resources[stopped_rows] = resources[stopped]
+            stop_steps[stopped_rows] = steps_taken
+            stop_reasons[stopped_rows] = reasons[stopped]
+            freeze_rows(recorder, stopped_rows, steps_taken, populations[stopped], resources[stopped])
+
+            # Drop finished runs from the active set
+            running = ~stopped
+            active_rows = active_rows[running]
+            populations, resources, growth_rates = populations[running], resources[running], growth_rates[running]
+            if breathe_rates is not None:
+                breathe_rates = breathe_rates[running]
+            if len(active_rows) == 0:
+                break
+
+    final_populations[active_rows] = populations
+    final_resources[active_rows] = resources
+
+    ensemble_results = {
+        'populations': final_populations,
+        'resources': final_resources,
+        'stop_steps': stop_steps,
+        'stop_reasons': stop_reasons,
+    }
+    ensemble_results.update(recorder_results(recorder))
+    return ensemble_results
+
+
+## TEST STATEMENTS WHEN I CALL THIS SCRIPT FROM COMMAND LINE
+if __name__ == '__main__':
+    compiled_web = load_compiled_food_web('food_web.json')
+    random_growth_rates = np.random.default_rng(0).uniform(1.0, 2.5, size=(1000, len(compiled_web['species_names'])))
+    ensemble_results = run_ensemble(compiled_web, populations=np.tile(compiled_web['initial_populations'], (1000, 1)),
+                                    growth_rates=random_growth_rates, termination_criteria={})
+    for reason, count in zip(TERMINATION_REASONS, np.bincount(ensemble_results['stop_reasons'], minlength=4)):
+        print(f"{reason}: {count}")
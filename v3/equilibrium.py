@@ -0,0 +1,239 @@
+import numpy as np
+
+from compiled_web import breathe, dense_food_web, load_compiled_food_web
+
+# How populations behave around an equilibrium; 'stability' arrays hold indexes into this list
+STABILITY_CLASSES = ['stable', 'oscillatory', 'unstable', 'not_converged']
+STABLE, OSCILLATORY, UNSTABLE, NOT_CONVERGED = range(len(STABILITY_CLASSES))
+
+
+def population_step_and_jacobian(compiled_web, populations, resources, growth_rates):
+    """
+    Advances populations by one step like compiled_web.apply_step, with the resource levels at the
+    start of the step held fixed, and returns the Jacobian of that map.
+
+    As in sensitivities.apply_step_with_tangents, the floors at 0 and the min() in the carrying
+    capacity are differentiated along the branch that is active at this state. Species at 0 stay
+    at 0 in the engine, so their rows of the Jacobian are 0. The Jacobian is dense, so sparse
+    compiled webs are densified; find_equilibria densifies once and passes the dense web.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - populations: (..., species) populations.
+    - resources: (..., resources) resource levels at the start of the step.
+    - growth_rates: (species,) or (..., species) growth rates.
+
+    Returns:
+    - Tuple of (new_populations, jacobian), jacobian (..., species, species) holding
+      d new_populations[i] / d populations[k].
+    """
+    compiled_web = dense_food_web(compiled_web)
+    species_count = populations.shape[-1]
+    resource_count = resources.shape[-1]
+    identity = np.eye(species_count)
+
+    ## breathe and eat, with their derivatives
+    breathed = resources + populations @ compiled_web['resource_exchange']
+    breathed_jacobian = (breathed > 0)[..., :, None] * compiled_web['resource_exchange'].T
+    resources = np.maximum(breathed, 0)
+    fed = populations - populations @ compiled_web['predation']
+    fed_jacobian = (fed > 0)[..., :, None] * (identity - compiled_web['predation'].T)
+    populations = np.maximum(fed, 0)
+
+    ## carrying capacity and which resource or prey sets it
+    limit_mask = np.concatenate([compiled_web['consumes'], compiled_web['prey_mask']], axis=1)
+    limits = np.concatenate([resources, populations], axis=-1)
+    masked_limits = np.where(limit_mask, limits[..., None, :], np.inf)
+    limiting = masked_limits.argmin(axis=-1)
+    carrying_capacity = np.take_along_axis(masked_limits, limiting[..., None], axis=-1)[..., 0]
+    capacity_selector = (np.arange(resource_count + species_count) == limiting[..., None]) & \
+        np.isfinite(carrying_capacity)[..., None]
+
+    ## reproduce: N + r*N*(1 - N/K)
+    has_capacity = carrying_capacity > 0
+    safe_capacity = np.where(has_capacity, carrying_capacity, 1.0)
+    crowding = populations / safe_capacity
+    grown = populations + growth_rates * populations * (1 - crowding)
+    capacity_sensitivity = (growth_rates * crowding ** 2)[..., None]
+    grown_by_populations = (identity * (1 + growth_rates * (1 - 2 * crowding))[..., None]
+                            + capacity_sensitivity * capacity_selector[..., resource_count:])
+    grown_by_resources = capacity_sensitivity * capacity_selector[..., :resource_count]
+
+    new_populations = np.where(has_capacity, grown, populations)
+    by_populations = np.where(has_capacity[..., None], grown_by_populations, identity)
+    by_resources = np.where(has_capacity[..., None], grown_by_resources, 0)
+    jacobian = by_populations @ fed_jacobian + by_resources @ breathed_jacobian
+    jacobian = np.where((new_populations > 0)[..., None], jacobian, 0)
+    return np.maximum(new_populations, 0), jacobian
+
+
+def find_equilibria(compiled_web, populations=None, resources=None, growth_rates=None, tolerance=1e-10,
+                    max_iterations=50):
+    """
+    Finds population equilibria of the food web with Newton's method, batched over parameter sets.
+
+    Resources are held at the given levels: in most webs some gas keeps piling up or running out
+    (see fast_forward.find_cycle), so the full state has no fixed point, while the populations
+    settle long before the gases do. The drift of each resource at the equilibrium is returned so
+    callers can tell whether holding it fixed is justified.
+
+    Newton steps solve (J - I) dx = -(f(x) - x) with a pseudo-inverse, since J has eigenvalues of
+    exactly 1 for species that keep their population (no prey or resources left). Steps are halved
+    until the residual decreases, and populations are kept at or above 0.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - populations: Optional (species,) or (N, species) starting guesses. Defaults to the compiled
+      initial populations. Newton converges to an equilibrium near the guess; every web has the
+      trivial one where everything has died out.
+    - resources: Optional (resources,) or (N, resources) resource levels. Defaults to the compiled ones.
+    - growth_rates: Optional (species,) or (N, species) growth rates. Defaults to the compiled ones.
+    - tolerance: Largest residual |f(x) - x| / max(|x|, 1) that counts as converged.
+    - max_iterations: Newton iterations before giving up.
+
+    Returns:
+    - A dictionary with 'populations' (N, species) equilibria, 'converged' (N,) booleans,
+      'iterations' (N,) Newton iterations used, 'jacobian' (N, species, species) at the equilibrium
+      and 'resource_drift' (N, resources) change of each resource per step there.
+    """
+    if populations is None:
+        populations = compiled_web['initial_populations']
+    if resources is None:
+        resources = compiled_web['initial_resources']
+    if growth_rates is None:
+        growth_rates = compiled_web['growth_rates']
+
+    compiled_web = dense_food_web(compiled_web)  # once, rather than in every Newton trial
+    growth_rates = np.asarray(growth_rates, dtype=float)
+    populations = np.asarray(populations, dtype=float)
+    resources = np.asarray(resources, dtype=float)
+    batch_size = max(np.atleast_2d(populations).shape[0], np.atleast_2d(resources).shape[0],
+                     np.atleast_2d(growth_rates).shape[0])
+    species_count = len(compiled_web['species_names'])
+    populations = np.broadcast_to(populations, (batch_size, species_count)).copy()
+    resources = np.broadcast_to(resources, (batch_size, len(compiled_web['resource_names'])))
+    growth_rates = np.broadcast_to(growth_rates, (batch_size, species_count))
+    identity = np.eye(species_count)
+
+    def residual_norm(new_populations, populations):
+        return (np.abs(new_populations - populations).max(axis=-1)
+                / np.maximum(np.abs(populations).max(axis=-1), 1))
+
+    new_populations, jacobian = population_step_and_jacobian(compiled_web, populations, resources, growth_rates)
+    residual = residual_norm(new_populations, populations)
+    converged = residual <= tolerance
+    iterations = np.zeros(batch_size, dtype=np.int64)
+
+    for _ in range(max_iterations):
+        active = np.flatnonzero(~converged)
+        if len(active) == 0:
+            break
+        iterations[active] += 1
+        newton_step = -np.einsum('nij,nj->ni', np.linalg.pinv(jacobian[active] - identity),
+                                 new_populations[active] - populations[active])
+
+        ## halve the step until the residual goes down (keeping the last try if it never does)
+        start, start_residual = populations[active], residual[active]
+        step_size = np.ones(len(active))
+        pending = np.arange(len(active))
+        for _ in range(10):
+            rows = active[pending]
+            trial = np.maximum(start[pending] + step_size[pending, None] * newton_step[pending], 0)
+            trial_new, trial_jacobian = population_step_and_jacobian(compiled_web, trial, resources[rows],
+                                                                     growth_rates[rows])
+            trial_residual = residual_norm(trial_new, trial)
+            populations[rows], new_populations[rows], jacobian[rows] = trial, trial_new, trial_jacobian
+            improved = trial_residual < start_residual[pending]
+            residual[rows] = trial_residual
+            pending = pending[~improved]
+            if len(pending) == 0:
+                break
+            step_size[pending] /= 2
+
+        converged[active] = residual[active] <= tolerance
+
+    return {
+        'populations': populations,
+        'converged': converged,
+        'iterations': iterations,
+        'jacobian': jacobian,
+        'resource_drift': breathe(compiled_web, populations, resources) - resources,
+    }
+
+
+def classify_stability(equilibria, tolerance=1e-9):
+    """
+    Classifies equilibria by the eigenvalues of the step map's Jacobian there.
+
+    Small perturbations of the populations are multiplied by the Jacobian every step, so:
+    - stable: every eigenvalue has modulus <= 1; perturbations do not grow. They die out when every
+      modulus is < 1 (with damped oscillations if the largest eigenvalue is negative or complex);
+      eigenvalues of exactly 1 come from species that keep their population because nothing limits
+      them, and a perturbation of those simply stays.
+    - oscillatory: the largest eigenvalue is negative or complex with modulus > 1; populations are
+      pushed away from the equilibrium in alternating / rotating directions and keep oscillating.
+    - unstable: the largest eigenvalue is real and > 1; populations run away from the equilibrium.
+    - not_converged: no equilibrium was found.
+
+    Parameters:
+    - equilibria: Output of find_equilibria.
+    - tolerance: Eigenvalues within this of the unit circle count as on it.
+
+    Returns:
+    - A dictionary with 'stability' (N,) indexes into STABILITY_CLASSES, 'eigenvalues' (N, species)
+      sorted by decreasing modulus and 'spectral_radius' (N,).
+    """
+    eigenvalues = np.linalg.eigvals(equilibria['jacobian'])
+    eigenvalues = np.take_along_axis(eigenvalues, np.argsort(-np.abs(eigenvalues), axis=-1), axis=-1)
+    dominant = eigenvalues[:, 0]
+    spectral_radius = np.abs(dominant)
+
+    stability = np.where(np.abs(dominant.imag) <= tolerance, np.where(dominant.real > 0, UNSTABLE, OSCILLATORY),
+                         OSCILLATORY)
+    stability = np.where(spectral_radius <= 1 + tolerance, STABLE, stability)
+    stability = np.where(equilibria['converged'], stability, NOT_CONVERGED)
+    return {'stability': stability, 'eigenvalues': eigenvalues, 'spectral_radius': spectral_radius}
+
+
+def equilibrium_stability_loss(compiled_web, growth_rates, initial_populations, resources=None,
+                               extinction_threshold=1e-3, extinction_penalty=1.0, unconverged_penalty=10.0):
+    """
+    Scores candidates like optimizer.stability_loss, but from the equilibrium near each candidate's
+    initial populations instead of a simulated tail: how far the spectral radius is above 1, plus
+    extinction_penalty per species the equilibrium has lost.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - growth_rates: (N, species) candidate growth rates.
+    - initial_populations: (N, species) candidate initial populations, used as Newton's starting guess.
+    - resources: Optional resource levels held fixed. Defaults to the compiled ones.
+    - extinction_threshold: Equilibrium populations at or below this count as extinct.
+    - extinction_penalty: Loss added per extinct species.
+    - unconverged_penalty: Loss given to candidates without an equilibrium.
+
+    Returns:
+    - An (N,) array of losses; 0 means every species is alive at a stable equilibrium.
+    """
+    equilibria = find_equilibria(compiled_web, initial_populations, resources, growth_rates)
+    spectral_radius = classify_stability(equilibria)['spectral_radius']
+    extinct_species = (equilibria['populations'] <= extinction_threshold).sum(axis=1)
+    loss = np.maximum(spectral_radius - 1, 0) + extinction_penalty * extinct_species
+    return np.where(equilibria['converged'], loss, unconverged_penalty)
+
+
+## TEST STATEMENTS WHEN I CALL THIS SCRIPT FROM COMMAND LINE
+if __name__ == '__main__':
+    import time
+
+    compiled_web = load_compiled_food_web('food_web.json')
+    rng = np.random.default_rng(0)
+    growth_rates = rng.uniform(0.5, 3.0, size=(10000, len(compiled_web['species_names'])))
+    populations = np.tile(compiled_web['initial_populations'], (len(growth_rates), 1))
+
+    start = time.perf_counter()
+    equilibria = find_equilibria(compiled_web, populations, growth_rates=growth_rates)
+    stability = classify_stability(equilibria)
+    elapsed = time.perf_counter() - start
+    print(f"{len(growth_rates)} parameter sets in {elapsed:.2f} s ({elapsed / len(growth_rates) * 1e6:.0f} us each)")
+    for name, count in zip(STABILITY_CLASSES, np.bincount(stability['stability'], minlength=len(STABILITY_CLASSES))):
+        print(f"{name}: {count}")
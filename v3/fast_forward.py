@@ -0,0 +1,167 @@
+import numpy as np
+
+from compiled_web import dense_relation, initial_state, load_compiled_food_web, row_minimum
+from fast_kernel import kernel_inputs, run_fast_simulation
+
+# Steps simulated between two attempts to find a cycle
+DEFAULT_BLOCK_STEPS = 1024
+# Longest population cycle looked for
+DEFAULT_MAX_PERIOD = 32
+# Relative (and absolute, near 0) difference under which two populations count as equal
+DEFAULT_CYCLE_TOLERANCE = 1e-10
+
+
+def find_cycle(compiled_web, trajectory, max_period, tolerance, consumes=None):
+    """
+    Looks for a population cycle at the end of a recorded trajectory that can be extrapolated.
+
+    The populations must repeat with some period p over the last two periods. Resources may
+    then drift by a constant amount per period (e.g. O2 piling up once its consumers died out), which
+    is extrapolated exactly as long as the drift cannot feed back into the populations:
+    - no resource drifts downwards, so the floor at 0 never kicks in, and
+    - no living species is limited by a drifting resource: each one that consumes such a resource
+      has a prey or a steady resource that is at or below it all through the cycle, so growing it
+      never changes the species' carrying capacity.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - trajectory: (steps, species + resources) states after consecutive steps.
+    - max_period: Longest period tried.
+    - tolerance: Relative / absolute tolerance for two states to match.
+    - consumes: Optional dense (species, resources) 'consumes' mask, so callers looking for cycles
+      block after block densify it only once.
+
+    Returns:
+    - Tuple of (period, resource_drift) for the shortest period that qualifies, or None.
+    """
+    species_count = len(compiled_web['species_names'])
+    if consumes is None:
+        consumes = dense_relation(compiled_web, 'consumes')
+
+    for period in range(1, min(max_period, (len(trajectory) - 1) // 2) + 1):
+        cycle, previous_cycle = trajectory[-period:], trajectory[-2 * period:-period]
+        if not np.allclose(cycle[:, :species_count], previous_cycle[:, :species_count],
+                           rtol=tolerance, atol=tolerance, equal_nan=True):
+            continue
+        resource_steps = cycle[:, species_count:] - previous_cycle[:, species_count:]
+        resource_drift = resource_steps[-1]
+        if not np.all(np.isfinite(resource_drift)):
+            # inf / nan resources stay that way; only a cycle without drift can be trusted
+            resource_drift = np.zeros_like(resource_drift)
+            if not np.allclose(cycle, previous_cycle, rtol=tolerance, atol=tolerance, equal_nan=True):
+                continue
+        if not np.allclose(resource_steps, resource_drift, rtol=tolerance, atol=tolerance):
+            continue
+
+        drifting = np.abs(resource_drift) > tolerance * np.maximum(np.abs(cycle[-1, species_count:]), 1)
+        if not drifting.any():
+            return period, np.zeros_like(resource_drift)
+        if np.any(resource_drift[drifting] < 0):
+            continue
+
+        populations, resources = cycle[:, :species_count], cycle[:, species_count:]
+        steady_limit = np.minimum(
+            row_minimum(compiled_web, populations, 'prey_mask'),
+            np.where(consumes & ~drifting, resources[:, None, :], np.inf).min(axis=-1))
+        drifting_limit = np.where(consumes & drifting, resources[:, None, :], np.inf).min(axis=-1)
+        alive = np.any(populations > 0, axis=0)
+        if np.all(~alive | np.all(steady_limit <= drifting_limit, axis=0)):
+            return period, np.where(drifting, resource_drift, 0)
+    return None
+
+
+def advance(compiled_web, state, n_ticks, growth_rates=None, block_steps=DEFAULT_BLOCK_STEPS,
+            max_period=DEFAULT_MAX_PERIOD, tolerance=DEFAULT_CYCLE_TOLERANCE, backend='auto', prepared_inputs=None):
+    """
+    Fast-forwards an engine state by n_ticks steps, e.g. to catch up a player who was away.
+
+    The state is simulated in blocks with the fast loop kernel, recording only the end of each
+    block. As soon as the populations have settled on a fixed point or a cycle (see find_cycle), the
+    rest of the ticks are skipped by reading the final state off the cycle. Otherwise every tick
+    is simulated, which is still far faster than stepping from Python.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - state: State dictionary ('populations', 'resources', 'step'), single or batched.
+      Batched states are fast-forwarded row by row.
+    - n_ticks: Number of steps to advance.
+    - growth_rates: Optional (species,) growth rates (one row per branch for a batched state).
+    - block_steps: Steps simulated between attempts to find a cycle.
+    - max_period: Longest cycle looked for.
+    - tolerance: How closely a cycle must repeat; the result matches a tick-by-tick run to about this.
+    - backend: Passed to fast_kernel.run_fast_simulation.
+    - prepared_inputs: Optional output of fast_kernel.kernel_inputs(compiled_web), to skip preparing it again.
+
+    Returns:
+    - A new state dictionary n_ticks steps later. Other keys of the state are carried over.
+    """
+    if growth_rates is None:
+        growth_rates = compiled_web['growth_rates']
+    if prepared_inputs is None:
+        prepared_inputs = kernel_inputs(compiled_web)
+    populations = np.asarray(state['populations'], dtype=float)
+    resources = np.asarray(state['resources'], dtype=float)
+
+    if populations.ndim > 1:
+        growth_rates = np.broadcast_to(growth_rates, populations.shape)
+        rows = [advance(compiled_web, {'populations': populations[i], 'resources': resources[i], 'step': 0},
+                        n_ticks, growth_rates[i], block_steps, max_period, tolerance, backend, prepared_inputs)
+                for i in range(len(populations))]
+        return {**state, 'populations': np.stack([row['populations'] for row in rows]),
+                'resources': np.stack([row['resources'] for row in rows]), 'step': state['step'] + n_ticks}
+
+    consumes = prepared_inputs[1]  # the dense 'consumes' mask the kernel reads
+    probe_steps = 2 * max_period + 1
+    remaining = n_ticks
+    while remaining > 0:
+        block = min(block_steps, remaining)
+        remaining -= block
+        if remaining == 0 or block < probe_steps:
+            populations, resources, _ = run_fast_simulation(compiled_web, block, populations, resources,
+                                                            growth_rates, backend=backend,
+                                                            prepared_inputs=prepared_inputs)
+            continue
+
+        populations, resources, _ = run_fast_simulation(compiled_web, block - probe_steps, populations, resources,
+                                                        growth_rates, backend=backend,
+                                                        prepared_inputs=prepared_inputs)
+        populations, resources, trajectory = run_fast_simulation(compiled_web, probe_steps, populations, resources,
+                                                                 growth_rates, record_every=1, backend=backend,
+                                                                 prepared_inputs=prepared_inputs)
+        cycle = find_cycle(compiled_web, trajectory, max_period, tolerance, consumes)
+        if cycle is None:
+            continue
+
+        ## jump: the state `remaining` steps on is the matching phase of the cycle plus the drift
+        period, resource_drift = cycle
+        periods, phase = divmod(remaining, period)
+        if phase:
+            jumped = trajectory[phase - period - 1]
+            periods += 1
+        else:
+            jumped = trajectory[-1]
+        species_count = len(populations)
+        populations = jumped[:species_count].copy()
+        resources = jumped[species_count:] + periods * resource_drift
+        remaining = 0
+
+    return {**state, 'populations': populations, 'resources': resources, 'step': state['step'] + n_ticks}
+
+
+## TEST STATEMENTS WHEN I CALL THIS SCRIPT FROM COMMAND LINE
+if __name__ == '__main__':
+    import time
+
+    compiled_web = load_compiled_food_web('food_web.json')
+    advance(compiled_web, initial_state(compiled_web), 1)  # let Numba compile before timing
+
+    # a day away at 10 ticks per second
+    n_ticks = 24 * 60 * 60 * 10
+    start = time.perf_counter()
+    caught_up = advance(compiled_web, initial_state(compiled_web), n_ticks)
+    elapsed = time.perf_counter() - start
+    populations, resources, _ = run_fast_simulation(compiled_web, n_ticks)
+    fast_forwarded = np.concatenate([caught_up['populations'], caught_up['resources']])
+    stepped = np.concatenate([populations, resources])
+    print(f"{n_ticks} ticks in {elapsed * 1e3:.1f} ms, largest relative difference from a tick-by-tick run: "
+          f"{(np.abs(fast_forwarded - stepped) / np.maximum(np.abs(stepped), 1)).max():.3g}")
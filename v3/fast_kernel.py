@@ -0,0 +1,180 @@
+import numpy as np
+
+from compiled_web import apply_step, dense_relation, load_compiled_food_web
+
+# Numba is optional: without it run_fast_simulation falls back to stepping with NumPy
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    numba = None
+    NUMBA_AVAILABLE = False
+
+
+def prey_lists(compiled_web):
+    """
+    Flattens the predation matrix into per-predator prey lists for the loop kernel.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+
+    Returns:
+    - Tuple of (prey_offsets, prey_indices, prey_weights): predator i eats prey_indices[k] at
+      prey_weights[k] per individual for k in range(prey_offsets[i], prey_offsets[i + 1]).
+    """
+    if compiled_web['sparse']:
+        predation = compiled_web['predation']
+        return predation.indptr.astype(np.int64), predation.indices.astype(np.int64), predation.data
+
+    predators, prey = np.nonzero(compiled_web['prey_mask'])
+    prey_offsets = np.zeros(len(compiled_web['species_names']) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(predators, minlength=len(compiled_web['species_names'])), out=prey_offsets[1:])
+    return prey_offsets, prey.astype(np.int64), compiled_web['predation'][predators, prey]
+
+
+def kernel_inputs(compiled_web):
+    """
+    Prepares the arrays the loop kernel reads, so callers running many short stretches of the
+    same web can build them once and pass them to run_fast_simulation.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+
+    Returns:
+    - Tuple of (resource_exchange, consumes, prey_offsets, prey_indices, prey_weights).
+    """
+    # the species x resources matrices stay small even for huge webs, so the kernel reads them dense;
+    # prey edges go in as CSR-style lists, as a dense species x species matrix would not
+    return (np.ascontiguousarray(dense_relation(compiled_web, 'resource_exchange')),
+            np.ascontiguousarray(dense_relation(compiled_web, 'consumes')), *prey_lists(compiled_web))
+
+
+def step_loop_kernel(time_steps, record_every, populations, resources, growth_rates, resource_exchange,
+                     consumes, prey_offsets, prey_indices, prey_weights, trajectory):
+    """
+    Runs the compiled_web.apply_step update as plain loops, updating populations and resources in place.
+
+    Written so Numba can compile it; it also runs (slowly) as ordinary Python.
+
+    Parameters:
+    - time_steps: Number of steps to run.
+    - record_every: Record the state after every record_every-th step.
+    - populations / resources: (species,) and (resources,) float arrays, overwritten with the final state.
+    - growth_rates, resource_exchange, consumes: Arrays from compile_food_web.
+    - prey_offsets, prey_indices, prey_weights: Output of prey_lists.
+    - trajectory: (time_steps // record_every, species + resources) array to record into (may have 0 rows).
+    """
+    species_count = populations.shape[0]
+    resource_count = resources.shape[0]
+    eaten = np.zeros(species_count)
+    carrying_capacity = np.zeros(species_count)
+    recorded_rows = trajectory.shape[0]
+
+    for t in range(time_steps):
+        ## everyone breathes: update gas / resource levels
+        for j in range(resource_count):
+            change = 0.0
+            for i in range(species_count):
+                change += populations[i] * resource_exchange[i, j]
+            resources[j] = max(resources[j] + change, 0.0)
+
+        ## everyone eats: remove what predators ate
+        for i in range(species_count):
+            eaten[i] = 0.0
+        for i in range(species_count):
+            for k in range(prey_offsets[i], prey_offsets[i + 1]):
+                eaten[prey_indices[k]] += populations[i] * prey_weights[k]
+        for i in range(species_count):
+            populations[i] = max(populations[i] - eaten[i], 0.0)
+
+        ## calculate carrying capacity from consumed resources and available prey
+        for i in range(species_count):
+            capacity = np.inf
+            for j in range(resource_count):
+                if consumes[i, j] and resources[j] < capacity:
+                    capacity = resources[j]
+            for k in range(prey_offsets[i], prey_offsets[i + 1]):
+                if populations[prey_indices[k]] < capacity:
+                    capacity = populations[prey_indices[k]]
+            carrying_capacity[i] = capacity
+
+        ## reproduce
+        for i in range(species_count):
+            if carrying_capacity[i] > 0:
+                population = populations[i]
+                populations[i] = max(population + growth_rates[i] * population * (1 - population / carrying_capacity[i]), 0.0)
+
+        row = (t + 1) // record_every - 1
+        if (t + 1) % record_every == 0 and row < recorded_rows:
+            for i in range(species_count):
+                trajectory[row, i] = populations[i]
+            for j in range(resource_count):
+                trajectory[row, species_count + j] = resources[j]
+
+
+if NUMBA_AVAILABLE:
+    compiled_step_loop_kernel = numba.njit(cache=True)(step_loop_kernel)
+
+
+def run_fast_simulation(compiled_web, time_steps=None, populations=None, resources=None, growth_rates=None,
+                        record_every=None, backend='auto', prepared_inputs=None):
+    """
+    Runs a single long trajectory of the compiled food web as fast as the installed packages allow.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - time_steps: Number of steps to run. Defaults to the compiled 'time_steps'.
+    - populations: Optional (species,) starting populations. Defaults to the compiled initial populations.
+    - resources: Optional (resources,) starting resource levels. Defaults to the compiled initial resources.
+    - growth_rates: Optional (species,) growth rates. Defaults to the compiled growth rates.
+    - record_every: If given, also record the state after every record_every-th step.
+    - backend: 'numba' for the compiled loop kernel, 'numpy' for apply_step, or 'auto' to use Numba
+      when it is installed. Asking for 'numba' without it installed also falls back to NumPy.
+    - prepared_inputs: Optional output of kernel_inputs(compiled_web), to skip preparing it again.
+
+    Returns:
+    - Tuple of (populations, resources, trajectory). trajectory is None unless record_every is given,
+      in which case it is a (time_steps // record_every, species + resources) array. Both backends
+      agree to floating point rounding (they sum predation in a different order).
+    """
+    if time_steps is None:
+        time_steps = compiled_web['time_steps']
+    if populations is None:
+        populations = compiled_web['initial_populations']
+    if resources is None:
+        resources = compiled_web['initial_resources']
+    if growth_rates is None:
+        growth_rates = compiled_web['growth_rates']
+
+    populations = np.array(populations, dtype=float)
+    resources = np.array(resources, dtype=float)
+    growth_rates = np.ascontiguousarray(growth_rates, dtype=float)
+    species_count = len(populations)
+    recorded_rows = time_steps // record_every if record_every else 0
+    trajectory = np.zeros((recorded_rows, species_count + len(resources)))
+
+    if backend != 'numpy' and NUMBA_AVAILABLE:
+        if prepared_inputs is None:
+            prepared_inputs = kernel_inputs(compiled_web)
+        compiled_step_loop_kernel(time_steps, record_every or 1, populations, resources, growth_rates,
+                                  *prepared_inputs, trajectory)
+    else:
+        for t in range(time_steps):
+            populations, resources = apply_step(compiled_web, populations, resources, growth_rates)
+            if record_every and (t + 1) % record_every == 0:
+                trajectory[(t + 1) // record_every - 1] = np.concatenate([populations, resources])
+
+    return populations, resources, trajectory if record_every else None
+
+
+## TEST STATEMENTS WHEN I CALL THIS SCRIPT FROM COMMAND LINE
+if __name__ == '__main__':
+    import time
+
+    compiled_web = load_compiled_food_web('food_web.json')
+    for backend in ['numpy', 'auto']:
+        run_fast_simulation(compiled_web, 1, backend=backend)  # let Numba compile before timing
+        start = time.perf_counter()
+        populations, resources, _ = run_fast_simulation(compiled_web, 100_000, backend=backend)
+        elapsed = time.perf_counter() - start
+        print(f"{backend} (numba installed: {NUMBA_AVAILABLE}): {elapsed / 100_000 * 1e9:.0f} ns/step")
@@ -0,0 +1,81 @@
+import json
+import time
+
+import numpy as np
+
+from compiled_web import apply_step, compile_food_web
+
+
+def generate_food_web(species_count, prey_per_predator=3, producer_fraction=0.2, initial_resource_level=1000,
+                      time_steps=200, seed=None):
+    """
+    Generates a synthetic food web in the same format as food_web.json, for testing at any size.
+
+    The first producer_fraction of the species are producers (consume CO2, produce O2, no prey), like
+    Algae and Small Plants. Every other species consumes O2, produces CO2 and preys on up to
+    prey_per_predator species chosen among those listed before it, so the web has no predation cycles.
+
+    Parameters:
+    - species_count: Number of species.
+    - prey_per_predator: Number of prey of each consumer (fewer for the first consumers if needed).
+    - producer_fraction: Fraction of species that are producers (at least one).
+    - initial_resource_level: Initial CO2 and O2 level.
+    - time_steps: Value for 'simulation_parameters'.
+    - seed: Seed for np.random.default_rng, for reproducible webs.
+
+    Returns:
+    - A food web dictionary with 'simulation_parameters', 'initial_resource_levels' and 'species'.
+    """
+    rng = np.random.default_rng(seed)
+    producer_count = max(int(species_count * producer_fraction), 1)
+    species = []
+
+    for i in range(species_count):
+        is_producer = i < producer_count
+        if is_producer:
+            prey = []
+        else:
+            prey_indices = rng.choice(i, size=min(prey_per_predator, i), replace=False)
+            prey = [f"Species {j}" for j in sorted(prey_indices)]
+        species.append({
+            'name': f"Species {i}",
+            'consumes': ['CO2'] if is_producer else ['O2'],
+            'produces': ['O2'] if is_producer else ['CO2'],
+            'prey': prey,
+            'initial_population': int(rng.integers(1, 16)),
+            'breathe_rate': 1,
+            'growth_rate': round(float(rng.uniform(1.05, 1.5)), 2),
+        })
+
+    return {
+        'simulation_parameters': {'time_steps': time_steps},
+        'initial_resource_levels': {'CO2': initial_resource_level, 'O2': initial_resource_level},
+        'species': species,
+    }
+
+
+def save_food_web(food_web, file_path):
+    """
+    Writes a food web dictionary to a JSON file that load_compiled_food_web can read.
+
+    Parameters:
+    - food_web: Food web dictionary, e.g. from generate_food_web.
+    - file_path: Path of the JSON file to write.
+    """
+    with open(file_path, 'w') as file:
+        json.dump(food_web, file, indent=2)
+
+
+## TEST STATEMENTS WHEN I CALL THIS SCRIPT FROM COMMAND LINE
+if __name__ == '__main__':
+    # time one step of dense and sparse compilations as the web grows
+    for species_count in [100, 1000, 5000]:
+        food_web = generate_food_web(species_count, seed=0)
+        for use_sparse in [False, True]:
+            compiled_web = compile_food_web(food_web, use_sparse=use_sparse)
+            populations, resources = compiled_web['initial_populations'], compiled_web['initial_resources']
+            start = time.perf_counter()
+            for _ in range(10):
+                populations, resources = apply_step(compiled_web, populations, resources)
+            elapsed = (time.perf_counter() - start) / 10
+            print(f"{species_count} species, {'sparse' if use_sparse else 'dense'}: {elapsed * 1e6:.0f} us/step")
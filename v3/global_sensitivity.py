@@ -0,0 +1,329 @@
+import numpy as np
+
+from compiled_web import load_compiled_food_web
+from ensemble import run_ensemble
+
+# SciPy is optional: it is only needed for Sobol sequences
+try:
+    from scipy.stats import qmc
+    SCIPY_AVAILABLE = True
+except ImportError:
+    qmc = None
+    SCIPY_AVAILABLE = False
+
+# Per-species parameters that can be varied, and the compiled vector each one comes from
+PARAMETER_KINDS = {
+    'initial_population': 'initial_populations',
+    'growth_rate': 'growth_rates',
+    'breathe_rate': 'breathe_rates',
+}
+SAMPLING_METHODS = ['sobol', 'lhs', 'random']
+
+
+def parameter_space(compiled_web, kinds=tuple(PARAMETER_KINDS), relative_spread=0.5, bounds=None):
+    """
+    Defines the parameters to vary and their ranges, one per species and kind.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - kinds: Which of PARAMETER_KINDS to vary.
+    - relative_spread: Each parameter ranges over its compiled value * (1 +/- relative_spread).
+    - bounds: Optional dictionary of parameter name (e.g. 'Algae.growth_rate') -> (low, high),
+      overriding the default range.
+
+    Returns:
+    - A dictionary with 'names' (parameters,), 'kinds' (parameters,), 'species' (parameters,) species
+      indexes, and 'lower' / 'upper' (parameters,) bounds.
+    """
+    names, parameter_kinds, species, lower, upper = [], [], [], [], []
+    for kind in kinds:
+        if kind not in PARAMETER_KINDS:
+            raise ValueError(f"unknown parameter kind {kind!r}; expected one of {list(PARAMETER_KINDS)}")
+        nominal = compiled_web[PARAMETER_KINDS[kind]]
+        for i, species_name in enumerate(compiled_web['species_names']):
+            names.append(f"{species_name}.{kind}")
+            parameter_kinds.append(kind)
+            species.append(i)
+            lower.append(nominal[i] * (1 - relative_spread))
+            upper.append(nominal[i] * (1 + relative_spread))
+
+    for name, (low, high) in (bounds or {}).items():
+        if name not in names:
+            raise KeyError(f"unknown parameter '{name}'")
+        lower[names.index(name)], upper[names.index(name)] = low, high
+
+    return {
+        'names': names,
+        'kinds': parameter_kinds,
+        'species': np.array(species, dtype=np.int64),
+        'lower': np.array(lower, dtype=float),
+        'upper': np.array(upper, dtype=float),
+    }
+
+
+def latin_hypercube(sample_count, dimension, rng):
+    """
+    Latin hypercube samples in the unit cube: every column has exactly one sample in each of
+    sample_count equal strata, at a random position within it.
+    """
+    strata = np.argsort(rng.random((sample_count, dimension)), axis=0)
+    return (strata + rng.random((sample_count, dimension))) / sample_count
+
+
+def unit_samples(sample_count, dimension, method='sobol', rng=None):
+    """
+    Draws points in the unit cube [0, 1)^dimension.
+
+    Parameters:
+    - sample_count: Number of points. Sobol sequences are balanced for powers of 2.
+    - dimension: Number of coordinates.
+    - method: 'sobol' (scrambled Sobol sequence, needs scipy), 'lhs' (Latin hypercube) or 'random'.
+    - rng: Optional np.random.Generator.
+
+    Returns:
+    - A (sample_count, dimension) array.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    if method == 'sobol':
+        if not SCIPY_AVAILABLE:
+            raise ImportError("method='sobol' needs scipy; use method='lhs' instead")
+        return qmc.Sobol(dimension, scramble=True, seed=rng).random(sample_count)
+    if method == 'lhs':
+        return latin_hypercube(sample_count, dimension, rng)
+    if method == 'random':
+        return rng.random((sample_count, dimension))
+    raise ValueError(f"unknown sampling method {method!r}; expected one of {SAMPLING_METHODS}")
+
+
+def scale_samples(space, unit_points):
+    """
+    Maps points of the unit cube onto the parameter ranges of a space.
+    """
+    return space['lower'] + unit_points * (space['upper'] - space['lower'])
+
+
+def sample_parameters(space, sample_count, method='sobol', seed=None):
+    """
+    Draws parameter sets that cover a parameter space evenly, instead of a full factorial grid.
+
+    Parameters:
+    - space: Output of parameter_space.
+    - sample_count: Number of parameter sets.
+    - method: See unit_samples.
+    - seed: Optional seed.
+
+    Returns:
+    - A (sample_count, parameters) array of parameter values.
+    """
+    rng = np.random.default_rng(seed)
+    return scale_samples(space, unit_samples(sample_count, len(space['names']), method, rng))
+
+
+def sample_inputs(compiled_web, space, samples):
+    """
+    Turns parameter sets into per-run ensemble inputs, with the compiled values for everything
+    the space does not vary.
+
+    Returns:
+    - A dictionary with (N, species) 'initial_populations', 'growth_rates' and 'breathe_rates'.
+    """
+    inputs = {key: np.tile(compiled_web[key], (len(samples), 1)) for key in PARAMETER_KINDS.values()}
+    for j, (kind, species) in enumerate(zip(space['kinds'], space['species'])):
+        inputs[PARAMETER_KINDS[kind]][:, species] = samples[:, j]
+    return inputs
+
+
+def evaluate_samples(compiled_web, space, samples, time_steps=None, batch_size=4096, extinction_threshold=1e-3,
+                     overflow_threshold=1e12):
+    """
+    Runs one simulation per parameter set, batch_size runs at a time, and extracts the outcomes
+    sensitivity analysis looks at.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - space: Output of parameter_space.
+    - samples: (N, parameters) parameter sets.
+    - time_steps: Number of steps per run. Defaults to the compiled 'time_steps'.
+    - batch_size: Number of runs stepped together (bounds the memory used).
+    - extinction_threshold: Final populations at or below this count as extinct.
+    - overflow_threshold: Final populations are capped here (and nan / inf counted as here) in
+      'log_final_populations', so a few exploding runs do not swamp the variance.
+
+    Returns:
+    - A dictionary of outcomes, one row per run: 'final_populations' (N, species),
+      'log_final_populations' (N, species) log10(1 + capped final population), 'extinct' (N, species)
+      1.0 where the species died out, and 'extinct_species' (N,) how many did.
+    """
+    final_populations = np.empty((len(samples), len(compiled_web['species_names'])))
+    for start in range(0, len(samples), batch_size):
+        inputs = sample_inputs(compiled_web, space, samples[start:start + batch_size])
+        ensemble_results = run_ensemble(compiled_web, time_steps, inputs['initial_populations'],
+                                        growth_rates=inputs['growth_rates'], breathe_rates=inputs['breathe_rates'])
+        final_populations[start:start + batch_size] = ensemble_results['populations']
+
+    capped_populations = np.where(final_populations <= overflow_threshold, final_populations, overflow_threshold)
+    extinct = (final_populations <= extinction_threshold).astype(float)
+    return {
+        'final_populations': final_populations,
+        'log_final_populations': np.log10(1 + capped_populations),
+        'extinct': extinct,
+        'extinct_species': extinct.sum(axis=1),
+    }
+
+
+def saltelli_samples(space, base_count, method='sobol', seed=None):
+    """
+    Builds the parameter sets for estimating Sobol indices (Saltelli's scheme).
+
+    Two independent base matrices A and B of base_count rows are drawn, plus, for every
+    parameter i, the matrix A with column i taken from B. That is base_count * (parameters + 2)
+    runs for first-order and total indices of every parameter.
+
+    Parameters:
+    - space: Output of parameter_space.
+    - base_count: Rows of each base matrix (a power of 2 for method='sobol').
+    - method: See unit_samples.
+    - seed: Optional seed.
+
+    Returns:
+    - A (base_count * (parameters + 2), parameters) array: A, then B, then each A_B^i in turn.
+    """
+    dimension = len(space['names'])
+    rng = np.random.default_rng(seed)
+    points = unit_samples(base_count, 2 * dimension, method, rng)
+    a, b = points[:, :dimension], points[:, dimension:]
+    ab = np.repeat(a[None], dimension, axis=0)
+    ab[np.arange(dimension), :, np.arange(dimension)] = b.T
+    return scale_samples(space, np.concatenate([a, b, ab.reshape(-1, dimension)]))
+
+
+def sobol_indices(outputs, parameter_count):
+    """
+    Estimates first-order and total Sobol indices from the outcomes of saltelli_samples runs.
+
+    The first-order index of a parameter is the share of the outcome's variance it explains on
+    its own; the total index adds every interaction it takes part in, so a parameter with a
+    total index near 0 can be fixed at any value in its range. Estimators are Saltelli et al.
+    (2010) for first-order and Jansen's for total indices.
+
+    Parameters:
+    - outputs: (base_count * (parameters + 2), ...) outcomes, in saltelli_samples order. Trailing
+      dimensions (e.g. one outcome per species) are analysed independently.
+    - parameter_count: Number of parameters.
+
+    Returns:
+    - A dictionary with 'first_order' and 'total' indices, each (parameters, ...). Outcomes that do
+      not vary at all get nan.
+    """
+    outputs = np.asarray(outputs, dtype=float)
+    base_count = len(outputs) // (parameter_count + 2)
+    if base_count * (parameter_count + 2) != len(outputs):
+        raise ValueError("outputs must have base_count * (parameter_count + 2) rows, in saltelli_samples order")
+    f_a, f_b = outputs[:base_count], outputs[base_count:2 * base_count]
+    f_ab = outputs[2 * base_count:].reshape((parameter_count, base_count) + outputs.shape[1:])
+
+    variance = np.var(np.concatenate([f_a, f_b]), axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        first_order = np.mean(f_b * (f_ab - f_a), axis=1) / variance
+        total = 0.5 * np.mean((f_a - f_ab) ** 2, axis=1) / variance
+    return {'first_order': first_order, 'total': total}
+
+
+def morris_samples(space, trajectory_count, levels=4, seed=None):
+    """
+    Builds Morris screening trajectories: each starts at a random point of a levels-point grid
+    and moves one parameter at a time by delta = levels / (2 * (levels - 1)) of its range, in a
+    random order, so every trajectory measures one elementary effect per parameter.
+
+    Parameters:
+    - space: Output of parameter_space.
+    - trajectory_count: Number of trajectories r; r * (parameters + 1) runs in total.
+    - levels: Number of grid levels per parameter (even).
+    - seed: Optional seed.
+
+    Returns:
+    - A (trajectory_count * (parameters + 1), parameters) array, trajectory after trajectory.
+    """
+    dimension = len(space['names'])
+    rng = np.random.default_rng(seed)
+    delta = levels / (2 * (levels - 1))
+    rows = np.arange(trajectory_count)
+
+    # start low and step up, or start delta higher and step down, so every point stays on the grid
+    moves_down = rng.random((trajectory_count, dimension)) < 0.5
+    start = rng.integers(0, levels // 2, (trajectory_count, dimension)) / (levels - 1) + delta * moves_down
+    steps = np.where(moves_down, -delta, delta)
+    order = np.argsort(rng.random((trajectory_count, dimension)), axis=1)
+
+    points = np.empty((trajectory_count, dimension + 1, dimension))
+    points[:, 0] = start
+    for k in range(dimension):
+        points[:, k + 1] = points[:, k]
+        points[rows, k + 1, order[:, k]] += steps[rows, order[:, k]]
+    return scale_samples(space, points.reshape(-1, dimension))
+
+
+def morris_effects(space, samples, outputs):
+    """
+    Computes Morris screening measures from the outcomes of morris_samples runs.
+
+    Parameters:
+    - space: Output of parameter_space.
+    - samples: Output of morris_samples.
+    - outputs: (samples, ...) outcomes of the runs.
+
+    Returns:
+    - A dictionary with, per parameter (parameters, ...):
+      - 'mu_star': mean absolute elementary effect, the overall importance of the parameter.
+      - 'mu': mean signed elementary effect; far below mu_star when the effect changes sign.
+      - 'sigma': standard deviation of the elementary effects; large for parameters that act
+        nonlinearly or through interactions.
+      Elementary effects are outcome changes per unit of the parameter's range.
+    """
+    dimension = len(space['names'])
+    width = space['upper'] - space['lower']
+    unit_points = (samples - space['lower']) / np.where(width > 0, width, 1)
+    unit_points = unit_points.reshape(-1, dimension + 1, dimension)
+    outputs = np.asarray(outputs, dtype=float)
+    outputs = outputs.reshape((len(unit_points), dimension + 1) + outputs.shape[1:])
+
+    ## each step of a trajectory moves one parameter; its effect is the outcome change per unit moved
+    moves = np.diff(unit_points, axis=1)
+    moved = np.argmax(np.abs(moves), axis=-1)
+    move_sizes = np.take_along_axis(moves, moved[..., None], axis=-1)[..., 0]
+    changes = np.diff(outputs, axis=1)
+    extra_dims = (None,) * (outputs.ndim - 2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        effects = np.where((move_sizes != 0)[(...,) + extra_dims], changes / move_sizes[(...,) + extra_dims], 0)
+
+    # put every trajectory's effects in parameter order
+    order = np.argsort(moved, axis=1)
+    effects = np.take_along_axis(effects, order[(...,) + extra_dims], axis=1)
+    return {
+        'mu_star': np.abs(effects).mean(axis=0),
+        'mu': effects.mean(axis=0),
+        'sigma': effects.std(axis=0, ddof=1) if len(effects) > 1 else np.zeros(effects.shape[1:]),
+    }
+
+
+## TEST STATEMENTS WHEN I CALL THIS SCRIPT FROM COMMAND LINE
+if __name__ == '__main__':
+    compiled_web = load_compiled_food_web('food_web.json')
+    space = parameter_space(compiled_web)
+    parameter_count = len(space['names'])
+
+    # a full grid of 10 values per parameter would take 10**parameter_count runs
+    samples = saltelli_samples(space, 256, seed=0)
+    outcomes = evaluate_samples(compiled_web, space, samples)
+    indices = sobol_indices(outcomes['extinct_species'], parameter_count)
+    print(f"Sobol indices for the number of extinct species, from {len(samples)} runs:")
+    for j in np.argsort(indices['total'])[::-1][:8]:
+        print(f"  {space['names'][j]:40s} first order {indices['first_order'][j]:6.3f}   total {indices['total'][j]:6.3f}")
+
+    samples = morris_samples(space, 40, seed=0)
+    outcomes = evaluate_samples(compiled_web, space, samples)
+    effects = morris_effects(space, samples, outcomes['extinct_species'])
+    print(f"Morris screening of the number of extinct species, from {len(samples)} runs:")
+    for j in np.argsort(effects['mu_star'])[::-1][:8]:
+        print(f"  {space['names'][j]:40s} mu* {effects['mu_star'][j]:6.3f}   sigma {effects['sigma'][j]:6.3f}")
@@ -0,0 +1,235 @@
+import numpy as np
+
+from compiled_web import load_compiled_food_web, relation_product, row_minimum
+
+# SciPy is optional: it is only needed for the stiff (implicit Radau) method
+try:
+    from scipy.integrate import solve_ivp
+    SCIPY_AVAILABLE = True
+except ImportError:
+    solve_ivp = None
+    SCIPY_AVAILABLE = False
+
+ODE_METHODS = ['dopri5', 'radau']
+
+## Dormand-Prince 5(4) tableau: the 5th order solution is propagated, the 4th order one estimates the error
+DOPRI_C = np.array([0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1])
+DOPRI_A = [
+    [],
+    [1 / 5],
+    [3 / 40, 9 / 40],
+    [44 / 45, -56 / 15, 32 / 9],
+    [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729],
+    [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656],
+]
+DOPRI_B = np.array([35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84])
+DOPRI_ERROR = np.array([71 / 57600, 0, -71 / 16695, 71 / 1920, -17253 / 339200, 22 / 525, -1 / 40])
+
+
+def food_web_rates(compiled_web, populations, resources, growth_rates):
+    """
+    Rates of change of the continuous-time food web model.
+
+    This is the model the discrete engine steps with a unit forward-Euler step per phase: resources
+    change at populations @ resource_exchange, every predator eats one unit per unit time split
+    across its prey, and populations grow logistically at r*N*(1 - N/K), with K the smallest of
+    the consumed resources and prey (no growth where K <= 0). Populations and resources at 0 do
+    not decrease any further; slightly negative values (from a step overshooting 0) count as 0.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - populations: (..., species) populations.
+    - resources: (..., resources) resource levels.
+    - growth_rates: (species,) or (..., species) growth rates, as per-unit-time rates.
+
+    Returns:
+    - Tuple of (population_rates, resource_rates), shaped like the inputs.
+    """
+    populations, resources = np.maximum(populations, 0), np.maximum(resources, 0)
+    resource_rates = relation_product(compiled_web, populations, 'resource_exchange')
+
+    carrying_capacity = np.minimum(row_minimum(compiled_web, resources, 'consumes'),
+                                   row_minimum(compiled_web, populations, 'prey_mask'))
+    has_capacity = carrying_capacity > 0
+    safe_capacity = np.where(has_capacity, carrying_capacity, 1.0)
+    growth = np.where(has_capacity, growth_rates * populations * (1 - populations / safe_capacity), 0)
+    population_rates = growth - relation_product(compiled_web, populations, 'predation')
+
+    # the floors at 0 of the discrete engine
+    population_rates = np.where((populations <= 0) & (population_rates < 0), 0, population_rates)
+    resource_rates = np.where((resources <= 0) & (resource_rates < 0), 0, resource_rates)
+    return population_rates, resource_rates
+
+
+def integrate_food_web(compiled_web, sample_times, populations=None, resources=None, growth_rates=None,
+                       method='dopri5', rtol=1e-6, atol=1e-9, first_step=None, max_step=np.inf,
+                       max_steps=100_000):
+    """
+    Integrates the continuous-time food web model (see food_web_rates) with adaptive steps,
+    returning the state at the requested times.
+
+    Unlike the unit-step engines, the step size follows the dynamics: smooth stretches are crossed
+    in a few large steps and fast transients get small ones, with the local error kept within
+    rtol / atol. The logistic ODE does not go chaotic or overflow for any growth rate, which the
+    discrete map does for growth rates well above 1.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - sample_times: Increasing times (>= 0) to report the state at; the integration starts at 0.
+    - populations: Optional (..., species) starting populations. Defaults to the compiled ones.
+    - resources: Optional (..., resources) starting levels. Defaults to the compiled ones.
+    - growth_rates: Optional (species,) or (..., species) growth rates. Defaults to the compiled ones.
+    - method: 'dopri5' for the explicit Dormand-Prince 5(4) pair (batched runs are integrated
+      together with a shared step size), or 'radau' for SciPy's implicit Radau IIA(5), which stays
+      stable on stiff webs (e.g. very different breathe and growth rates).
+    - rtol / atol: Relative and absolute local error tolerances.
+    - first_step: Optional first step size. Estimated from the initial rates by default.
+    - max_step: Largest step size allowed.
+    - max_steps: Give up (RuntimeError) after this many accepted and rejected steps.
+
+    Returns:
+    - A dictionary with 'times' (samples,), 'populations' (samples, ..., species), 'resources'
+      (samples, ..., resources), and the cost: 'evaluations' of food_web_rates (for 'radau'
+      including those spent on finite-difference Jacobians), accepted 'steps' and 'rejected' steps
+      ('steps' and 'rejected' are None for 'radau', which SciPy does not report).
+    """
+    if method not in ODE_METHODS:
+        raise ValueError(f"unknown method {method!r}; expected one of {ODE_METHODS}")
+    if populations is None:
+        populations = compiled_web['initial_populations']
+    if resources is None:
+        resources = compiled_web['initial_resources']
+    if growth_rates is None:
+        growth_rates = compiled_web['growth_rates']
+
+    sample_times = np.asarray(sample_times, dtype=float)
+    if np.any(sample_times < 0) or np.any(np.diff(sample_times) < 0):
+        raise ValueError("sample_times must be increasing and not negative")
+    populations = np.asarray(populations, dtype=float)
+    batch_shape = np.broadcast_shapes(populations.shape[:-1], np.shape(resources)[:-1],
+                                      np.shape(growth_rates)[:-1])
+    species_count = populations.shape[-1]
+    state = np.concatenate([np.broadcast_to(populations, batch_shape + (species_count,)),
+                            np.broadcast_to(np.asarray(resources, dtype=float),
+                                            batch_shape + (len(compiled_web['resource_names']),))], axis=-1)
+
+    def rates(y):
+        population_rates, resource_rates = food_web_rates(compiled_web, y[..., :species_count],
+                                                          y[..., species_count:], growth_rates)
+        return np.concatenate([population_rates, resource_rates], axis=-1)
+
+    if method == 'radau':
+        if not SCIPY_AVAILABLE:
+            raise ImportError("method='radau' needs scipy")
+        solution = solve_ivp(lambda t, y: rates(y.reshape(state.shape)).ravel(),
+                             (0.0, sample_times[-1] if len(sample_times) else 0.0), state.ravel(),
+                             method='Radau', t_eval=sample_times, rtol=rtol, atol=atol, max_step=max_step,
+                             first_step=first_step)
+        if not solution.success:
+            raise RuntimeError(f"Radau integration failed: {solution.message}")
+        samples = solution.y.T.reshape((len(sample_times),) + state.shape)
+        evaluations, steps, rejected = solution.nfev, None, None
+    else:
+        samples, evaluations, steps, rejected = integrate_dopri5(rates, state, sample_times, rtol, atol,
+                                                                  first_step, max_step, max_steps)
+
+    return {
+        'times': sample_times,
+        'populations': samples[..., :species_count],
+        'resources': samples[..., species_count:],
+        'evaluations': evaluations,
+        'steps': steps,
+        'rejected': rejected,
+    }
+
+
+def integrate_dopri5(rates, state, sample_times, rtol, atol, first_step, max_step, max_steps):
+    """
+    Adaptive Dormand-Prince 5(4) integration of dy/dt = rates(y) from t = 0.
+
+    Samples that fall inside a step are filled in by cubic Hermite interpolation between the
+    step's end points, so the step size is never cut short to land on a sample time. Accepted
+    states are floored at 0 like the discrete engine's.
+
+    Returns:
+    - Tuple of (samples, evaluations, steps, rejected), samples shaped (len(sample_times),) + state.shape.
+    """
+    samples = np.empty((len(sample_times),) + state.shape)
+    next_sample = np.searchsorted(sample_times, 0.0, side='right')
+    samples[:next_sample] = state
+    end_time = sample_times[-1] if len(sample_times) else 0.0
+
+    def error_norm(error, y, y_new):
+        scale = atol + rtol * np.maximum(np.abs(y), np.abs(y_new))
+        return np.sqrt(np.mean((error / scale) ** 2))
+
+    t, y = 0.0, state
+    k1 = rates(y)
+    evaluations = 1
+    if first_step is None:
+        # step over which the initial rates change y by about 1% of its size
+        first_step = 0.01 * error_norm(y, y, y) / max(error_norm(k1, y, y), 1e-10)
+        first_step = max(min(first_step, end_time, max_step), 1e-6)
+    h = first_step
+    steps = rejected = 0
+
+    while t < end_time:
+        if steps + rejected >= max_steps:
+            raise RuntimeError(f"dopri5 gave up after {max_steps} steps at t={t:.6g}")
+        h = min(h, max_step, end_time - t)
+
+        ## the six stages, then the 5th order solution and the stage at its end (reused next step)
+        stages = [k1]
+        for c, a in zip(DOPRI_C[1:], DOPRI_A[1:]):
+            stages.append(rates(y + h * sum(a_j * k_j for a_j, k_j in zip(a, stages))))
+        y_new = y + h * sum(b_j * k_j for b_j, k_j in zip(DOPRI_B, stages))
+        k7 = rates(y_new)
+        evaluations += 6
+        stages.append(k7)
+        error = h * sum(e_j * k_j for e_j, k_j in zip(DOPRI_ERROR, stages))
+        error_ratio = error_norm(error, y, y_new)
+
+        if not np.isfinite(error_ratio) or error_ratio > 1:
+            rejected += 1
+            h *= 0.2 if not np.isfinite(error_ratio) else max(0.2, 0.9 * error_ratio ** -0.2)
+            continue
+
+        ## accepted: interpolate any sample times inside the step
+        t_new = t + h
+        while next_sample < len(sample_times) and sample_times[next_sample] <= t_new:
+            theta = (sample_times[next_sample] - t) / h
+            samples[next_sample] = ((1 - theta) ** 2 * (1 + 2 * theta) * y + theta ** 2 * (3 - 2 * theta) * y_new
+                                    + h * theta * (1 - theta) * ((1 - theta) * k1 - theta * k7))
+            next_sample += 1
+        if np.any(y_new < 0):
+            y_new = np.maximum(y_new, 0)
+            k7 = rates(y_new)
+            evaluations += 1
+        t, y, k1 = t_new, y_new, k7
+        steps += 1
+        h *= min(5.0, 0.9 * error_ratio ** -0.2) if error_ratio > 0 else 5.0
+
+    return samples, evaluations, steps, rejected
+
+
+## TEST STATEMENTS WHEN I CALL THIS SCRIPT FROM COMMAND LINE
+if __name__ == '__main__':
+    compiled_web = load_compiled_food_web('food_web.json')
+    sample_times = np.arange(0, 201)
+
+    reference = integrate_food_web(compiled_web, sample_times, rtol=1e-10, atol=1e-10)
+    for method in ODE_METHODS:
+        integration = integrate_food_web(compiled_web, sample_times, method=method)
+        error = np.abs(integration['resources'] - reference['resources']).max()
+        print(f"{method}: {integration['evaluations']} evaluations, largest resource error {error:.2g}")
+
+    # forward Euler is what a fixed tick does; see how small its ticks must be to get close
+    for dt in [1.0, 0.1, 0.01]:
+        populations, resources = compiled_web['initial_populations'], compiled_web['initial_resources']
+        for _ in range(int(round(200 / dt))):
+            population_rates, resource_rates = food_web_rates(compiled_web, populations, resources,
+                                                              compiled_web['growth_rates'])
+            populations = np.maximum(populations + dt * population_rates, 0)
+            resources = np.maximum(resources + dt * resource_rates, 0)
+        print(f"fixed ticks of {dt}: {int(round(200 / dt))} evaluations, "
+              f"final resource error {np.abs(resources - reference['resources'][-1]).max():.2g}")
@@ -0,0 +1,189 @@
+import numpy as np
+
+from candidates import child_sequence, generate_candidates
+from compiled_web import load_compiled_food_web
+from ensemble import run_ensemble
+from recording import record_last
+from result_cache import cached_outcomes
+
+
+def stability_loss(population_tail, extinction_threshold=1e-3, extinction_penalty=1.0):
+    """
+    Scores how far each run is from stable populations, in the spirit of v2's evaluate_stability.
+
+    evaluate_stability looks at the sign of the mean change over the last 10% of steps; here the
+    size of that change is used instead, so candidates can be ranked. Extinct species never change,
+    so each one adds extinction_penalty rather than counting as stable.
+
+    Parameters:
+    - population_tail: (N, steps, species) populations over the last steps of each run.
+    - extinction_threshold: Final populations at or below this count as extinct.
+    - extinction_penalty: Loss added per extinct species.
+
+    Returns:
+    - An (N,) array of losses; 0 means every species is alive and not changing.
+    """
+    mean_change = np.diff(population_tail, axis=1).mean(axis=1)
+    relative_change = mean_change / np.maximum(population_tail.mean(axis=1), 1)
+    extinct_species = (population_tail[:, -1, :] <= extinction_threshold).sum(axis=1)
+    return (relative_change ** 2).sum(axis=1) + extinction_penalty * extinct_species
+
+
+def evaluate_candidates(compiled_web, growth_rates, initial_populations, time_steps=None, tail_fraction=0.1,
+                        cache=None):
+    """
+    Simulates a whole batch of candidate parameter sets at once and scores their stability.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - growth_rates: (N, species) candidate growth rates.
+    - initial_populations: (N, species) candidate initial populations.
+    - time_steps: Number of steps per run. Defaults to the compiled 'time_steps'.
+    - tail_fraction: Fraction of the final steps used to judge stability (0.1, as in evaluate_stability).
+    - cache: Optional cache from result_cache.create_result_cache. Candidates scored before (in
+      this search or an earlier one) are looked up instead of simulated.
+
+    Returns:
+    - An (N,) array of stability losses (see stability_loss).
+    """
+    if time_steps is None:
+        time_steps = compiled_web['time_steps']
+    tail_steps = max(int(time_steps * tail_fraction), 2)
+    species_count = len(compiled_web['species_names'])
+
+    def simulate(initial_populations, growth_rates, resources):
+        # only the tail is ever looked at, so only the tail is recorded
+        ensemble_results = run_ensemble(compiled_web, time_steps, initial_populations, resources, growth_rates,
+                                        record_policy=record_last(tail_steps))
+        return stability_loss(ensemble_results['recent_trajectories'][:, :, :species_count])
+
+    if cache is None:
+        return simulate(initial_populations, growth_rates, compiled_web['initial_resources'])
+    return cached_outcomes(cache, compiled_web, f"stability_loss:{tail_fraction}", simulate, time_steps,
+                           initial_populations, growth_rates)
+
+
+def optimize_stability(compiled_web, generations=50, population_size=64, parent_count=None,
+                       growth_rate_delta=0.1, population_delta=10, growth_rate_bounds=(1, 2),
+                       time_steps=None, tolerance=1e-8, seed=None, cache=None):
+    """
+    Searches for growth rates and initial populations that give stable populations, proposing a whole
+    generation of candidates at a time and evaluating them in one batched simulation.
+
+    This replaces v2's optimize_growth_rates, which tweaks and simulates one candidate per iteration.
+    It is a (mu/mu, lambda) evolution strategy: candidates are tweaked around the current mean with
+    per-parameter step sizes by candidates.generate_candidates, the mean moves to a rank-weighted average of the best parent_count
+    candidates, and the step sizes grow after generations that improve on the best loss found so far
+    and shrink otherwise. Growth rates are clamped to growth_rate_bounds and initial populations to
+    whole numbers of at least 1, as v2 does.
+
+    Each generation's candidates are drawn from their own child of the seed's SeedSequence (see
+    candidates.child_sequence), so a worker that knows the seed, the generation and the current mean
+    and step sizes can generate any block of them with candidates.candidate_block.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web. Its growth rates and initial populations are the starting mean.
+    - generations: Maximum number of generations.
+    - population_size: Candidates evaluated per generation.
+    - parent_count: Candidates recombined into the next mean. Defaults to population_size // 4.
+    - growth_rate_delta / population_delta: Initial step sizes (the tweak sizes used by tweak_species_info).
+    - growth_rate_bounds: (min, max) allowed growth rate.
+    - time_steps: Number of steps per run. Defaults to the compiled 'time_steps'.
+    - tolerance: Stop as soon as a candidate's loss is at or below this.
+    - seed: Seed (an int or np.random.SeedSequence), for reproducible searches.
+    - cache: Optional cache from result_cache.create_result_cache, so candidates proposed again
+      (clamped to the same bounds, or by a rerun of the search) are not simulated again.
+
+    Returns:
+    - Dictionary with the best 'growth_rates', 'initial_populations' and 'loss' found (the clamped
+      starting point if no candidate beats it), the number of 'generations' run and the best loss
+      of each generation in 'history' (nan for a generation in which every run blew up).
+    """
+    seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    if parent_count is None:
+        parent_count = max(population_size // 4, 1)
+    species_count = len(compiled_web['species_names'])
+
+    # log-rank recombination weights, best candidate first
+    weights = np.log(parent_count + 0.5) - np.log(np.arange(1, parent_count + 1))
+    weights /= weights.sum()
+
+    step_sizes = np.concatenate([np.full(species_count, growth_rate_delta, dtype=float),
+                                 np.full(species_count, population_delta, dtype=float)])
+    lower_bounds = np.concatenate([np.full(species_count, growth_rate_bounds[0]), np.ones(species_count)])
+    upper_bounds = np.concatenate([np.full(species_count, growth_rate_bounds[1]), np.full(species_count, np.inf)])
+
+    def constrain(candidates):
+        candidates = np.clip(candidates, lower_bounds, upper_bounds)
+        candidates[..., species_count:] = np.round(candidates[..., species_count:])
+        return candidates
+
+    # the starting point is the best found until a candidate beats it
+    mean = constrain(np.concatenate([compiled_web['growth_rates'], compiled_web['initial_populations']]))
+    best_candidate = mean.copy()
+    best_loss = evaluate_candidates(compiled_web, mean[None, :species_count], mean[None, species_count:], time_steps,
+                                    cache=cache)[0]
+    history = []
+    generation = 0
+
+    while generation < generations and not best_loss <= tolerance:  # a nan loss keeps searching
+        tweaked_growth_rates, tweaked_populations = generate_candidates(
+            compiled_web, population_size, child_sequence(seed_sequence, generation),
+            growth_rate_delta=step_sizes[:species_count], population_delta=step_sizes[species_count:],
+            growth_rates=mean[:species_count], initial_populations=mean[species_count:])
+        candidates = constrain(np.concatenate([tweaked_growth_rates, tweaked_populations], axis=1))
+        generation += 1
+        losses = evaluate_candidates(compiled_web, candidates[:, :species_count], candidates[:, species_count:],
+                                     time_steps, cache=cache)
+        finite_count = np.count_nonzero(~np.isnan(losses))
+        if finite_count == 0:
+            # every run blew up: search closer to the mean
+            history.append(np.nan)
+            step_sizes *= 0.85
+            continue
+
+        ranking = np.argsort(losses)  # nan losses sort last
+        best_index = np.nanargmin(losses)
+        history.append(losses[best_index])
+
+        if losses[best_index] < best_loss or np.isnan(best_loss):
+            best_candidate, best_loss = candidates[best_index].copy(), losses[best_index]
+            step_sizes *= 1.2
+        else:
+            step_sizes *= 0.85
+
+        parents = ranking[:min(parent_count, finite_count)]
+        mean = (weights[:len(parents)] / weights[:len(parents)].sum()) @ candidates[parents]
+
+    return {
+        'growth_rates': best_candidate[:species_count],
+        'initial_populations': best_candidate[species_count:],
+        'loss': best_loss,
+        'generations': generation,
+        'history': history,
+    }
+
+
+def update_species_info(species_info, growth_rates, initial_populations):
+    """
+    Writes optimized parameters back into a list of species dictionaries.
+
+    Parameters:
+    - species_info: List of species dictionaries, in compiled species order.
+    - growth_rates: (species,) growth rates.
+    - initial_populations: (species,) initial populations.
+
+    Returns:
+    - A new list of species dictionaries; the input list is not modified.
+    """
+    return [{**species, 'growth_rate': float(growth_rate), 'initial_population': int(initial_population)}
+            for species, growth_rate, initial_population in zip(species_info, growth_rates, initial_populations)]
+
+
+## TEST STATEMENTS WHEN I CALL THIS SCRIPT FROM COMMAND LINE
+if __name__ == '__main__':
+    compiled_web = load_compiled_food_web('food_web.json')
+    optimization = optimize_stability(compiled_web, seed=0)
+    print(f"best loss {optimization['loss']:.3g} after {optimization['generations']} generations")
+    print(dict(zip(compiled_web['species_names'], np.round(optimization['growth_rates'], 3).tolist())))
+    print(dict(zip(compiled_web['species_names'], optimization['initial_populations'].tolist())))
@@ -0,0 +1,132 @@
+import time
+
+import numpy as np
+
+from compiled_web import breathe, eat, load_compiled_food_web, reproduce
+
+# The phases of compiled_web.apply_step, in the order they run
+PHASES = ['breathing', 'predation', 'growth']
+
+
+def create_phase_profile():
+    """
+    Creates an empty per-phase profile to pass to run_ensemble(profile=...).
+
+    Returns:
+    - A profile dictionary: 'phases' maps each phase to its cumulative 'seconds' and 'calls',
+      'steps' counts ensemble steps and 'run_steps' counts steps summed over every active run.
+    """
+    return {
+        'phases': {phase: {'seconds': 0.0, 'calls': 0} for phase in PHASES},
+        'steps': 0,
+        'run_steps': 0,
+    }
+
+
+def profiled_step(compiled_web, populations, resources, growth_rates, profile, breathe_rates=None):
+    """
+    Same as compiled_web.apply_step, timing each phase into a profile.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - populations: (..., species) populations.
+    - resources: (..., resources) resource levels.
+    - growth_rates: (species,) or (..., species) growth rates, or None for the compiled ones.
+    - profile: Profile dictionary from create_phase_profile, updated in place.
+    - breathe_rates: Optional (species,) or (..., species) breathe rates replacing the compiled ones.
+
+    Returns:
+    - Tuple of (new_populations, new_resources).
+    """
+    if growth_rates is None:
+        growth_rates = compiled_web['growth_rates']
+    phases = profile['phases']
+
+    start = time.perf_counter()
+    resources = breathe(compiled_web, populations, resources, breathe_rates)
+    breathed = time.perf_counter()
+    populations = eat(compiled_web, populations)
+    eaten = time.perf_counter()
+    populations = reproduce(compiled_web, populations, resources, growth_rates)
+    grown = time.perf_counter()
+
+    phases['breathing']['seconds'] += breathed - start
+    phases['predation']['seconds'] += eaten - breathed
+    phases['growth']['seconds'] += grown - eaten
+    for phase in PHASES:
+        phases[phase]['calls'] += 1
+    profile['steps'] += 1
+    profile['run_steps'] += int(np.prod(populations.shape[:-1]))
+    return populations, resources
+
+
+def merge_profiles(profiles):
+    """
+    Adds up profiles, e.g. from several runs or from the workers of a parameter sweep.
+
+    Parameters:
+    - profiles: Iterable of profile dictionaries.
+
+    Returns:
+    - A new profile dictionary with every count and time summed.
+    """
+    merged = create_phase_profile()
+    for profile in profiles:
+        for phase in PHASES:
+            merged['phases'][phase]['seconds'] += profile['phases'][phase]['seconds']
+            merged['phases'][phase]['calls'] += profile['phases'][phase]['calls']
+        merged['steps'] += profile['steps']
+        merged['run_steps'] += profile['run_steps']
+    return merged
+
+
+def profile_summary(profile):
+    """
+    Summarizes where step time went.
+
+    Parameters:
+    - profile: Profile dictionary.
+
+    Returns:
+    - Dictionary mapping each phase to its total 'seconds', 'calls', 'share' of the step time,
+      'seconds_per_call' and 'seconds_per_run_step' (amortized over every run in the ensemble).
+    """
+    total_seconds = sum(profile['phases'][phase]['seconds'] for phase in PHASES)
+    summary = {}
+    for phase in PHASES:
+        seconds, calls = profile['phases'][phase]['seconds'], profile['phases'][phase]['calls']
+        summary[phase] = {
+            'seconds': seconds,
+            'calls': calls,
+            'share': seconds / total_seconds if total_seconds else 0.0,
+            'seconds_per_call': seconds / calls if calls else 0.0,
+            'seconds_per_run_step': seconds / profile['run_steps'] if profile['run_steps'] else 0.0,
+        }
+    return summary
+
+
+def print_profile(profile):
+    """
+    Prints profile_summary as a table.
+
+    Parameters:
+    - profile: Profile dictionary.
+    """
+    print(f"{'phase':<10} {'seconds':>10} {'calls':>8} {'share':>7} {'us/call':>10} {'ns/run-step':>12}")
+    for phase, phase_summary in profile_summary(profile).items():
+        print(f"{phase:<10} {phase_summary['seconds']:>10.4f} {phase_summary['calls']:>8} "
+              f"{phase_summary['share']:>6.1%} {phase_summary['seconds_per_call'] * 1e6:>10.1f} "
+              f"{phase_summary['seconds_per_run_step'] * 1e9:>12.1f}")
+
+
+## TEST STATEMENTS WHEN I CALL THIS SCRIPT FROM COMMAND LINE
+if __name__ == '__main__':
+    from ensemble import run_ensemble
+    from generate_web import generate_food_web
+    from compiled_web import compile_food_web
+
+    for compiled_web in [load_compiled_food_web('food_web.json'), compile_food_web(generate_food_web(2000, seed=0))]:
+        profile = create_phase_profile()
+        run_ensemble(compiled_web, 100, np.tile(compiled_web['initial_populations'], (100, 1)), profile=profile)
+        print(f"{len(compiled_web['species_names'])} species, 100 runs:")
+        print_profile(profile)
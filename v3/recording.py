@@ -0,0 +1,183 @@
+import numpy as np
+
+from compact_storage import RECORD_FORMATS, encode_values
+from compiled_web import load_compiled_food_web
+
+# What run_ensemble can keep of each run besides its final state
+RECORD_POLICIES = ['final', 'every', 'last', 'statistics']
+
+
+def record_final():
+    """
+    Recording policy that keeps nothing but the final state (which run_ensemble always returns).
+    """
+    return {'policy': 'final'}
+
+
+def record_every(every=1):
+    """
+    Recording policy that keeps the state after every `every`-th step, as 'trajectories'
+    shaped (N, time_steps // every, species + resources). record_every(1) keeps every step.
+    """
+    if every < 1:
+        raise ValueError("every must be at least 1")
+    return {'policy': 'every', 'every': every}
+
+
+def record_last(window):
+    """
+    Recording policy that keeps only the last `window` steps, as 'recent_trajectories' shaped
+    (N, min(window, time_steps), species + resources), oldest first. Since the number of steps is
+    known up front, the window's slots are only written once the run reaches them.
+    """
+    if window < 1:
+        raise ValueError("window must be at least 1")
+    return {'policy': 'last', 'window': window}
+
+
+def record_statistics():
+    """
+    Recording policy that keeps streaming per-column statistics over all steps (Welford's
+    algorithm): 'statistics' with 'mean', 'variance', 'min' and 'max', each (N, species + resources).
+    Runs that hit inf / nan get nan means and variances.
+    """
+    return {'policy': 'statistics'}
+
+
+def create_recorder(policy, ensemble_size, time_steps, column_count, record_format='float64'):
+    """
+    Allocates what a recording policy needs, and nothing more.
+
+    Parameters:
+    - policy: Dictionary from one of the record_* functions.
+    - ensemble_size: Number of runs N.
+    - time_steps: Number of steps the ensemble runs.
+    - column_count: species + resources.
+    - record_format: Storage format of recorded states (see compact_storage.RECORD_FORMATS).
+      Statistics are always kept as float64.
+
+    Returns:
+    - A recorder dictionary for record_state / freeze_rows / recorder_results.
+    """
+    if policy['policy'] not in RECORD_POLICIES:
+        raise ValueError(f"unknown recording policy {policy['policy']!r}; expected one of {RECORD_POLICIES}")
+    recorder = {'policy': policy, 'time_steps': time_steps, 'record_format': record_format}
+    if policy['policy'] == 'every':
+        recorder['states'] = np.zeros((ensemble_size, time_steps // policy['every'], column_count),
+                                      dtype=RECORD_FORMATS[record_format])
+    elif policy['policy'] == 'last':
+        recorder['states'] = np.zeros((ensemble_size, min(policy['window'], time_steps), column_count),
+                                      dtype=RECORD_FORMATS[record_format])
+    elif policy['policy'] == 'statistics':
+        recorder['count'] = np.zeros(ensemble_size)
+        recorder['mean'] = np.zeros((ensemble_size, column_count))
+        recorder['squared_deviations'] = np.zeros((ensemble_size, column_count))
+        recorder['min'] = np.full((ensemble_size, column_count), np.inf)
+        recorder['max'] = np.full((ensemble_size, column_count), -np.inf)
+    return recorder
+
+
+def record_state(recorder, rows, t, populations, resources):
+    """
+    Records the state of some runs after step t (0-based).
+
+    Parameters:
+    - recorder: Recorder dictionary from create_recorder.
+    - rows: (n,) original rows of the runs being recorded.
+    - t: Index of the step just taken.
+    - populations / resources: (n, species) and (n, resources) states after it.
+    """
+    policy = recorder['policy']
+    if policy['policy'] == 'final':
+        return
+    if policy['policy'] == 'every':
+        if (t + 1) % policy['every'] == 0:
+            slot = (t + 1) // policy['every'] - 1
+            species_count = populations.shape[1]
+            recorder['states'][rows, slot, :species_count] = encode_values(populations, recorder['record_format'])
+            recorder['states'][rows, slot, species_count:] = encode_values(resources, recorder['record_format'])
+    elif policy['policy'] == 'last':
+        first_recorded_step = recorder['time_steps'] - recorder['states'].shape[1]
+        if t >= first_recorded_step:
+            slot = t - first_recorded_step
+            species_count = populations.shape[1]
+            recorder['states'][rows, slot, :species_count] = encode_values(populations, recorder['record_format'])
+            recorder['states'][rows, slot, species_count:] = encode_values(resources, recorder['record_format'])
+    else:
+        add_to_statistics(recorder, rows, np.concatenate([populations, resources], axis=1), 1)
+
+
+def add_to_statistics(recorder, rows, states, repeats):
+    """
+    Folds `repeats` copies of each row's state into its running statistics (Chan et al.'s
+    pairwise update, which for repeats == 1 is Welford's).
+    """
+    count = recorder['count'][rows]
+    new_count = count + repeats
+    with np.errstate(invalid='ignore'):
+        delta = states - recorder['mean'][rows]
+        recorder['mean'][rows] += delta * (repeats / new_count)[:, None]
+        recorder['squared_deviations'][rows] += delta ** 2 * (count * repeats / new_count)[:, None]
+    recorder['count'][rows] = new_count
+    recorder['min'][rows] = np.minimum(recorder['min'][rows], states)
+    recorder['max'][rows] = np.maximum(recorder['max'][rows], states)
+
+
+def freeze_rows(recorder, rows, steps_taken, populations, resources):
+    """
+    Records runs that stopped early as if they kept their final state for the remaining steps,
+    so every policy describes the same time_steps-long trajectory.
+
+    Parameters:
+    - recorder: Recorder dictionary from create_recorder.
+    - rows: (n,) original rows of the stopped runs.
+    - steps_taken: Number of steps they took.
+    - populations / resources: Their (n, species) and (n, resources) final states.
+    """
+    policy = recorder['policy']
+    remaining_steps = recorder['time_steps'] - steps_taken
+    if policy['policy'] == 'final' or remaining_steps <= 0:
+        return
+    if policy['policy'] == 'statistics':
+        add_to_statistics(recorder, rows, np.concatenate([populations, resources], axis=1), remaining_steps)
+        return
+
+    state = encode_values(np.concatenate([populations, resources], axis=1), recorder['record_format'])
+    if policy['policy'] == 'every':
+        first_slot = steps_taken // policy['every']  # slot of the first recorded step after stopping
+    else:
+        first_slot = max(steps_taken - (recorder['time_steps'] - recorder['states'].shape[1]), 0)
+    recorder['states'][rows, first_slot:] = state[:, None, :]
+
+
+def recorder_results(recorder):
+    """
+    Returns what a recorder kept, as entries for run_ensemble's results: 'trajectories' for
+    record_every, 'recent_trajectories' for record_last, 'statistics' for record_statistics and
+    nothing for record_final.
+    """
+    policy = recorder['policy']['policy']
+    if policy == 'every':
+        return {'trajectories': recorder['states']}
+    if policy == 'last':
+        return {'recent_trajectories': recorder['states']}
+    if policy == 'statistics':
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variance = recorder['squared_deviations'] / recorder['count'][:, None]
+        return {'statistics': {'mean': recorder['mean'], 'variance': variance,
+                               'min': recorder['min'], 'max': recorder['max']}}
+    return {}
+
+
+## TEST STATEMENTS WHEN I CALL THIS SCRIPT FROM COMMAND LINE
+if __name__ == '__main__':
+    from ensemble import run_ensemble
+
+    compiled_web = load_compiled_food_web('food_web.json')
+    populations = np.tile(compiled_web['initial_populations'], (10000, 1))
+    for record_policy in [record_every(1), record_every(10), record_last(20), record_statistics(), record_final()]:
+        ensemble_results = run_ensemble(compiled_web, 200, populations, record_policy=record_policy)
+        kept = {key: value for key, value in ensemble_results.items()
+                if key in ['trajectories', 'recent_trajectories', 'statistics']}
+        kept_bytes = sum(value.nbytes for value in kept.get('statistics', kept).values())
+        print(f"{record_policy}: {kept_bytes / 1e6:.1f} MB recorded")
@@ -0,0 +1,252 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from compiled_web import load_compiled_food_web, run_compiled_simulation
+
+
+def create_result_cache(max_entries=256, cache_dir=None):
+    """
+    Creates an empty simulation result cache.
+
+    Parameters:
+    - max_entries: Number of results kept in memory; the least recently used result is dropped first.
+    - cache_dir: Optional directory for an on-disk tier. Results are written there as <key>.npy and
+      looked up when they are not in memory, so they survive between runs.
+
+    Returns:
+    - A cache dictionary to pass to cached_simulation or cached_outcomes. 'hits', 'disk_hits' and
+      'misses' count lookups.
+    """
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+    return {
+        'entries': OrderedDict(),
+        'max_entries': max_entries,
+        'cache_dir': cache_dir,
+        'hits': 0,
+        'disk_hits': 0,
+        'misses': 0,
+    }
+
+
+# Per-run inputs; they are hashed per run, everything else in a compiled web once per call
+RUN_INPUTS = ['initial_populations', 'initial_resources', 'growth_rates']
+
+
+def update_digest(digest, name, array):
+    array = np.ascontiguousarray(array)
+    digest.update(f"{name}:{array.dtype.str}:{array.shape}".encode())
+    digest.update(array.tobytes())
+
+
+def web_key(compiled_web):
+    """
+    Computes a canonical hash of a compiled food web without its per-run inputs (RUN_INPUTS), so
+    the runs of a batch can share it.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+
+    Returns:
+    - A hex SHA-256 digest of the names, relation matrices and breathe rates.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([compiled_web['species_names'], compiled_web['resource_names'],
+                              compiled_web['sparse']]).encode())
+
+    arrays = {}
+    for key, value in compiled_web.items():
+        if key in RUN_INPUTS:
+            continue
+        if isinstance(value, np.ndarray):
+            arrays[key] = value
+        elif hasattr(value, 'indptr'):
+            # sparse relation matrices are hashed through their CSR components
+            arrays[f"{key}.data"] = value.data
+            arrays[f"{key}.indices"] = value.indices
+            arrays[f"{key}.indptr"] = value.indptr
+    for key in sorted(arrays):
+        update_digest(digest, key, arrays[key])
+    return digest.hexdigest()
+
+
+def simulation_key(compiled_web, time_steps, populations=None, resources=None, growth_rates=None,
+                   outcome='trajectory', shared_key=None):
+    """
+    Computes a canonical hash of everything that determines a simulation's result.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - time_steps: Number of steps to run.
+    - populations: Optional starting populations overriding the compiled initial populations.
+    - resources: Optional starting resource levels overriding the compiled initial resources.
+    - growth_rates: Optional growth rates overriding the compiled ones.
+    - outcome: Name of what is computed from the run (with any settings it depends on), so different
+      outcomes of the same run get different keys.
+    - shared_key: Optional web_key(compiled_web), to skip hashing the web again.
+
+    Returns:
+    - A hex SHA-256 digest. Two calls give the same key exactly when the compiled arrays, names,
+      starting state, growth rates, number of steps and outcome are identical; passing the
+      compiled values explicitly gives the same key as leaving them out.
+    """
+    run_inputs = {'initial_populations': populations, 'initial_resources': resources, 'growth_rates': growth_rates}
+    digest = hashlib.sha256()
+    digest.update(json.dumps([shared_key or web_key(compiled_web), outcome, int(time_steps)]).encode())
+    for key in RUN_INPUTS:
+        values = compiled_web[key] if run_inputs[key] is None else run_inputs[key]
+        update_digest(digest, key, np.asarray(values, dtype=float))
+    return digest.hexdigest()
+
+
+def lookup_entry(cache, key):
+    """
+    Returns the cached result for a key, from memory or the disk tier, or None if it is not cached.
+    Hits are counted here; misses are counted by the caller, which simulates.
+    """
+    entries = cache['entries']
+    if key in entries:
+        cache['hits'] += 1
+        entries.move_to_end(key)
+        return entries[key]
+
+    disk_path = os.path.join(cache['cache_dir'], f"{key}.npy") if cache['cache_dir'] is not None else None
+    if disk_path is None or not os.path.exists(disk_path):
+        return None
+    cache['disk_hits'] += 1
+    results = np.load(disk_path)
+    remember_entry(cache, key, results, write_to_disk=False)
+    return results
+
+
+def remember_entry(cache, key, results, write_to_disk=True):
+    """
+    Stores a result in memory (dropping the least recently used entry when full) and, if the cache
+    has a disk tier, on disk. The result is made read-only, as it is shared with the cache.
+    """
+    if write_to_disk and cache['cache_dir'] is not None:
+        # write then rename so a crash never leaves a half-written entry behind
+        disk_path = os.path.join(cache['cache_dir'], f"{key}.npy")
+        temporary_path = f"{disk_path}.{os.getpid()}.tmp"
+        with open(temporary_path, 'wb') as file:
+            np.save(file, results)
+        os.replace(temporary_path, disk_path)
+
+    results.flags.writeable = False
+    entries = cache['entries']
+    entries[key] = results
+    if len(entries) > cache['max_entries']:
+        entries.popitem(last=False)
+
+
+def cached_simulation(cache, compiled_web, time_steps=None, populations=None, resources=None, growth_rates=None):
+    """
+    Returns run_compiled_simulation's result, simulating only when the same inputs have not been seen.
+
+    Parameters:
+    - cache: Cache dictionary from create_result_cache.
+    - compiled_web: Output of compile_food_web.
+    - time_steps: Number of steps to run. Defaults to the compiled 'time_steps'.
+    - populations: Optional starting populations.
+    - resources: Optional starting resource levels.
+    - growth_rates: Optional growth rates. Default to the compiled ones.
+
+    Returns:
+    - The (time_steps, species + resources) results array. It is shared with the cache, so it is read-only.
+    """
+    if time_steps is None:
+        time_steps = compiled_web['time_steps']
+    key = simulation_key(compiled_web, time_steps, populations, resources, growth_rates)
+    results = lookup_entry(cache, key)
+    if results is None:
+        cache['misses'] += 1
+        if growth_rates is not None:
+            compiled_web = {**compiled_web, 'growth_rates': np.asarray(growth_rates, dtype=float)}
+        results = run_compiled_simulation(compiled_web, time_steps, populations, resources)
+        remember_entry(cache, key, results)
+    return results
+
+
+def cached_outcomes(cache, compiled_web, outcome, evaluate, time_steps, populations, growth_rates, resources=None):
+    """
+    Returns one outcome per run of a batch, evaluating only the runs whose inputs have not been seen,
+    e.g. the candidates an optimizer proposes again.
+
+    Runs repeated within the batch are evaluated once (and count as hits after the first); the
+    others are looked up one by one and the missing ones evaluated together as one smaller batch.
+
+    Parameters:
+    - cache: Cache dictionary from create_result_cache.
+    - compiled_web: Output of compile_food_web.
+    - outcome: Name of the outcome and its settings, e.g. 'stability_loss:0.1' (see simulation_key).
+    - evaluate: Function (populations, growth_rates, resources) -> (M, ...) outcomes of M runs.
+    - time_steps: Number of steps per run (part of the key).
+    - populations: (N, species) or (species,) starting populations.
+    - growth_rates: (N, species) or (species,) growth rates.
+    - resources: Optional (N, resources) or (resources,) starting levels. Defaults to the compiled ones.
+
+    Returns:
+    - An (N, ...) array of outcomes.
+    """
+    if resources is None:
+        resources = compiled_web['initial_resources']
+    populations, growth_rates, resources = (np.atleast_2d(np.asarray(values, dtype=float))
+                                            for values in (populations, growth_rates, resources))
+    run_count = max(len(populations), len(growth_rates), len(resources))
+    populations, growth_rates, resources = (np.broadcast_to(values, (run_count, values.shape[1]))
+                                            for values in (populations, growth_rates, resources))
+
+    shared_key = web_key(compiled_web)
+    keys = [simulation_key(compiled_web, time_steps, populations[row], resources[row], growth_rates[row], outcome,
+                           shared_key) for row in range(run_count)]
+    results = [lookup_entry(cache, key) for key in keys]
+    missing_rows = {}  # key -> rows waiting for it
+    for row, (key, result) in enumerate(zip(keys, results)):
+        if result is None:
+            missing_rows.setdefault(key, []).append(row)
+
+    if missing_rows:
+        first_rows = [rows[0] for rows in missing_rows.values()]
+        cache['misses'] += len(first_rows)
+        cache['hits'] += run_count - sum(result is not None for result in results) - len(first_rows)
+        evaluated = evaluate(populations[first_rows], growth_rates[first_rows], resources[first_rows])
+        for (key, rows), result in zip(missing_rows.items(), evaluated):
+            result = np.array(result)
+            remember_entry(cache, key, result)
+            for row in rows:
+                results[row] = result
+    return np.stack(results)
+
+
+def cache_statistics(cache):
+    """
+    Summarizes how well the cache is doing.
+
+    Parameters:
+    - cache: Cache dictionary from create_result_cache.
+
+    Returns:
+    - Dictionary with hit / miss counts, the in-memory entry count and the overall hit rate.
+    """
+    lookups = cache['hits'] + cache['disk_hits'] + cache['misses']
+    return {
+        'hits': cache['hits'],
+        'disk_hits': cache['disk_hits'],
+        'misses': cache['misses'],
+        'entries': len(cache['entries']),
+        'hit_rate': (cache['hits'] + cache['disk_hits']) / lookups if lookups else 0.0,
+    }
+
+
+## TEST STATEMENTS WHEN I CALL THIS SCRIPT FROM COMMAND LINE
+if __name__ == '__main__':
+    compiled_web = load_compiled_food_web('food_web.json')
+    cache = create_result_cache()
+    for growth_rate in [1.0, 1.0, 1.2, 1.0]:
+        compiled_web['growth_rates'] = np.full(len(compiled_web['species_names']), growth_rate)
+        cached_simulation(cache, compiled_web)
+    print(cache_statistics(cache))
@@ -0,0 +1,211 @@
+import numpy as np
+
+from compiled_web import dense_food_web, load_compiled_food_web
+from result_cache import cached_outcomes
+
+
+def apply_step_with_tangents(compiled_web, populations, resources, population_tangents, resource_tangents,
+                             growth_rates=None):
+    """
+    Advances the state by one step like compiled_web.apply_step, and carries the derivatives of the
+    state with respect to every species' growth rate along with it (forward-mode tangent propagation).
+
+    The floors at 0 and the min() in the carrying capacity are piecewise linear; their derivative is
+    taken from the branch that is active at this step. Tangents are (species x species) per run
+    anyway, so sparse compiled webs are handled by densifying them (see dense_food_web). Callers
+    stepping a sparse web many times should densify it once and pass the dense web, as
+    stability_loss_and_gradient does.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - populations: (..., species) populations.
+    - resources: (..., resources) resource levels.
+    - population_tangents: (..., species, species) d populations[i] / d growth_rates[k].
+    - resource_tangents: (..., resources, species) d resources[j] / d growth_rates[k].
+    - growth_rates: Optional (species,) or (..., species) growth rates. Defaults to the compiled ones.
+
+    Returns:
+    - Tuple of (populations, resources, population_tangents, resource_tangents) one step later.
+    """
+    if growth_rates is None:
+        growth_rates = compiled_web['growth_rates']
+    growth_rates = np.broadcast_to(growth_rates, populations.shape)
+    compiled_web = dense_food_web(compiled_web)
+
+    ## everyone breathes: update gas / resource levels
+    breathed = resources + populations @ compiled_web['resource_exchange']
+    resource_tangents = resource_tangents + np.einsum('ij,...ik->...jk', compiled_web['resource_exchange'],
+                                                      population_tangents)
+    resource_tangents = np.where((breathed > 0)[..., None], resource_tangents, 0)
+    resources = np.maximum(breathed, 0)
+
+    ## everyone eats: remove what predators ate
+    fed = populations - populations @ compiled_web['predation']
+    population_tangents = population_tangents - np.einsum('ij,...ik->...jk', compiled_web['predation'],
+                                                          population_tangents)
+    population_tangents = np.where((fed > 0)[..., None], population_tangents, 0)
+    populations = np.maximum(fed, 0)
+
+    ## calculate carrying capacity from consumed resources and available prey, remembering which one it was
+    limit_mask = np.concatenate([compiled_web['consumes'], compiled_web['prey_mask']], axis=1)
+    limits = np.concatenate([resources, populations], axis=-1)
+    masked_limits = np.where(limit_mask, limits[..., None, :], np.inf)
+    limiting = masked_limits.argmin(axis=-1)
+    carrying_capacity = np.take_along_axis(masked_limits, limiting[..., None], axis=-1)[..., 0]
+    limit_tangents = np.concatenate([resource_tangents, population_tangents], axis=-2)
+    capacity_tangents = np.take_along_axis(limit_tangents, limiting[..., None], axis=-2)
+    capacity_tangents = np.where(np.isfinite(carrying_capacity)[..., None], capacity_tangents, 0)
+
+    ## reproduce: N + r*N*(1 - N/K)
+    has_capacity = carrying_capacity > 0
+    safe_capacity = np.where(has_capacity, carrying_capacity, 1.0)
+    crowding = populations / safe_capacity
+    grown = populations + growth_rates * populations * (1 - crowding)
+    grown_tangents = ((1 + growth_rates * (1 - 2 * crowding))[..., None] * population_tangents
+                      + (growth_rates * crowding ** 2)[..., None] * capacity_tangents)
+    # the direct dependence of each species on its own growth rate
+    grown_tangents = grown_tangents + np.eye(populations.shape[-1]) * (populations * (1 - crowding))[..., None]
+
+    population_tangents = np.where(has_capacity[..., None], grown_tangents, population_tangents)
+    populations = np.where(has_capacity, grown, populations)
+    population_tangents = np.where((populations > 0)[..., None], population_tangents, 0)
+    populations = np.maximum(populations, 0)
+
+    return populations, resources, population_tangents, resource_tangents
+
+
+def stability_loss_and_gradient(compiled_web, growth_rates=None, populations=None, resources=None,
+                                time_steps=None, tail_fraction=0.1):
+    """
+    Computes optimizer.stability_loss (without the extinction penalty) and its exact gradient with
+    respect to the growth rates in a single forward pass.
+
+    The loss only depends on the first and last tail populations and on their mean over the tail,
+    so only those tangents are kept rather than a tangent per recorded step.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - growth_rates: (species,) or (N, species) growth rates. Defaults to the compiled ones.
+    - populations: Optional starting populations, (species,) or (N, species).
+    - resources: Optional starting resource levels, (resources,) or (N, resources).
+    - time_steps: Number of steps. Defaults to the compiled 'time_steps'.
+    - tail_fraction: Fraction of the final steps used to judge stability.
+
+    Returns:
+    - Tuple of (loss, gradient): loss has the batch shape of growth_rates minus the species axis,
+      gradient has the shape of growth_rates.
+    """
+    if time_steps is None:
+        time_steps = compiled_web['time_steps']
+    if growth_rates is None:
+        growth_rates = compiled_web['growth_rates']
+    if populations is None:
+        populations = compiled_web['initial_populations']
+    if resources is None:
+        resources = compiled_web['initial_resources']
+
+    compiled_web = dense_food_web(compiled_web)  # once, rather than in every step
+    growth_rates = np.asarray(growth_rates, dtype=float)
+    batch_shape = growth_rates.shape[:-1]
+    species_count = growth_rates.shape[-1]
+    populations = np.broadcast_to(np.asarray(populations, dtype=float), growth_rates.shape)
+    resources = np.broadcast_to(np.asarray(resources, dtype=float), batch_shape + (len(compiled_web['resource_names']),))
+    population_tangents = np.zeros(growth_rates.shape + (species_count,))
+    resource_tangents = np.zeros(resources.shape + (species_count,))
+
+    tail_steps = max(int(time_steps * tail_fraction), 2)
+    tail_sum = np.zeros_like(populations)
+    tail_tangent_sum = np.zeros_like(population_tangents)
+
+    for t in range(time_steps):
+        populations, resources, population_tangents, resource_tangents = apply_step_with_tangents(
+            compiled_web, populations, resources, population_tangents, resource_tangents, growth_rates)
+        if t == time_steps - tail_steps:
+            first_tail, first_tail_tangents = populations, population_tangents
+        if t >= time_steps - tail_steps:
+            tail_sum = tail_sum + populations
+            tail_tangent_sum = tail_tangent_sum + population_tangents
+
+    # mean change over the tail telescopes to (last - first) / (tail_steps - 1)
+    mean_change = (populations - first_tail) / (tail_steps - 1)
+    mean_change_tangents = (population_tangents - first_tail_tangents) / (tail_steps - 1)
+    tail_mean = tail_sum / tail_steps
+    scale = np.maximum(tail_mean, 1)
+    scale_tangents = np.where((tail_mean > 1)[..., None], tail_tangent_sum / tail_steps, 0)
+
+    relative_change = mean_change / scale
+    relative_change_tangents = (mean_change_tangents - relative_change[..., None] * scale_tangents) / scale[..., None]
+
+    loss = (relative_change ** 2).sum(axis=-1)
+    gradient = np.einsum('...i,...ik->...k', 2 * relative_change, relative_change_tangents)
+    return loss, gradient
+
+
+def optimize_growth_rates_with_gradients(compiled_web, iterations=50, learning_rate=1.0,
+                                         growth_rate_bounds=(1, 2), time_steps=None, tolerance=1e-10, cache=None):
+    """
+    Minimizes the stability loss over the growth rates with projected gradient descent.
+
+    This replaces the ±learning_rate sign steps of v2's adjust_growth_rates_for_stability: each
+    iteration uses the exact gradient and backtracks (halving the step) until the loss decreases.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web. Its growth rates are the starting point.
+    - iterations: Maximum number of gradient steps.
+    - learning_rate: Initial step length.
+    - growth_rate_bounds: (min, max) growth rates, as clamped in v2.
+    - time_steps: Number of steps per simulation. Defaults to the compiled 'time_steps'.
+    - tolerance: Stop once the loss is at or below this, or a step no longer improves it.
+    - cache: Optional cache from result_cache.create_result_cache. Growth rates evaluated before
+      (e.g. a step clamped back onto the same bounds, or an earlier run) are looked up instead of
+      simulated.
+
+    Returns:
+    - Dictionary with the optimized 'growth_rates', their 'loss', the number of 'iterations' run
+      and the loss after each iteration in 'history'.
+    """
+    if time_steps is None:
+        time_steps = compiled_web['time_steps']
+    compiled_web = dense_food_web(compiled_web)  # once for every loss evaluation
+
+    def evaluate(populations, growth_rates, resources):
+        loss, gradient = stability_loss_and_gradient(compiled_web, growth_rates, populations, resources, time_steps)
+        return np.column_stack([loss, gradient])
+
+    def loss_and_gradient(growth_rates):
+        if cache is None:
+            return stability_loss_and_gradient(compiled_web, growth_rates, time_steps=time_steps)
+        outcome = cached_outcomes(cache, compiled_web, 'stability_loss_and_gradient', evaluate, time_steps,
+                                  compiled_web['initial_populations'], growth_rates)[0]
+        return outcome[0], outcome[1:]
+
+    growth_rates = np.clip(compiled_web['growth_rates'], *growth_rate_bounds)
+    loss, gradient = loss_and_gradient(growth_rates)
+    history = [loss]
+    step_length = learning_rate
+
+    for iteration in range(1, iterations + 1):
+        if loss <= tolerance:
+            break
+        while step_length > 1e-12:
+            candidate = np.clip(growth_rates - step_length * gradient, *growth_rate_bounds)
+            candidate_loss, candidate_gradient = loss_and_gradient(candidate)
+            if candidate_loss < loss:
+                break
+            step_length /= 2
+        else:
+            break  # no descent step left: a local minimum within the bounds
+        growth_rates, loss, gradient = candidate, candidate_loss, candidate_gradient
+        history.append(loss)
+        step_length *= 2
+
+    return {'growth_rates': growth_rates, 'loss': loss, 'iterations': len(history) - 1, 'history': history}
+
+
+## TEST STATEMENTS WHEN I CALL THIS SCRIPT FROM COMMAND LINE
+if __name__ == '__main__':
+    compiled_web = load_compiled_food_web('food_web.json')
+    optimization = optimize_growth_rates_with_gradients(compiled_web)
+    print(f"loss {optimization['history'][0]:.3g} -> {optimization['loss']:.3g} "
+          f"in {optimization['iterations']} iterations")
+    print(dict(zip(compiled_web['species_names'], np.round(optimization['growth_rates'], 3).tolist())))
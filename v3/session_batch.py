@@ -0,0 +1,190 @@
+import numpy as np
+
+from compiled_web import apply_step, load_compiled_food_web
+from tick_server import apply_action, parse_action
+
+
+def create_session_batch(compiled_web, capacity=64):
+    """
+    Creates an empty batch of live simulations ("sessions", e.g. one per player dungeon) that share
+    a compiled food web and are stepped together, one row per session.
+
+    Live sessions always occupy rows 0 .. count - 1, so a tick steps one contiguous block. The
+    arrays only grow (doubling) when they are full, and removing a session moves the last row into
+    its place, so joining and leaving never reallocate per tick.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - capacity: Number of rows to allocate up front.
+
+    Returns:
+    - A batch dictionary with the 'populations' (capacity, species) and 'resources'
+      (capacity, resources) blocks, per-row 'steps', the number of live rows in 'count',
+      'row_of' (session id -> row), 'session_ids' (row -> session id) and the 'pending_updates'
+      queued for the next tick.
+    """
+    species_count = len(compiled_web['species_names'])
+    resource_count = len(compiled_web['resource_names'])
+    return {
+        'compiled_web': compiled_web,
+        'species_index': {name: i for i, name in enumerate(compiled_web['species_names'])},
+        'resource_index': {name: j for j, name in enumerate(compiled_web['resource_names'])},
+        'populations': np.zeros((capacity, species_count)),
+        'resources': np.zeros((capacity, resource_count)),
+        'steps': np.zeros(capacity, dtype=np.int64),
+        'count': 0,
+        'row_of': {},
+        'session_ids': [None] * capacity,
+        'pending_updates': {'populations': [], 'resources': []},
+    }
+
+
+def grow_session_batch(batch, capacity):
+    """
+    Reallocates the batch arrays with room for at least `capacity` rows, keeping live rows.
+    """
+    for key in ['populations', 'resources', 'steps']:
+        grown = np.zeros((capacity,) + batch[key].shape[1:], dtype=batch[key].dtype)
+        grown[:batch['count']] = batch[key][:batch['count']]
+        batch[key] = grown
+    batch['session_ids'].extend([None] * (capacity - len(batch['session_ids'])))
+
+
+def add_session(batch, session_id, populations=None, resources=None):
+    """
+    Adds a session to the batch. It is stepped from the next tick on.
+
+    Parameters:
+    - batch: Batch dictionary from create_session_batch.
+    - session_id: Any hashable id, e.g. a player or connection id.
+    - populations: Optional starting (species,) populations. Defaults to the compiled ones.
+    - resources: Optional starting (resources,) levels. Defaults to the compiled ones.
+
+    Raises:
+    - ValueError if the session id is already in the batch.
+    """
+    if session_id in batch['row_of']:
+        raise ValueError(f"session {session_id!r} is already in the batch")
+    if batch['count'] == len(batch['session_ids']):
+        grow_session_batch(batch, 2 * max(batch['count'], 1))
+
+    row = batch['count']
+    compiled_web = batch['compiled_web']
+    batch['populations'][row] = compiled_web['initial_populations'] if populations is None else populations
+    batch['resources'][row] = compiled_web['initial_resources'] if resources is None else resources
+    batch['steps'][row] = 0
+    batch['row_of'][session_id] = row
+    batch['session_ids'][row] = session_id
+    batch['count'] += 1
+
+
+def remove_session(batch, session_id):
+    """
+    Removes a session from the batch; the last live row is moved into its place.
+
+    Parameters:
+    - batch: Batch dictionary from create_session_batch.
+    - session_id: Id passed to add_session.
+
+    Returns:
+    - The session's final state (see session_state). Updates still queued for it are dropped, so
+      they never reach a later session with the same id.
+    """
+    final_state = session_state(batch, session_id)
+    for key, updates in batch['pending_updates'].items():
+        batch['pending_updates'][key] = [update for update in updates if update[0] != session_id]
+    row = batch['row_of'].pop(session_id)
+    last = batch['count'] - 1
+    if row != last:
+        for key in ['populations', 'resources', 'steps']:
+            batch[key][row] = batch[key][last]
+        moved_id = batch['session_ids'][last]
+        batch['session_ids'][row] = moved_id
+        batch['row_of'][moved_id] = row
+    batch['session_ids'][last] = None
+    batch['count'] = last
+    return final_state
+
+
+def session_state(batch, session_id):
+    """
+    Returns a copy of one session's state as an engine state dictionary
+    ('populations', 'resources', 'step').
+    """
+    row = batch['row_of'][session_id]
+    return {
+        'populations': batch['populations'][row].copy(),
+        'resources': batch['resources'][row].copy(),
+        'step': int(batch['steps'][row]),
+    }
+
+
+def queue_session_action(batch, session_id, action):
+    """
+    Validates a player's click action (see tick_server.parse_action) and queues it for the next tick.
+
+    Raises:
+    - KeyError if the session is not in the batch, ValueError if the action is malformed.
+    """
+    if session_id not in batch['row_of']:
+        raise KeyError(f"session {session_id!r} is not in the batch")
+    key, column, amount = parse_action(action, batch['species_index'], batch['resource_index'])
+    # rows are looked up when the tick applies the update, since they move as sessions leave
+    batch['pending_updates'][key].append((session_id, column, amount))
+
+
+def apply_pending_updates(batch):
+    """
+    Applies every queued action to the rows it touches, one at a time in the order they were
+    queued, exactly as a single tick_server session would (see tick_server.apply_action).
+    """
+    for key, updates in batch['pending_updates'].items():
+        for session_id, column, amount in updates:
+            apply_action(batch[key], (batch['row_of'][session_id], column), amount)
+        updates.clear()
+
+
+def tick_session_batch(batch, growth_rates=None):
+    """
+    Applies queued actions, then steps every live session once with a single apply_step call.
+
+    Parameters:
+    - batch: Batch dictionary from create_session_batch.
+    - growth_rates: Optional (species,) growth rates. Defaults to the compiled ones.
+
+    Returns:
+    - The number of sessions stepped.
+    """
+    apply_pending_updates(batch)
+    count = batch['count']
+    if count == 0:
+        return 0
+    populations, resources = apply_step(batch['compiled_web'], batch['populations'][:count],
+                                        batch['resources'][:count], growth_rates)
+    batch['populations'][:count] = populations
+    batch['resources'][:count] = resources
+    batch['steps'][:count] += 1
+    return count
+
+
+## TEST STATEMENTS WHEN I CALL THIS SCRIPT FROM COMMAND LINE
+if __name__ == '__main__':
+    import time
+
+    compiled_web = load_compiled_food_web('food_web.json')
+    batch = create_session_batch(compiled_web)
+    rng = np.random.default_rng(0)
+    for player in range(10000):
+        add_session(batch, player)
+
+    start = time.perf_counter()
+    for tick in range(100):
+        for player in rng.choice(10000, size=100, replace=False):
+            queue_session_action(batch, int(player), {'type': 'add_co2'})
+        tick_session_batch(batch)
+        # a few players leave and join every tick
+        for player in rng.choice(list(batch['row_of']), size=10, replace=False):
+            remove_session(batch, int(player))
+            add_session(batch, int(player))
+    elapsed = (time.perf_counter() - start) / 100
+    print(f"{batch['count']} sessions: {elapsed * 1e3:.1f} ms/tick ({1 / elapsed:.0f} ticks/s possible)")
@@ -2,6 +2,8 @@ import numpy as np
 import pandas as pd
 import json
 
+from compiled_web import compile_food_web, run_compiled_simulation
+
 def load_food_web_json(file_path):
     # Load the ecosystem configuration from a JSON file
     with open(file_path, 'r') as file:
@@ -58,36 +60,16 @@ def apply_logistic_growth(k, N, r):
 
 ## function: run 1 simulation on food web from initial parameters, return all data
 def run_one_simulation(species_data, initial_resource_levels, simulation_parameters):
-    # Initialize simulation parameters
-    time_steps = simulation_parameters['time_steps']
-
-    # Initialize populations and resource levels
-    population_levels = {species['name']: species['initial_population'] for species in species_data}
-    growth_rates = {species['name']: species['growth_rate'] for species in species_data}
-    resource_levels = initial_resource_levels.copy()
-    print(resource_levels)
-
-    # Prepare results storage
-    column_count = len(population_levels) + len(resource_levels)
-    results = np.zeros((time_steps, column_count))
-    
-    for current_time_step in range(time_steps):
-        ## everyone breathes: update gas / resource levels
-        for resource_name in resource_levels.items():
-            # calculate change in resource (+ produced, - consumed)
-            resource_levels[resource_name] += calculate_resource_consumption_and_production(population_levels, species_data, resource_name)
-        
-        consumption = calculate_predation_effects(population_levels, species_data)
-        
-        ## everyone eats & reproduces: update population levels
-        for species_name in species_data:
-            population_levels[species_name] -= consumption[species_name]
-            ## eat other species
-
-            ## calculate carrying capacity
-            ## recalculate growth rate
+    # Compile the species list into arrays once, then step the whole web with matrix operations
+    compiled_web = compile_food_web({
+        'species': species_data,
+        'initial_resource_levels': initial_resource_levels,
+        'simulation_parameters': simulation_parameters,
+    })
+    print(initial_resource_levels)
 
-            ## reproduce
+    ## everyone breathes, eats & reproduces each step: see compiled_web.apply_step
+    return run_compiled_simulation(compiled_web, simulation_parameters['time_steps'])
 
 ### utility function: judgment of outcomes based on initial simulation parameters
     #### check & score every step -> crash after 10 turns > crash after 5
@@ -153,10 +135,10 @@ def uncalled_function(time_steps, resource_levels, populations, species_info, re
 ############################################################
 
 ## TEST STATEMENTS WHEN I CALL THIS SCRIPT FROM COMMAND LINE
-
-food_web = load_food_web_json('food_web.json')
-species_data, initial_resource_levels, simulation_parameters = load_simulation_from_food_web(food_web)
-run_one_simulation(species_data, initial_resource_levels, simulation_parameters)
+if __name__ == '__main__':
+    food_web = load_food_web_json('food_web.json')
+    species_data, initial_resource_levels, simulation_parameters = load_simulation_from_food_web(food_web)
+    run_one_simulation(species_data, initial_resource_levels, simulation_parameters)
 
 
 ############################################################
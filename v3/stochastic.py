@@ -0,0 +1,216 @@
+import numpy as np
+
+from checkpoint import state_rng
+from compiled_web import breathe, load_compiled_food_web, relation_product, row_minimum
+
+# Births per species and step are capped here, so runaway populations stay within what the
+# Poisson sampler can handle
+MAX_BIRTHS_PER_STEP = 1e15
+# Populations are clamped here (2**62, exact as a float), so counts never wrap around when they are
+# passed to the binomial sampler as int64
+MAX_POPULATION = 2.0 ** 62
+
+
+def sparse_draws(draw, mask, *parameters):
+    """
+    Calls a Generator method like rng.binomial or rng.poisson only where mask is True, and 0
+    elsewhere: in most steps most species draw nothing (died out, not eaten, or at capacity).
+    """
+    counts = np.zeros(mask.shape)
+    if mask.any():
+        counts[mask] = draw(*(np.broadcast_to(parameter, mask.shape)[mask] for parameter in parameters))
+    return counts
+
+
+def stochastic_step(compiled_web, populations, resources, growth_rates, rng):
+    """
+    Advances whole-individual populations by one step with demographic noise.
+
+    The phases are those of compiled_web.apply_step, with each deterministic change replaced by a
+    random count of individuals that has the same mean (a tau-leap of one step):
+    1. everyone breathes: resources change deterministically, as gases are not individuals.
+    2. everyone eats: a prey species expecting E = (populations @ predation) individuals to be
+       eaten loses Binomial(N, min(E / N, 1)) of its N individuals.
+    3. everyone reproduces: with the logistic change D = r*N*(1 - N/K), a species below its
+       carrying capacity gains Poisson(D) births, and one above it loses Binomial(N, min(-D / N, 1))
+       individuals. A species whose prey or resource has run out (K == 0) starves: all of it dies,
+       the limit of the logistic step as K goes to 0. This is where the two modes differ on
+       purpose: apply_step keeps the population of a species with K exactly 0 (e.g. Herbivorous
+       Fish once the Algae are all eaten), which with whole individuals would leave predators
+       alive forever without food.
+    Small populations can therefore die out by chance, and a species at 0 stays at 0. Populations
+    are clamped at MAX_POPULATION.
+
+    Each draw has the deterministic mean given the counts it starts from, but the carrying capacity
+    is taken from the drawn post-predation counts, and the logistic step is not linear in it. The
+    mean of one stochastic step therefore only matches apply_step while the limiting prey and
+    resources are large; a predator whose prey is down to a few individuals grows or starves
+    depending on how many of them survived.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - populations: (..., species) whole-number populations.
+    - resources: (..., resources) resource levels.
+    - growth_rates: (species,) or (..., species) growth rates.
+    - rng: np.random.Generator to draw from.
+
+    Returns:
+    - Tuple of (new_populations, new_resources); populations stay whole numbers (as floats).
+    """
+    resources = breathe(compiled_web, populations, resources)
+
+    ## everyone eats: each prey individual is eaten with the same chance
+    expected_eaten = relation_product(compiled_web, populations, 'predation')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        eaten_chance = np.where(populations > 0, np.minimum(expected_eaten / populations, 1), 0)
+    populations = populations - sparse_draws(rng.binomial, eaten_chance > 0, populations.astype(np.int64), eaten_chance)
+
+    ## reproduce: births below the carrying capacity, deaths above it
+    carrying_capacity = np.minimum(row_minimum(compiled_web, resources, 'consumes'),
+                                   row_minimum(compiled_web, populations, 'prey_mask'))
+    has_capacity = carrying_capacity > 0
+    safe_capacity = np.where(has_capacity, carrying_capacity, 1.0)
+    change = np.where(has_capacity, growth_rates * populations * (1 - populations / safe_capacity), 0)
+    births = sparse_draws(rng.poisson, change > 0, np.minimum(change, MAX_BIRTHS_PER_STEP))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        death_chance = np.where((change < 0) & (populations > 0), np.minimum(-change / populations, 1), 0)
+    death_chance = np.where(has_capacity, death_chance, 1)  # starving
+    deaths = sparse_draws(rng.binomial, (death_chance > 0) & (populations > 0), populations.astype(np.int64),
+                          death_chance)
+    return np.minimum(populations + births - deaths, MAX_POPULATION), resources
+
+
+def replicate_rows(values, shape):
+    """
+    Broadcasts (species,), (P, species) or already replicated (P, R, species) values to shape + (species,).
+    """
+    values = np.asarray(values, dtype=float)
+    if values.ndim < 3:
+        values = np.atleast_2d(values)[:, None, :]
+    return np.broadcast_to(values, shape + values.shape[-1:]).copy()
+
+
+def run_stochastic_replicates(compiled_web, replicates, time_steps=None, populations=None, resources=None,
+                              growth_rates=None, seed=None, state=None):
+    """
+    Runs R replicates of every parameter set with demographic noise (see stochastic_step), all
+    stepped together as one (parameter sets, replicates, species) array.
+
+    Runs can be resumed and forked like the deterministic engine state: pass a state from
+    compiled_web.initial_state, checkpoint.deserialize_state or checkpoint.fork_state (or the
+    output of an earlier call) and the draws continue from its 'rng_state'. A forked state's
+    list of rng states gives each of its rows (parameter sets) its own stream.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - replicates: Number of replicates R per parameter set.
+    - time_steps: Number of steps. Defaults to the compiled 'time_steps'.
+    - populations: Optional (P, species) or (species,) initial populations, or (P, R, species) ones
+      to resume replicates, rounded to whole individuals. Default to the state's, or the compiled ones.
+    - resources: Optional (P, resources), (resources,) or (P, R, resources) initial levels. Default to
+      the state's, or the compiled ones.
+    - growth_rates: Optional (P, species) or (species,) growth rates. Defaults to the compiled ones.
+    - seed: Seed for np.random.default_rng, for reproducible replicates. Ignored when the state
+      carries an 'rng_state'.
+    - state: Optional state dictionary with 'populations', 'resources' and optionally 'rng_state'
+      (one bit generator state, or a list of one per parameter set).
+
+    Returns:
+    - A dictionary with:
+      - 'populations' (P, R, species) and 'resources' (P, R, resources) final states.
+      - 'extinction_steps' (P, R, species): the step each species died out at (time_steps + 1 if
+        it survived, 0 if it started out at 0).
+      - 'extinction_probability' (P, species): fraction of replicates in which each species died out.
+      - 'collapse_probability' (P,): fraction of replicates in which every species died out.
+      - 'rng_state': the advanced bit generator state (a list of one per parameter set for a
+        forked state), so the output can be passed back in as a state to continue the run.
+    """
+    if state is None:
+        state = {}
+    if time_steps is None:
+        time_steps = compiled_web['time_steps']
+    if populations is None:
+        populations = state.get('populations', compiled_web['initial_populations'])
+    if resources is None:
+        resources = state.get('resources', compiled_web['initial_resources'])
+    if growth_rates is None:
+        growth_rates = compiled_web['growth_rates']
+
+    parameter_sets = max(np.atleast_2d(populations).shape[0], np.atleast_2d(resources).shape[0],
+                         np.atleast_2d(growth_rates).shape[0])
+    rng_state = state.get('rng_state')
+    if isinstance(rng_state, list):
+        if len(rng_state) != parameter_sets:
+            raise ValueError(f"The state has {len(rng_state)} random streams for {parameter_sets} parameter sets.")
+        branch_rngs = [state_rng(branch_state) for branch_state in rng_state]
+    else:
+        branch_rngs = None
+        rng = np.random.default_rng(seed) if rng_state is None else state_rng(rng_state)
+
+    shape = (parameter_sets, replicates)
+    populations = np.minimum(np.round(replicate_rows(populations, shape)), MAX_POPULATION)
+    resources = replicate_rows(resources, shape)
+    growth_rates = np.atleast_2d(np.asarray(growth_rates, dtype=float))[:, None, :]
+    extinction_steps = np.where(populations > 0, time_steps + 1, 0)
+
+    for t in range(1, time_steps + 1):
+        if branch_rngs is None:
+            populations, resources = stochastic_step(compiled_web, populations, resources, growth_rates, rng)
+        else:
+            # every parameter set draws from its own stream
+            for row, branch_rng in enumerate(branch_rngs):
+                populations[row], resources[row] = stochastic_step(compiled_web, populations[row], resources[row],
+                                                                   growth_rates[min(row, len(growth_rates) - 1)],
+                                                                   branch_rng)
+        extinction_steps = np.where((populations <= 0) & (extinction_steps > t), t, extinction_steps)
+
+    extinct = extinction_steps <= time_steps
+    return {
+        'populations': populations,
+        'resources': resources,
+        'extinction_steps': extinction_steps,
+        'extinction_probability': extinct.mean(axis=1),
+        'collapse_probability': np.all(extinct, axis=-1).mean(axis=1),
+        'rng_state': (rng.bit_generator.state if branch_rngs is None
+                      else [branch_rng.bit_generator.state for branch_rng in branch_rngs]),
+    }
+
+
+def outcome_quantiles(values, quantiles=(0.05, 0.5, 0.95)):
+    """
+    Summarizes the distribution of an outcome over replicates.
+
+    Parameters:
+    - values: (P, R, ...) per-replicate outcomes, e.g. run_stochastic_replicates' 'populations'.
+    - quantiles: Quantiles to report.
+
+    Returns:
+    - A dictionary with 'mean' and 'std' (P, ...) and 'quantiles' (len(quantiles), P, ...).
+    """
+    return {
+        'mean': values.mean(axis=1),
+        'std': values.std(axis=1),
+        'quantiles': np.quantile(values, quantiles, axis=1),
+    }
+
+
+## TEST STATEMENTS WHEN I CALL THIS SCRIPT FROM COMMAND LINE
+if __name__ == '__main__':
+    import time
+
+    from ensemble import run_ensemble
+
+    compiled_web = load_compiled_food_web('food_web.json')
+    growth_rates = compiled_web['growth_rates'] * np.linspace(0.8, 1.2, 5)[:, None]
+
+    start = time.perf_counter()
+    replicates = run_stochastic_replicates(compiled_web, 2000, growth_rates=growth_rates, seed=0)
+    print(f"{growth_rates.shape[0]} parameter sets x 2000 replicates x {compiled_web['time_steps']} steps "
+          f"in {time.perf_counter() - start:.2f} s")
+
+    deterministic = run_ensemble(compiled_web, populations=np.tile(compiled_web['initial_populations'], (5, 1)),
+                                 growth_rates=growth_rates)
+    final = outcome_quantiles(replicates['populations'])
+    for i, name in enumerate(compiled_web['species_names']):
+        print(f"{name:20s} extinction chance {replicates['extinction_probability'][2, i]:6.1%}   "
+              f"median {final['quantiles'][1, 2, i]:8.1f}   deterministic {deterministic['populations'][2, i]:8.1f}")
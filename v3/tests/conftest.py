@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+# The v3 modules import each other by name, as when a script is run from this directory
+VERSION_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, VERSION_DIRECTORY)
+
+from compiled_web import compile_food_web, load_compiled_food_web  # noqa: E402
+from generate_web import generate_food_web  # noqa: E402
+
+
+@pytest.fixture
+def compiled_web():
+    return load_compiled_food_web(os.path.join(VERSION_DIRECTORY, 'food_web.json'))
+
+
+@pytest.fixture
+def sparse_web():
+    return compile_food_web(generate_food_web(200, seed=0), use_sparse=True)
@@ -0,0 +1,57 @@
+import numpy as np
+
+from candidates import block_rng, candidate_block, generate_candidates, tweak_parameters
+
+
+def test_blocks_match_spawned_streams():
+    root = np.random.SeedSequence(42)
+    children = np.random.SeedSequence(42).spawn(4)
+    for block_index, child in enumerate(children):
+        assert block_rng(root, block_index).random() == np.random.default_rng(child).random()
+
+
+def test_candidates_do_not_depend_on_how_blocks_are_shared(compiled_web):
+    growth_rates, initial_populations = generate_candidates(compiled_web, 2500, seed=7, block_size=1000)
+    assert growth_rates.shape == initial_populations.shape == (2500, 11)
+    # three workers, one block each, in any order
+    blocks = {block_index: candidate_block(compiled_web['growth_rates'], compiled_web['initial_populations'],
+                                           np.random.SeedSequence(7), block_index, 2500, block_size=1000)
+              for block_index in [2, 0, 1]}
+    assert len(blocks[2][0]) == 500
+    np.testing.assert_array_equal(np.concatenate([blocks[i][0] for i in range(3)]), growth_rates)
+    np.testing.assert_array_equal(np.concatenate([blocks[i][1] for i in range(3)]), initial_populations)
+
+    again = generate_candidates(compiled_web, 2500, seed=np.random.SeedSequence(7), block_size=1000)
+    np.testing.assert_array_equal(again[0], growth_rates)
+    assert not np.array_equal(generate_candidates(compiled_web, 2500, seed=8, block_size=1000)[0], growth_rates)
+
+
+def test_tweaks_stay_within_their_bounds(compiled_web):
+    growth_rates, initial_populations = generate_candidates(compiled_web, 5000, seed=0, growth_rate_delta=0.3,
+                                                            population_delta=4)
+    growth_rate_changes = growth_rates - compiled_web['growth_rates']
+    population_changes = initial_populations - compiled_web['initial_populations']
+    assert np.all(growth_rates >= 1) and np.all(initial_populations >= 1)
+    assert np.all((growth_rate_changes <= 0.3) & ((growth_rate_changes >= -0.3) | (growth_rates == 1)))
+    assert np.all(population_changes == np.round(population_changes))
+    assert np.all((population_changes <= 4) & ((population_changes >= -4) | (initial_populations == 1)))
+    # the population step is inclusive at both ends
+    assert population_changes.max() == 4 and np.any(population_changes[:, 0] == -4)
+
+
+def test_no_candidates(compiled_web):
+    growth_rates, initial_populations = generate_candidates(compiled_web, 0, seed=0)
+    assert growth_rates.shape == initial_populations.shape == (0, 11)
+
+
+def test_per_species_step_sizes(compiled_web):
+    growth_rate_delta = np.linspace(0, 0.5, 11)
+    population_delta = np.linspace(0, 5.9, 11)
+    growth_rates, initial_populations = tweak_parameters(compiled_web['growth_rates'] + 1,
+                                                         compiled_web['initial_populations'] + 10, 4000,
+                                                         np.random.default_rng(0), growth_rate_delta, population_delta)
+    growth_rate_changes = np.abs(growth_rates - compiled_web['growth_rates'] - 1)
+    population_changes = np.abs(initial_populations - compiled_web['initial_populations'] - 10)
+    assert np.all(growth_rate_changes <= growth_rate_delta)
+    np.testing.assert_allclose(growth_rate_changes.max(axis=0), growth_rate_delta, atol=1e-3)
+    np.testing.assert_array_equal(population_changes.max(axis=0), np.floor(population_delta))
@@ -0,0 +1,56 @@
+import numpy as np
+
+from checkpoint import advance_state, deserialize_state, fork_state, serialize_state, snapshot_state
+from compiled_web import initial_state
+
+
+def generator(rng_state):
+    bit_generator = getattr(np.random, rng_state['bit_generator'])()
+    bit_generator.state = rng_state
+    return np.random.Generator(bit_generator)
+
+
+def test_resuming_a_checkpoint_matches_an_uninterrupted_run(compiled_web):
+    uninterrupted = advance_state(compiled_web, initial_state(compiled_web, seed=0), 200)
+    checkpoint = serialize_state(advance_state(compiled_web, initial_state(compiled_web, seed=0), 150))
+    resumed = advance_state(compiled_web, deserialize_state(checkpoint), 50)
+    np.testing.assert_array_equal(resumed['populations'], uninterrupted['populations'])
+    np.testing.assert_array_equal(resumed['resources'], uninterrupted['resources'])
+    assert resumed['step'] == 200
+    assert resumed['rng_state'] == uninterrupted['rng_state']
+
+
+def test_snapshot_shares_no_arrays(compiled_web):
+    state = initial_state(compiled_web, seed=0)
+    snapshot = snapshot_state(state)
+    snapshot['populations'][0] += 1
+    assert state['populations'][0] != snapshot['populations'][0]
+
+
+def test_forked_branches_draw_independent_reproducible_numbers(compiled_web):
+    state = initial_state(compiled_web, seed=0)
+    branches = fork_state(state, 3)
+    draws = [generator(rng_state).random(4) for rng_state in branches['rng_state']]
+    parent_draws = generator(state['rng_state']).random(4)
+    assert not any(np.array_equal(draws[i], draws[j]) for i in range(3) for j in range(i + 1, 3))
+    assert not any(np.array_equal(branch_draws, parent_draws) for branch_draws in draws)
+
+    # the same checkpoint forks into the same streams, also after a round trip through bytes
+    again = fork_state(deserialize_state(serialize_state(state)), 3)
+    assert again['rng_state'] == branches['rng_state']
+    assert deserialize_state(serialize_state(branches))['rng_state'] == branches['rng_state']
+
+
+def test_forks_can_replay_the_parent_stream(compiled_web):
+    state = initial_state(compiled_web, seed=0)
+    branches = fork_state(state, 2, independent_streams=False)
+    assert branches['rng_state'] == [state['rng_state'], state['rng_state']]
+
+
+def test_branches_advance_like_single_runs(compiled_web):
+    state = initial_state(compiled_web)
+    branches = fork_state(state, 2)
+    branches['resources'][1, compiled_web['resource_names'].index('CO2')] += 100
+    branches = advance_state(compiled_web, branches, 20)
+    np.testing.assert_allclose(branches['populations'][0], advance_state(compiled_web, state, 20)['populations'])
+    assert 'rng_state' not in branches
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from compact_storage import cast_food_web, decode_values, encode_values, record_error_bound
+from compiled_web import apply_step
+from ensemble import run_ensemble
+
+
+@pytest.mark.parametrize('web', ['compiled_web', 'sparse_web'])
+def test_float32_state_stays_float32(web, request):
+    compiled_web = request.getfixturevalue(web)
+    cast_web = cast_food_web(compiled_web, np.float32)
+    populations, resources = apply_step(cast_web, cast_web['initial_populations'][None],
+                                        cast_web['initial_resources'][None])
+    assert populations.dtype == resources.dtype == np.float32
+
+    step_dtypes = set()
+    results = run_ensemble(compiled_web, 20, populations=np.tile(compiled_web['initial_populations'], (3, 1)),
+                           dtype=np.float32,
+                           step_callback=lambda t, populations, resources: step_dtypes.add(populations.dtype))
+    assert step_dtypes == {np.dtype(np.float32)}
+    assert results['populations'].dtype == np.float32
+
+
+def test_float32_ensemble_stays_close_to_float64(compiled_web):
+    populations = np.tile(compiled_web['initial_populations'], (2, 1))
+    float64 = run_ensemble(compiled_web, 20, populations=populations)
+    float32 = run_ensemble(compiled_web, 20, populations=populations, dtype=np.float32)
+    np.testing.assert_allclose(float32['populations'], float64['populations'], rtol=1e-4, atol=1e-4)
+
+
+@pytest.mark.parametrize('record_format', ['float32', 'log_uint16'])
+def test_encoded_values_are_within_error_bound(record_format):
+    values = np.array([0.0, 1e-3, 0.5, 1.0, 37.5, 1e4, 1e6])
+    decoded = decode_values(encode_values(values, record_format), record_format)
+    assert np.all(np.abs(decoded - values) <= record_error_bound(record_format) * (1 + values))
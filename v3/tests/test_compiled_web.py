@@ -0,0 +1,70 @@
+import os
+
+import numpy as np
+import pytest
+
+from compiled_web import apply_step, compile_food_web, dense_food_web, run_compiled_simulation
+from generate_web import generate_food_web
+from sim_foodweb import calculate_predation_effects, calculate_resource_consumption_and_production, load_food_web_json
+
+VERSION_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def reference_simulation(food_web, time_steps):
+    """Steps the web one species at a time with sim_foodweb's dictionary helpers."""
+    species_data = food_web['species']
+    populations = {species['name']: float(species['initial_population']) for species in species_data}
+    resources = {name: float(level) for name, level in food_web['initial_resource_levels'].items()}
+    results = []
+    for _ in range(time_steps):
+        changes = {name: calculate_resource_consumption_and_production(populations, species_data, name)
+                   for name in resources}
+        resources = {name: max(level + changes[name], 0) for name, level in resources.items()}
+        eaten = calculate_predation_effects(populations, species_data)
+        populations = {name: max(population - eaten[name], 0) for name, population in populations.items()}
+
+        grown = {}
+        for species in species_data:
+            N, r = populations[species['name']], species['growth_rate']
+            K = min([resources[name] for name in species['consumes'] if name in resources]
+                    + [populations[prey] for prey in species['prey']] + [np.inf])
+            grown[species['name']] = max(N + r * N * (1 - N / K), 0) if K > 0 else N
+        populations = grown
+        results.append(list(populations.values()) + list(resources.values()))
+    return np.array(results)
+
+
+def test_compiled_simulation_matches_species_loop():
+    food_web = load_food_web_json(os.path.join(VERSION_DIRECTORY, 'food_web.json'))
+    np.testing.assert_allclose(run_compiled_simulation(compile_food_web(food_web)),
+                               reference_simulation(food_web, food_web['simulation_parameters']['time_steps']),
+                               rtol=1e-9, atol=1e-12)  # summation order differs, and errors grow over 200 steps
+
+
+@pytest.mark.parametrize('use_sparse', [False, True])
+def test_generated_web_matches_species_loop(use_sparse):
+    food_web = generate_food_web(30, seed=1)
+    np.testing.assert_allclose(run_compiled_simulation(compile_food_web(food_web, use_sparse=use_sparse), 40),
+                               reference_simulation(food_web, 40), rtol=1e-12)
+
+
+def test_batched_step_matches_single_rows(compiled_web):
+    rng = np.random.default_rng(0)
+    populations = compiled_web['initial_populations'] * rng.uniform(0.5, 2, (6, len(compiled_web['species_names'])))
+    resources = compiled_web['initial_resources'] * rng.uniform(0.5, 2, (6, len(compiled_web['resource_names'])))
+    growth_rates = compiled_web['growth_rates'] * rng.uniform(0.8, 1.2, populations.shape)
+    batch_populations, batch_resources = apply_step(compiled_web, populations, resources, growth_rates)
+    for row in range(6):
+        row_populations, row_resources = apply_step(compiled_web, populations[row], resources[row], growth_rates[row])
+        np.testing.assert_allclose(batch_populations[row], row_populations, rtol=1e-14)
+        np.testing.assert_allclose(batch_resources[row], row_resources, rtol=1e-14)
+
+
+def test_sparse_and_dense_webs_step_alike(sparse_web):
+    populations, resources = sparse_web['initial_populations'], sparse_web['initial_resources']
+    dense_populations, dense_resources = populations, resources
+    for _ in range(20):
+        populations, resources = apply_step(sparse_web, populations, resources)
+        dense_populations, dense_resources = apply_step(dense_food_web(sparse_web), dense_populations, dense_resources)
+    np.testing.assert_allclose(populations, dense_populations, rtol=1e-12)
+    np.testing.assert_allclose(resources, dense_resources, rtol=1e-12)
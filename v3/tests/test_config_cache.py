@@ -0,0 +1,77 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+import config_cache
+from compiled_web import compile_food_web
+from config_cache import compiled_cache_path, load_cached_food_web, read_manifest, validate_food_web
+
+VERSION_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def food_web_path(tmp_path):
+    file_path = tmp_path / 'food_web.json'
+    shutil.copy(os.path.join(VERSION_DIRECTORY, 'food_web.json'), file_path)
+    config_cache._loaded_webs.clear()
+    return str(file_path)
+
+
+def assert_same_web(loaded, expected):
+    for key in config_cache.VECTOR_KEYS + config_cache.RELATION_KEYS:
+        np.testing.assert_array_equal(loaded[key], expected[key])
+    assert loaded['species_names'] == expected['species_names']
+
+
+def test_cached_web_matches_compiling(food_web_path):
+    with open(food_web_path) as file:
+        expected = compile_food_web(json.load(file))
+    assert_same_web(load_cached_food_web(food_web_path), expected)
+    config_cache._loaded_webs.clear()
+    assert_same_web(load_cached_food_web(food_web_path), expected)
+    assert_same_web(load_cached_food_web(food_web_path, mmap_mode='r'), expected)
+
+
+def test_touched_file_rewrites_a_complete_manifest(food_web_path):
+    load_cached_food_web(food_web_path)
+    config_cache._loaded_webs.clear()
+    stat = os.stat(food_web_path)
+    os.utime(food_web_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    load_cached_food_web(food_web_path)
+
+    cache_path = compiled_cache_path(food_web_path)
+    assert read_manifest(cache_path)['source']['mtime_ns'] == stat.st_mtime_ns + 10 ** 9
+    assert not [name for name in os.listdir(cache_path) if name.endswith('.tmp')]
+
+
+def test_failed_manifest_write_leaves_the_old_one(food_web_path, monkeypatch):
+    load_cached_food_web(food_web_path)
+    cache_path = compiled_cache_path(food_web_path)
+    manifest = read_manifest(cache_path)
+
+    def crash(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(config_cache.json, 'dumps', crash)
+    with pytest.raises(OSError):
+        config_cache.write_manifest(cache_path, {**manifest, 'time_steps': 1})
+    assert read_manifest(cache_path) == manifest
+    assert not [name for name in os.listdir(cache_path) if name.endswith('.tmp')]
+
+
+def test_changed_file_is_recompiled(food_web_path):
+    load_cached_food_web(food_web_path)
+    with open(food_web_path) as file:
+        food_web = json.load(file)
+    food_web['species'][0]['initial_population'] += 1
+    with open(food_web_path, 'w') as file:
+        json.dump(food_web, file)
+    assert load_cached_food_web(food_web_path)['initial_populations'][0] == food_web['species'][0]['initial_population']
+
+
+def test_invalid_config_is_rejected():
+    with pytest.raises(ValueError):
+        validate_food_web({'species': []})
@@ -0,0 +1,37 @@
+import numpy as np
+
+from compiled_web import run_compiled_simulation
+from ensemble import COMPLETED, CONVERGED, DEFAULT_TERMINATION_CRITERIA, check_termination, run_ensemble
+
+
+def test_consecutive_steps_of_a_cycle_are_not_converged():
+    # a period-5 cycle sampled 5 steps apart looks settled; consecutive steps do not
+    populations = np.array([[1.0, 2, 3, 4, 5], [2, 3, 4, 5, 1]])
+    resources = np.array([[10.0], [10.0]])
+    reasons = check_termination(populations[[1]], resources[[1]], populations[[0]], resources[[0]],
+                                DEFAULT_TERMINATION_CRITERIA)
+    assert reasons[0] == COMPLETED
+    reasons = check_termination(populations[[0]], resources[[0]], populations[[0]], resources[[0]],
+                                DEFAULT_TERMINATION_CRITERIA)
+    assert reasons[0] == CONVERGED
+
+
+def test_ensemble_matches_single_runs(compiled_web):
+    rng = np.random.default_rng(0)
+    growth_rates = compiled_web['growth_rates'] * rng.uniform(0.8, 1.2, size=(4, len(compiled_web['growth_rates'])))
+    results = run_ensemble(compiled_web, 50, populations=np.tile(compiled_web['initial_populations'], (4, 1)),
+                           growth_rates=growth_rates, record_trajectories=True)
+    single = run_compiled_simulation({**compiled_web, 'growth_rates': growth_rates[2]}, 50)
+    species_count = len(compiled_web['species_names'])
+    np.testing.assert_allclose(results['populations'][2], single[-1, :species_count], rtol=1e-12)
+    np.testing.assert_allclose(results['resources'][2], single[-1, species_count:], rtol=1e-12)
+
+
+def test_stopped_runs_keep_their_final_state(compiled_web):
+    populations = np.tile(compiled_web['initial_populations'], (3, 1))
+    full = run_ensemble(compiled_web, 300, populations=populations)
+    stopped = run_ensemble(compiled_web, 300, populations=populations, termination_criteria={})
+    assert np.all(stopped['stop_steps'] <= 300)
+    early = stopped['stop_reasons'] != COMPLETED
+    assert np.all(stopped['stop_steps'][early] % DEFAULT_TERMINATION_CRITERIA['check_every'] == 0)
+    np.testing.assert_allclose(stopped['populations'], full['populations'], rtol=1e-5, atol=1e-6)
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+import equilibrium
+from compiled_web import compile_food_web, dense_food_web
+from equilibrium import (NOT_CONVERGED, OSCILLATORY, STABLE, UNSTABLE, classify_stability, find_equilibria,
+                         population_step_and_jacobian)
+
+
+def single_producer_web(growth_rate):
+    # Breathing turns 1 CO2 per individual into O2, so with CO2 held at 50 the carrying capacity
+    # is 50 - N: the equilibrium is N = 25, where the step map's derivative is 1 - 2r
+    return compile_food_web({
+        'simulation_parameters': {'time_steps': 100},
+        'initial_resource_levels': {'CO2': 50, 'O2': 0},
+        'species': [{'name': 'Algae', 'consumes': ['CO2'], 'produces': ['O2'], 'prey': [], 'initial_population': 20,
+                     'breathe_rate': 1, 'growth_rate': growth_rate}],
+    })
+
+
+def test_jacobian_matches_finite_differences(compiled_web):
+    rng = np.random.default_rng(0)
+    populations = compiled_web['initial_populations'] * rng.uniform(0.5, 1.5, (4, len(compiled_web['species_names'])))
+    resources = np.broadcast_to(compiled_web['initial_resources'], (4, len(compiled_web['resource_names'])))
+    growth_rates = compiled_web['growth_rates']
+    _, jacobian = population_step_and_jacobian(compiled_web, populations, resources, growth_rates)
+
+    epsilon = 1e-6
+    for k in range(populations.shape[1]):
+        step = np.zeros_like(populations)
+        step[:, k] = epsilon
+        up, _ = population_step_and_jacobian(compiled_web, populations + step, resources, growth_rates)
+        down, _ = population_step_and_jacobian(compiled_web, populations - step, resources, growth_rates)
+        np.testing.assert_allclose(jacobian[:, :, k], (up - down) / (2 * epsilon), rtol=1e-6, atol=1e-6)
+
+
+@pytest.mark.parametrize('growth_rate, expected', [(0.25, STABLE), (1.5, OSCILLATORY)])
+def test_single_producer_equilibrium(growth_rate, expected):
+    compiled_web = single_producer_web(growth_rate)
+    equilibria = find_equilibria(compiled_web)
+    assert equilibria['converged'].all()
+    np.testing.assert_allclose(equilibria['populations'], [[25]])
+    np.testing.assert_allclose(equilibria['jacobian'], [[[1 - 2 * growth_rate]]])
+    assert classify_stability(equilibria)['stability'][0] == expected
+
+
+def test_equilibria_are_fixed_points(compiled_web):
+    growth_rates = compiled_web['growth_rates'] * np.linspace(0.8, 1.2, 5)[:, None]
+    equilibria = find_equilibria(compiled_web, growth_rates=growth_rates)
+    assert equilibria['converged'].all()
+    stepped, _ = population_step_and_jacobian(compiled_web, equilibria['populations'],
+                                              np.broadcast_to(compiled_web['initial_resources'], (5, 2)), growth_rates)
+    np.testing.assert_allclose(stepped, equilibria['populations'], rtol=1e-9, atol=1e-9)
+
+
+def test_classify_stability_from_eigenvalues():
+    rotation = np.array([[0.0, -1.2], [1.2, 0.0]])  # eigenvalues +-1.2i
+    equilibria = {
+        'jacobian': np.array([np.diag([0.5, -0.9]), np.diag([1.0, 0.3]), np.diag([1.5, 0.2]), np.diag([-1.5, 0.2]),
+                              rotation, np.diag([0.5, 0.5])]),
+        'converged': np.array([True, True, True, True, True, False]),
+    }
+    stability = classify_stability(equilibria)
+    np.testing.assert_array_equal(stability['stability'],
+                                  [STABLE, STABLE, UNSTABLE, OSCILLATORY, OSCILLATORY, NOT_CONVERGED])
+    np.testing.assert_allclose(stability['spectral_radius'], [0.9, 1.0, 1.5, 1.5, 1.2, 0.5])
+
+
+def test_sparse_web_gives_dense_result(sparse_web, monkeypatch):
+    densified = []
+
+    def counting_dense_food_web(compiled_web):
+        densified.append(compiled_web['sparse'])
+        return dense_food_web(compiled_web)
+    monkeypatch.setattr(equilibrium, 'dense_food_web', counting_dense_food_web)
+
+    growth_rates = sparse_web['growth_rates'] * np.linspace(0.9, 1.1, 3)[:, None]
+    sparse_equilibria = find_equilibria(sparse_web, growth_rates=growth_rates)
+    assert densified.count(True) == 1
+    dense_equilibria = find_equilibria(dense_food_web(sparse_web), growth_rates=growth_rates)
+    for key in ['populations', 'converged', 'iterations', 'jacobian', 'resource_drift']:
+        np.testing.assert_allclose(sparse_equilibria[key], dense_equilibria[key], rtol=1e-12)
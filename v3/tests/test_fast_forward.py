@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from compiled_web import initial_state
+from fast_forward import advance, find_cycle
+from fast_kernel import run_fast_simulation
+
+
+def relative_difference(state, populations, resources):
+    fast_forwarded = np.concatenate([state['populations'], state['resources']])
+    stepped = np.concatenate([populations, resources])
+    return (np.abs(fast_forwarded - stepped) / np.maximum(np.abs(stepped), 1)).max()
+
+
+@pytest.mark.parametrize('n_ticks', [1, 1000, 5000, 50_001])
+def test_advance_matches_tick_by_tick_run(compiled_web, n_ticks):
+    caught_up = advance(compiled_web, initial_state(compiled_web), n_ticks)
+    populations, resources, _ = run_fast_simulation(compiled_web, n_ticks)
+    assert caught_up['step'] == n_ticks
+    assert relative_difference(caught_up, populations, resources) < 1e-8
+
+
+def test_advance_on_sparse_web(sparse_web):
+    caught_up = advance(sparse_web, initial_state(sparse_web), 5000)
+    populations, resources, _ = run_fast_simulation(sparse_web, 5000)
+    assert relative_difference(caught_up, populations, resources) < 1e-8
+
+
+def test_find_cycle_of_fixed_point(compiled_web):
+    species_count = len(compiled_web['species_names'])
+    state = np.concatenate([compiled_web['initial_populations'], compiled_web['initial_resources']])
+    trajectory = np.tile(state, (10, 1))
+    period, resource_drift = find_cycle(compiled_web, trajectory, 4, 1e-10)
+    assert period == 1
+    assert np.all(resource_drift == 0)
+    assert trajectory.shape[1] == species_count + len(resource_drift)
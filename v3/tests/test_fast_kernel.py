@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from compiled_web import compile_food_web, run_compiled_simulation
+from fast_kernel import NUMBA_AVAILABLE, kernel_inputs, run_fast_simulation, step_loop_kernel
+from generate_web import generate_food_web
+
+
+def test_kernel_inputs_only_densify_species_by_resources(sparse_web):
+    species_count = len(sparse_web['species_names'])
+    resource_count = len(sparse_web['resource_names'])
+    resource_exchange, consumes, prey_offsets, prey_indices, prey_weights = kernel_inputs(sparse_web)
+    assert resource_exchange.shape == consumes.shape == (species_count, resource_count)
+    assert len(prey_offsets) == species_count + 1
+    assert len(prey_indices) == len(prey_weights) == sparse_web['predation'].nnz
+
+
+def test_backends_agree_on_sparse_web(sparse_web):
+    numpy_result = run_fast_simulation(sparse_web, 50, backend='numpy', record_every=10)
+    kernel_result = run_fast_simulation(sparse_web, 50, backend='auto', record_every=10)
+    for expected, actual in zip(numpy_result, kernel_result):
+        np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-9)
+
+
+def test_kernel_agrees_on_sparse_and_dense_compiles():
+    # kernel_inputs builds the prey lists from either layout; 'auto' runs them with Numba when installed
+    food_web = generate_food_web(60, seed=1)
+    dense = run_fast_simulation(compile_food_web(food_web, use_sparse=False), 30, record_every=5)
+    sparse = run_fast_simulation(compile_food_web(food_web, use_sparse=True), 30, record_every=5)
+    for expected, actual in zip(dense, sparse):
+        np.testing.assert_allclose(actual, expected, rtol=1e-12)
+
+
+def test_python_loop_kernel_matches_apply_step(compiled_web):
+    # the kernel runs as ordinary Python too, which is what Numba compiles
+    populations = compiled_web['initial_populations'].copy()
+    resources = compiled_web['initial_resources'].copy()
+    trajectory = np.zeros((6, len(populations) + len(resources)))
+    step_loop_kernel(20, 3, populations, resources, compiled_web['growth_rates'], *kernel_inputs(compiled_web),
+                     trajectory)
+    expected = run_compiled_simulation(compiled_web, 20)
+    np.testing.assert_allclose(trajectory, expected[2::3], rtol=1e-12)
+    np.testing.assert_allclose(np.concatenate([populations, resources]), expected[-1], rtol=1e-12)
+
+
+@pytest.mark.skipif(not NUMBA_AVAILABLE, reason="needs numba")
+@pytest.mark.parametrize('record_every', [None, 7])
+def test_numba_backend_matches_numpy(compiled_web, record_every):
+    numpy_result = run_fast_simulation(compiled_web, 1000, backend='numpy', record_every=record_every)
+    numba_result = run_fast_simulation(compiled_web, 1000, backend='numba', record_every=record_every)
+    for expected, actual in zip(numpy_result, numba_result):
+        if expected is None:
+            assert actual is None
+        else:
+            np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-9)
+    if record_every:
+        assert numba_result[2].shape == (1000 // record_every, 13)
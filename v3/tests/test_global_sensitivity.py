@@ -0,0 +1,85 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from compiled_web import apply_step, compile_food_web
+from ensemble import run_ensemble
+from global_sensitivity import (SCIPY_AVAILABLE, evaluate_samples, latin_hypercube, morris_effects, morris_samples,
+                                parameter_space, saltelli_samples, sobol_indices)
+
+VERSION_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def unit_space(dimension, lower=0.0, upper=1.0):
+    return {'names': [f"x{j}" for j in range(dimension)], 'lower': np.full(dimension, lower),
+            'upper': np.full(dimension, upper)}
+
+
+@pytest.mark.skipif(not SCIPY_AVAILABLE, reason="needs scipy")
+def test_sobol_indices_of_ishigami_function():
+    samples = saltelli_samples(unit_space(3, -np.pi, np.pi), 2 ** 13, seed=0)
+    x1, x2, x3 = samples.T
+    outputs = np.sin(x1) + 7 * np.sin(x2) ** 2 + 0.1 * x3 ** 4 * np.sin(x1)
+    indices = sobol_indices(outputs, 3)
+    # analytic values for a = 7, b = 0.1
+    np.testing.assert_allclose(indices['first_order'], [0.3139, 0.4424, 0.0], atol=0.02)
+    np.testing.assert_allclose(indices['total'], [0.5576, 0.4424, 0.2437], atol=0.02)
+
+
+def test_sobol_indices_of_additive_function():
+    samples = saltelli_samples(unit_space(3), 4096, method='lhs', seed=0)
+    indices = sobol_indices(samples @ [1.0, 2.0, 0.0], 3)
+    # an additive function has no interactions; variances are 1 : 4 : 0
+    np.testing.assert_allclose(indices['first_order'], [0.2, 0.8, 0.0], atol=0.03)
+    np.testing.assert_allclose(indices['total'], indices['first_order'], atol=0.03)
+
+
+def test_morris_effects_of_linear_function():
+    space = unit_space(4, 1.0, 3.0)
+    samples = morris_samples(space, 20, seed=0)
+    assert samples.shape == (100, 4)
+    outputs = np.column_stack([samples @ [1.0, -2.0, 0.0, 0.5], samples[:, 0] * samples[:, 1]])
+    effects = morris_effects(space, samples, outputs)
+    # per unit of the range, which is 2 wide
+    np.testing.assert_allclose(effects['mu'][:, 0], [2.0, -4.0, 0.0, 1.0])
+    np.testing.assert_allclose(effects['mu_star'][:, 0], [2.0, 4.0, 0.0, 1.0])
+    np.testing.assert_allclose(effects['sigma'][:, 0], 0, atol=1e-12)
+    assert effects['sigma'][0, 1] > 0 and effects['mu_star'][2, 1] == 0
+
+
+def test_latin_hypercube_fills_every_stratum():
+    points = latin_hypercube(50, 3, np.random.default_rng(0))
+    for column in points.T:
+        np.testing.assert_array_equal(np.sort(np.floor(column * 50)), np.arange(50))
+
+
+def test_default_breathe_rates_keep_runs_bit_identical(compiled_web):
+    populations = np.tile(compiled_web['initial_populations'], (3, 1)) * [[0.5], [1.0], [2.0]]
+    results = run_ensemble(compiled_web, 100, populations)
+    stepped_populations, stepped_resources = populations, compiled_web['initial_resources']
+    for _ in range(100):
+        stepped_populations, stepped_resources = apply_step(compiled_web, stepped_populations, stepped_resources)
+    np.testing.assert_array_equal(results['populations'], stepped_populations)
+    np.testing.assert_array_equal(results['resources'], stepped_resources)
+
+    explicit = run_ensemble(compiled_web, 100, populations, breathe_rates=compiled_web['breathe_rates'])
+    np.testing.assert_allclose(explicit['populations'], results['populations'], rtol=1e-9)
+
+
+def test_evaluated_samples_match_recompiled_webs(compiled_web):
+    space = parameter_space(compiled_web, bounds={'Algae.growth_rate': (1.0, 2.0)})
+    assert (space['lower'][space['names'].index('Algae.growth_rate')],
+            space['upper'][space['names'].index('Algae.growth_rate')]) == (1.0, 2.0)
+    samples = saltelli_samples(space, 4, method='random', seed=1)[:5]
+    outcomes = evaluate_samples(compiled_web, space, samples, time_steps=30, batch_size=2)
+
+    with open(os.path.join(VERSION_DIRECTORY, 'food_web.json')) as file:
+        food_web = json.load(file)
+    sample = dict(zip(space['names'], samples[3]))
+    for species in food_web['species']:
+        for kind in ['initial_population', 'growth_rate', 'breathe_rate']:
+            species[kind] = sample[f"{species['name']}.{kind}"]
+    single = run_ensemble(compile_food_web(food_web), 30)
+    np.testing.assert_allclose(outcomes['final_populations'][3], single['populations'][0], rtol=1e-9)
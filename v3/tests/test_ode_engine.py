@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from compiled_web import compile_food_web
+from ode_engine import ODE_METHODS, SCIPY_AVAILABLE, integrate_food_web
+
+METHODS = [method for method in ODE_METHODS if method != 'radau' or SCIPY_AVAILABLE]
+
+
+def logistic_web(growth_rates, initial_populations, capacity):
+    # producers that do not breathe, so each grows logistically towards the fixed CO2 level
+    return compile_food_web({
+        'simulation_parameters': {'time_steps': 100},
+        'initial_resource_levels': {'CO2': capacity},
+        'species': [{'name': f"Algae {i}", 'consumes': ['CO2'], 'produces': [], 'prey': [],
+                     'initial_population': population, 'breathe_rate': 0, 'growth_rate': growth_rate}
+                    for i, (growth_rate, population) in enumerate(zip(growth_rates, initial_populations))],
+    })
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_logistic_growth_matches_closed_form(method):
+    growth_rates, initial_populations = np.array([0.5, 3.0]), np.array([1.0, 150.0])
+    sample_times = np.linspace(0, 20, 41)
+    integration = integrate_food_web(logistic_web(growth_rates, initial_populations, 100.0), sample_times,
+                                     method=method, rtol=1e-9, atol=1e-9)
+    expected = 100 / (1 + (100 / initial_populations - 1) * np.exp(-growth_rates * sample_times[:, None]))
+    np.testing.assert_allclose(integration['populations'], expected, rtol=1e-6)
+    np.testing.assert_allclose(integration['resources'], 100.0, rtol=1e-12)
+
+
+def test_batched_runs_match_single_runs(compiled_web):
+    growth_rates = compiled_web['growth_rates'] * np.array([[0.9], [1.0], [1.2]])
+    sample_times = [0, 5, 50]
+    batched = integrate_food_web(compiled_web, sample_times, growth_rates=growth_rates, rtol=1e-9, atol=1e-9)
+    assert batched['populations'].shape == (3, 3, 11)
+    np.testing.assert_array_equal(batched['populations'][0], np.tile(compiled_web['initial_populations'], (3, 1)))
+    single = integrate_food_web(compiled_web, sample_times, growth_rates=growth_rates[2], rtol=1e-9, atol=1e-9)
+    # the batch shares one step size, and the kinks of min() in the rates limit the accuracy
+    np.testing.assert_allclose(batched['populations'][:, 2], single['populations'], rtol=1e-5, atol=1e-6)
+    assert np.all(batched['populations'] >= 0) and np.all(batched['resources'] >= 0)
+
+
+@pytest.mark.skipif(not SCIPY_AVAILABLE, reason="needs scipy")
+def test_methods_agree(compiled_web):
+    sample_times = np.arange(0, 51, 10)
+    dopri5 = integrate_food_web(compiled_web, sample_times, rtol=1e-8, atol=1e-8)
+    radau = integrate_food_web(compiled_web, sample_times, method='radau', rtol=1e-8, atol=1e-8)
+    np.testing.assert_allclose(radau['resources'], dopri5['resources'], rtol=1e-4)
+    np.testing.assert_allclose(radau['populations'], dopri5['populations'], rtol=1e-4, atol=1e-6)
+
+
+def test_bad_arguments(compiled_web):
+    with pytest.raises(ValueError, match='unknown method'):
+        integrate_food_web(compiled_web, [0, 1], method='euler')
+    with pytest.raises(ValueError, match='increasing'):
+        integrate_food_web(compiled_web, [2, 1])
@@ -0,0 +1,99 @@
+import numpy as np
+
+import optimizer
+from candidates import candidate_block, child_sequence
+from optimizer import evaluate_candidates, optimize_stability, stability_loss
+from result_cache import create_result_cache
+
+
+def test_stability_loss_of_steady_and_extinct_runs():
+    steady = np.ones((1, 10, 3)) * 5
+    extinct = steady.copy()
+    extinct[:, :, 0] = 0
+    growing = steady * np.arange(1, 11)[None, :, None]
+    losses = stability_loss(np.concatenate([steady, extinct, growing]))
+    assert losses[0] == 0
+    assert losses[1] == 1
+    assert losses[2] > 0
+
+
+def test_zero_generations_returns_the_starting_point(compiled_web):
+    optimization = optimize_stability(compiled_web, generations=0, seed=0)
+    assert optimization['generations'] == 0
+    assert optimization['history'] == []
+    np.testing.assert_array_equal(optimization['initial_populations'], compiled_web['initial_populations'])
+    assert np.isfinite(optimization['loss'])
+
+
+def test_optimizer_never_returns_worse_than_the_start(compiled_web):
+    start = optimize_stability(compiled_web, generations=0)
+    optimization = optimize_stability(compiled_web, generations=5, population_size=16, seed=0)
+    assert optimization['generations'] == 5
+    assert optimization['loss'] <= start['loss']
+    losses = evaluate_candidates(compiled_web, optimization['growth_rates'][None],
+                                 optimization['initial_populations'][None])
+    assert losses[0] == optimization['loss']
+
+
+def test_all_nan_generations_are_survived(compiled_web, monkeypatch):
+    def nan_losses(compiled_web, growth_rates, initial_populations, time_steps=None, cache=None):
+        return np.full(len(growth_rates), np.nan)
+
+    monkeypatch.setattr(optimizer, 'evaluate_candidates', nan_losses)
+    optimization = optimize_stability(compiled_web, generations=3, population_size=8, seed=0)
+    assert optimization['generations'] == 3
+    assert np.all(np.isnan(optimization['history']))
+    assert optimization['growth_rates'].shape == (len(compiled_web['species_names']),)
+
+
+def test_cached_losses_match_simulated_ones(compiled_web):
+    rng = np.random.default_rng(0)
+    growth_rates = compiled_web['growth_rates'] * rng.uniform(0.9, 1.1, (6, 11))
+    initial_populations = np.tile(compiled_web['initial_populations'], (6, 1))
+    growth_rates[4] = growth_rates[1]  # proposed twice in one batch
+    cache = create_result_cache()
+    cached = evaluate_candidates(compiled_web, growth_rates, initial_populations, cache=cache)
+    np.testing.assert_array_equal(cached, evaluate_candidates(compiled_web, growth_rates, initial_populations))
+    assert (cache['misses'], cache['hits']) == (5, 1)
+    np.testing.assert_array_equal(evaluate_candidates(compiled_web, growth_rates[::-1], initial_populations, cache=cache),
+                                  cached[::-1])
+    assert (cache['misses'], cache['hits']) == (5, 7)
+
+
+def test_repeated_candidates_are_not_simulated_again(compiled_web):
+    # without step sizes every candidate is the starting point again
+    cache = create_result_cache()
+    optimization = optimize_stability(compiled_web, generations=3, population_size=8, growth_rate_delta=0,
+                                      population_delta=0, seed=0, cache=cache)
+    assert optimization['generations'] == 3
+    assert (cache['misses'], cache['hits']) == (1, 3 * 8)
+
+    # a rerun of a search proposes the same candidates
+    cache = create_result_cache(max_entries=1000)
+    first = optimize_stability(compiled_web, generations=4, population_size=16, seed=1, cache=cache)
+    misses = cache['misses']
+    second = optimize_stability(compiled_web, generations=4, population_size=16, seed=1, cache=cache)
+    assert cache['misses'] == misses and cache['hits'] >= 1 + 4 * 16
+    np.testing.assert_array_equal(second['history'], first['history'])
+    assert optimize_stability(compiled_web, generations=4, population_size=16, seed=1)['history'] == first['history']
+
+
+def test_generations_can_be_rebuilt_by_a_worker(compiled_web, monkeypatch):
+    proposed = []
+
+    def record_candidates(compiled_web, growth_rates, initial_populations, time_steps=None, cache=None):
+        proposed.append((growth_rates, initial_populations))
+        return np.arange(len(growth_rates), dtype=float) + 1
+
+    monkeypatch.setattr(optimizer, 'evaluate_candidates', record_candidates)
+    optimize_stability(compiled_web, generations=2, population_size=16, seed=5)
+    # the first generation is drawn around the clamped starting point with the initial step sizes
+    mean_growth_rates = np.clip(compiled_web['growth_rates'], 1, 2)
+    mean_populations = np.maximum(np.round(compiled_web['initial_populations']), 1)
+    growth_rates, initial_populations = candidate_block(mean_growth_rates, mean_populations,
+                                                        child_sequence(np.random.SeedSequence(5), 0), 0, 16,
+                                                        growth_rate_delta=np.full(11, 0.1),
+                                                        population_delta=np.full(11, 10.0))
+    np.testing.assert_array_equal(proposed[1][0], np.clip(growth_rates, 1, 2))
+    np.testing.assert_array_equal(proposed[1][1], initial_populations)
+    assert not np.array_equal(proposed[2][0], proposed[1][0])
@@ -0,0 +1,52 @@
+import numpy as np
+
+from ensemble import run_ensemble
+from profiling import PHASES, create_phase_profile, merge_profiles, profile_summary
+
+
+def random_runs(compiled_web, run_count):
+    rng = np.random.default_rng(0)
+    populations = compiled_web['initial_populations'] * rng.uniform(0.5, 2, (run_count, len(compiled_web['species_names'])))
+    growth_rates = compiled_web['growth_rates'] * rng.uniform(0.8, 1.5, populations.shape)
+    populations[::4] = 0  # these die out at the first check
+    return populations, growth_rates
+
+
+def test_profiled_run_is_bit_identical(compiled_web):
+    populations, growth_rates = random_runs(compiled_web, 20)
+    profile = create_phase_profile()
+    plain = run_ensemble(compiled_web, 100, populations, growth_rates=growth_rates, termination_criteria={})
+    profiled = run_ensemble(compiled_web, 100, populations, growth_rates=growth_rates, termination_criteria={},
+                            profile=profile)
+    for key in ['populations', 'resources', 'stop_steps', 'stop_reasons']:
+        np.testing.assert_array_equal(profiled[key], plain[key])
+
+    assert profile['steps'] == plain['stop_steps'].max()
+    assert profile['run_steps'] == plain['stop_steps'].sum()
+    assert all(profile['phases'][phase]['calls'] == profile['steps'] for phase in PHASES)
+    assert abs(sum(phase['share'] for phase in profile_summary(profile).values()) - 1) < 1e-12
+
+
+def test_step_callback_sees_every_active_run(compiled_web):
+    populations, growth_rates = random_runs(compiled_web, 20)
+    seen = []
+
+    def step_callback(steps_taken, populations, resources):
+        seen.append((steps_taken, len(populations), len(resources)))
+    results = run_ensemble(compiled_web, 100, populations, growth_rates=growth_rates, termination_criteria={},
+                           step_callback=step_callback)
+    assert [steps_taken for steps_taken, _, _ in seen] == list(range(1, len(seen) + 1))
+    assert seen[0][1] == 20 and seen[-1][1] == 15
+    for steps_taken, run_count, resource_rows in seen:
+        assert run_count == resource_rows == (results['stop_steps'] >= steps_taken).sum()
+
+
+def test_merge_profiles_adds_up(compiled_web):
+    profiles = [create_phase_profile() for _ in range(2)]
+    run_ensemble(compiled_web, 10, profile=profiles[0])
+    run_ensemble(compiled_web, 30, np.tile(compiled_web['initial_populations'], (4, 1)), profile=profiles[1])
+    merged = merge_profiles(profiles)
+    assert (merged['steps'], merged['run_steps']) == (40, 130)
+    for phase in PHASES:
+        assert merged['phases'][phase]['calls'] == 40
+        assert merged['phases'][phase]['seconds'] == sum(profile['phases'][phase]['seconds'] for profile in profiles)
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from ensemble import run_ensemble
+from recording import record_every, record_final, record_last, record_statistics
+
+
+@pytest.fixture(params=[None, {}], ids=['full_runs', 'early_termination'])
+def runs(compiled_web, request):
+    rng = np.random.default_rng(0)
+    populations = compiled_web['initial_populations'] * rng.uniform(0.5, 2, (8, len(compiled_web['species_names'])))
+    populations[::3] = 0  # these stop at the first check when terminating early
+    arguments = {'compiled_web': compiled_web, 'time_steps': 50, 'populations': populations,
+                 'termination_criteria': request.param}
+    return arguments, run_ensemble(**arguments, record_trajectories=True)['trajectories']
+
+
+def test_record_every_keeps_every_kth_step(runs):
+    arguments, trajectories = runs
+    np.testing.assert_array_equal(run_ensemble(**arguments, record_policy=record_every(7))['trajectories'],
+                                  trajectories[:, 6::7])
+
+
+@pytest.mark.parametrize('window', [1, 20, 80])
+def test_record_last_keeps_the_window(runs, window):
+    arguments, trajectories = runs
+    np.testing.assert_array_equal(run_ensemble(**arguments, record_policy=record_last(window))['recent_trajectories'],
+                                  trajectories[:, -window:])
+
+
+def test_record_statistics_match_the_trajectory(runs):
+    arguments, trajectories = runs
+    statistics = run_ensemble(**arguments, record_policy=record_statistics())['statistics']
+    np.testing.assert_allclose(statistics['mean'], trajectories.mean(axis=1), rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(statistics['variance'], trajectories.var(axis=1), rtol=1e-9, atol=1e-9)
+    np.testing.assert_array_equal(statistics['min'], trajectories.min(axis=1))
+    np.testing.assert_array_equal(statistics['max'], trajectories.max(axis=1))
+
+
+def test_record_final_keeps_nothing_else(runs):
+    arguments, trajectories = runs
+    results = run_ensemble(**arguments, record_policy=record_final())
+    assert set(results) == {'populations', 'resources', 'stop_steps', 'stop_reasons'}
+    np.testing.assert_array_equal(np.concatenate([results['populations'], results['resources']], axis=1),
+                                  trajectories[:, -1])
+
+
+def test_invalid_policies(compiled_web):
+    with pytest.raises(ValueError):
+        record_every(0)
+    with pytest.raises(ValueError):
+        record_last(0)
+    with pytest.raises(ValueError, match='unknown recording policy'):
+        run_ensemble(compiled_web, 5, record_policy={'policy': 'sometimes'})
+    with pytest.raises(ValueError, match='not both'):
+        run_ensemble(compiled_web, 5, record_trajectories=True, record_policy=record_final())
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from compiled_web import run_compiled_simulation
+from result_cache import cache_statistics, cached_outcomes, cached_simulation, create_result_cache, simulation_key
+
+
+def test_key_changes_with_every_input(compiled_web):
+    key = simulation_key(compiled_web, 100)
+    assert simulation_key(dict(compiled_web), 100) == key
+    assert simulation_key(compiled_web, 101) != key
+    assert simulation_key(compiled_web, 100, populations=compiled_web['initial_populations'] + 1) != key
+    assert simulation_key(compiled_web, 100, resources=compiled_web['initial_resources'] * 2) != key
+    assert simulation_key({**compiled_web, 'growth_rates': compiled_web['growth_rates'] * 1.01}, 100) != key
+    assert simulation_key(compiled_web, 100, growth_rates=compiled_web['growth_rates'] * 1.01) != key
+    assert simulation_key(compiled_web, 100, outcome='stability_loss:0.1') != key
+    # the compiled values passed explicitly are the same run
+    assert simulation_key(compiled_web, 100, compiled_web['initial_populations'], compiled_web['initial_resources'],
+                          compiled_web['growth_rates']) == key
+
+
+def test_sparse_key_uses_csr_components(sparse_web):
+    key = simulation_key(sparse_web, 10)
+    predation = sparse_web['predation'].copy()
+    predation.data[0] *= 2
+    assert simulation_key({**sparse_web, 'predation': predation}, 10) != key
+
+
+def test_hits_return_the_simulated_result(compiled_web):
+    cache = create_result_cache()
+    first = cached_simulation(cache, compiled_web, 50)
+    second = cached_simulation(cache, compiled_web, 50)
+    assert second is first
+    np.testing.assert_array_equal(first, run_compiled_simulation(compiled_web, 50))
+    with pytest.raises(ValueError):
+        first[0, 0] = 1
+    assert cache_statistics(cache) == {'hits': 1, 'disk_hits': 0, 'misses': 1, 'entries': 1, 'hit_rate': 0.5}
+
+
+def test_least_recently_used_entry_is_dropped(compiled_web):
+    cache = create_result_cache(max_entries=2)
+    for time_steps in [10, 20, 10, 30]:
+        cached_simulation(cache, compiled_web, time_steps)
+    assert [simulation_key(compiled_web, time_steps) for time_steps in [10, 30]] == list(cache['entries'])
+    cached_simulation(cache, compiled_web, 20)
+    assert cache_statistics(cache)['misses'] == 4
+
+
+def test_disk_tier_survives_a_new_cache(compiled_web, tmp_path):
+    results = cached_simulation(create_result_cache(cache_dir=str(tmp_path)), compiled_web, 40)
+    cache = create_result_cache(cache_dir=str(tmp_path))
+    np.testing.assert_array_equal(cached_simulation(cache, compiled_web, 40), results)
+    assert cache_statistics(cache)['disk_hits'] == 1
+    assert [path.suffix for path in tmp_path.iterdir()] == ['.npy']
+
+
+def test_growth_rate_override(compiled_web):
+    cache = create_result_cache()
+    growth_rates = compiled_web['growth_rates'] * 1.1
+    results = cached_simulation(cache, compiled_web, 30, growth_rates=growth_rates)
+    np.testing.assert_array_equal(results, run_compiled_simulation({**compiled_web, 'growth_rates': growth_rates}, 30))
+    cached_simulation(cache, {**compiled_web, 'growth_rates': growth_rates}, 30)
+    assert (cache['hits'], cache['misses']) == (1, 1)
+
+
+def test_cached_outcomes_evaluate_only_new_runs(compiled_web, tmp_path):
+    evaluated = []
+
+    def evaluate(populations, growth_rates, resources):
+        evaluated.append(len(growth_rates))
+        return growth_rates.sum(axis=1) + populations.sum(axis=1) + resources.sum(axis=1)
+    growth_rates = compiled_web['growth_rates'] * np.array([[1.0], [1.1], [1.0], [1.2]])
+    cache = create_result_cache(cache_dir=str(tmp_path))
+    outcomes = cached_outcomes(cache, compiled_web, 'sums', evaluate, 10, compiled_web['initial_populations'],
+                               growth_rates)
+    np.testing.assert_array_equal(outcomes, evaluate(np.tile(compiled_web['initial_populations'], (4, 1)),
+                                                     growth_rates, np.tile(compiled_web['initial_resources'], (4, 1))))
+    assert evaluated[0] == 3 and (cache['misses'], cache['hits']) == (3, 1)
+
+    cache = create_result_cache(cache_dir=str(tmp_path))
+    again = cached_outcomes(cache, compiled_web, 'sums', evaluate, 10, compiled_web['initial_populations'],
+                            growth_rates[::-1])
+    np.testing.assert_array_equal(again, outcomes[::-1])
+    assert len(evaluated) == 2 and cache['misses'] == 0 and cache['disk_hits'] + cache['hits'] == 4
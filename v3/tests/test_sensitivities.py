@@ -0,0 +1,51 @@
+import numpy as np
+
+import sensitivities
+from compiled_web import dense_food_web
+from result_cache import create_result_cache
+from sensitivities import optimize_growth_rates_with_gradients, stability_loss_and_gradient
+
+
+def test_gradient_matches_finite_differences(compiled_web):
+    growth_rates = compiled_web['growth_rates']
+    loss, gradient = stability_loss_and_gradient(compiled_web, growth_rates, time_steps=10)
+    epsilon = 1e-6
+    for k in range(len(growth_rates)):
+        step = np.zeros_like(growth_rates)
+        step[k] = epsilon
+        loss_up, _ = stability_loss_and_gradient(compiled_web, growth_rates + step, time_steps=10)
+        loss_down, _ = stability_loss_and_gradient(compiled_web, growth_rates - step, time_steps=10)
+        finite_difference = (loss_up - loss_down) / (2 * epsilon)
+        assert abs(gradient[k] - finite_difference) <= 1e-5 * max(abs(finite_difference), 1)
+    assert loss > 0 and np.abs(gradient).max() > 0.1
+
+
+def test_sparse_web_gives_dense_result(sparse_web):
+    growth_rates = np.stack([sparse_web['growth_rates'], sparse_web['growth_rates'] * 1.1])
+    sparse_loss, sparse_gradient = stability_loss_and_gradient(sparse_web, growth_rates, time_steps=20)
+    dense_loss, dense_gradient = stability_loss_and_gradient(dense_food_web(sparse_web), growth_rates, time_steps=20)
+    np.testing.assert_allclose(sparse_loss, dense_loss, rtol=1e-12)
+    np.testing.assert_allclose(sparse_gradient, dense_gradient, rtol=1e-12, atol=1e-15)
+
+
+def test_sparse_web_is_densified_once(sparse_web, monkeypatch):
+    densified = []
+
+    def counting_dense_food_web(compiled_web):
+        densified.append(compiled_web['sparse'])
+        return dense_food_web(compiled_web)
+    monkeypatch.setattr(sensitivities, 'dense_food_web', counting_dense_food_web)
+    stability_loss_and_gradient(sparse_web, time_steps=20)
+    assert densified.count(True) == 1
+
+
+def test_gradient_descent_reuses_cached_evaluations(compiled_web):
+    cache = create_result_cache()
+    first = optimize_growth_rates_with_gradients(compiled_web, iterations=5, time_steps=10, cache=cache)
+    assert cache['misses'] > 0
+    misses = cache['misses']
+    second = optimize_growth_rates_with_gradients(compiled_web, iterations=5, time_steps=10, cache=cache)
+    assert cache['misses'] == misses and cache['hits'] >= misses
+    uncached = optimize_growth_rates_with_gradients(compiled_web, iterations=5, time_steps=10)
+    np.testing.assert_array_equal(second['growth_rates'], uncached['growth_rates'])
+    assert second['history'] == first['history'] == uncached['history']
@@ -0,0 +1,55 @@
+import numpy as np
+
+from compiled_web import apply_step
+from session_batch import (add_session, create_session_batch, queue_session_action, remove_session, session_state,
+                           tick_session_batch)
+from tick_server import advance_tick, create_tick_session, queue_action
+
+ACTIONS = [
+    {'type': 'add_resource', 'resource': 'CO2', 'amount': -1e9},
+    {'type': 'add_resource', 'resource': 'CO2', 'amount': 5},
+    {'type': 'add_population', 'species': 'Algae', 'amount': 2.5},
+]
+
+
+def test_batched_and_single_sessions_apply_actions_alike(compiled_web):
+    session = create_tick_session(compiled_web)
+    batch = create_session_batch(compiled_web)
+    add_session(batch, 'player')
+    for action in ACTIONS:
+        queue_action(session, action)
+        queue_session_action(batch, 'player', action)
+    advance_tick(session)
+    tick_session_batch(batch)
+
+    batched = session_state(batch, 'player')
+    np.testing.assert_array_equal(batched['populations'], session['state']['populations'])
+    np.testing.assert_array_equal(batched['resources'], session['state']['resources'])
+
+
+def test_removed_session_drops_its_queued_updates(compiled_web):
+    batch = create_session_batch(compiled_web)
+    add_session(batch, 'player')
+    queue_session_action(batch, 'player', {'type': 'add_co2', 'amount': 100})
+    remove_session(batch, 'player')
+    add_session(batch, 'player')
+    tick_session_batch(batch)
+
+    expected, _ = apply_step(compiled_web, compiled_web['initial_populations'], compiled_web['initial_resources'])
+    np.testing.assert_array_equal(session_state(batch, 'player')['populations'], expected)
+
+
+def test_sessions_keep_their_rows_straight_as_others_leave(compiled_web):
+    batch = create_session_batch(compiled_web, capacity=2)
+    for player in range(5):
+        add_session(batch, player, populations=compiled_web['initial_populations'] * (player + 1))
+    remove_session(batch, 1)
+    tick_session_batch(batch)
+
+    assert batch['count'] == 4
+    for player in [0, 2, 3, 4]:
+        expected, _ = apply_step(compiled_web, compiled_web['initial_populations'] * (player + 1),
+                                 compiled_web['initial_resources'])
+        state = session_state(batch, player)
+        np.testing.assert_allclose(state['populations'], expected, rtol=1e-12)
+        assert state['step'] == 1
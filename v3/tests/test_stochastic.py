@@ -0,0 +1,100 @@
+import numpy as np
+
+from checkpoint import deserialize_state, fork_state, serialize_state
+from compiled_web import apply_step, initial_state
+from stochastic import MAX_POPULATION, outcome_quantiles, run_stochastic_replicates, stochastic_step
+
+
+def test_one_step_mean_matches_apply_step_where_capacity_is_deterministic(compiled_web):
+    # species without prey are limited by resources, which change deterministically, so each of
+    # their draws has the apply_step mean; predators' capacities depend on drawn prey counts
+    replicates = 20000
+    initial_populations = compiled_web['initial_populations'] * 1000.0
+    initial_resources = compiled_web['initial_resources'] * 1000.0
+    populations = np.tile(initial_populations, (replicates, 1))
+    resources = np.tile(initial_resources, (replicates, 1))
+    stochastic, _ = stochastic_step(compiled_web, populations, resources, compiled_web['growth_rates'],
+                                    np.random.default_rng(0))
+    deterministic, _ = apply_step(compiled_web, initial_populations, initial_resources)
+
+    producers = ~compiled_web['prey_mask'].any(axis=1)
+    standard_error = stochastic.std(axis=0) / np.sqrt(replicates)
+    difference = np.abs(stochastic.mean(axis=0) - deterministic)
+    assert np.all((difference <= 5 * standard_error + 1e-9)[producers])
+
+
+def test_predators_without_prey_starve(compiled_web):
+    populations = compiled_web['initial_populations'].astype(float)
+    populations[compiled_web['prey_mask'].any(axis=0)] = 0  # every prey species gone
+    predators = compiled_web['prey_mask'].any(axis=1)
+    new_populations, _ = stochastic_step(compiled_web, populations, compiled_web['initial_resources'],
+                                         compiled_web['growth_rates'], np.random.default_rng(0))
+    assert np.all(new_populations[predators] == 0)
+
+
+def test_species_whose_resource_runs_out_starve(compiled_web):
+    # only the Mushrooms are alive, and the O2 they breathe is gone; nothing alive produces O2
+    mushrooms = compiled_web['species_names'].index('Mushrooms')
+    o2 = compiled_web['resource_names'].index('O2')
+    populations = np.zeros(len(compiled_web['species_names']))
+    populations[mushrooms] = 40
+    resources = compiled_web['initial_resources'].astype(float)
+    resources[o2] = 0
+    assert not compiled_web['prey_mask'][mushrooms].any()
+    new_populations, new_resources = stochastic_step(compiled_web, populations, resources,
+                                                     compiled_web['growth_rates'], np.random.default_rng(0))
+    assert new_resources[o2] == 0
+    assert new_populations[mushrooms] == 0
+    # apply_step keeps a species with no carrying capacity as it is
+    assert apply_step(compiled_web, populations, resources)[0][mushrooms] == 40
+
+
+def test_huge_populations_are_clamped_without_wrapping(compiled_web):
+    populations = np.full((4, len(compiled_web['species_names'])), MAX_POPULATION)
+    resources = np.full((4, len(compiled_web['resource_names'])), 1e30)
+    rng = np.random.default_rng(0)
+    for _ in range(3):
+        populations, resources = stochastic_step(compiled_web, populations, resources, compiled_web['growth_rates'],
+                                                 rng)
+        assert np.all((populations >= 0) & (populations <= MAX_POPULATION))
+
+
+def test_replicates_are_reproducible_and_whole(compiled_web):
+    first = run_stochastic_replicates(compiled_web, 50, time_steps=30, seed=1)
+    second = run_stochastic_replicates(compiled_web, 50, time_steps=30, seed=1)
+    np.testing.assert_array_equal(first['populations'], second['populations'])
+    assert np.all(first['populations'] == np.round(first['populations']))
+    assert first['extinction_probability'].shape == (1, len(compiled_web['species_names']))
+    extinct = first['extinction_steps'] <= 30
+    np.testing.assert_array_equal(extinct, first['populations'] == 0)
+    assert outcome_quantiles(first['populations'])['quantiles'].shape == (3, 1, len(compiled_web['species_names']))
+
+
+def test_resumed_replicates_continue_the_same_draws(compiled_web):
+    state = initial_state(compiled_web, seed=4)
+    uninterrupted = run_stochastic_replicates(compiled_web, 30, time_steps=40, state=state)
+    halfway = run_stochastic_replicates(compiled_web, 30, time_steps=20, state=state)
+    resumed = run_stochastic_replicates(compiled_web, 30, time_steps=20, state=halfway)
+    np.testing.assert_array_equal(resumed['populations'], uninterrupted['populations'])
+    np.testing.assert_array_equal(resumed['resources'], uninterrupted['resources'])
+    assert resumed['rng_state'] == uninterrupted['rng_state']
+    # the state's stream is the seed's
+    seeded = run_stochastic_replicates(compiled_web, 30, time_steps=40, seed=4)
+    np.testing.assert_array_equal(seeded['populations'], uninterrupted['populations'])
+
+
+def test_forked_states_draw_one_stream_per_branch(compiled_web):
+    state = initial_state(compiled_web, seed=9)
+    branches = deserialize_state(serialize_state(fork_state(state, 3)))
+    forked = run_stochastic_replicates(compiled_web, 20, time_steps=30, state=branches)
+    assert forked['populations'].shape == (3, 20, len(compiled_web['species_names']))
+    assert len(forked['rng_state']) == 3
+    for row, rng_state in enumerate(branches['rng_state']):
+        branch = run_stochastic_replicates(compiled_web, 20, time_steps=30, state={**state, 'rng_state': rng_state})
+        np.testing.assert_array_equal(forked['populations'][row], branch['populations'][0])
+        assert forked['rng_state'][row] == branch['rng_state']
+
+    # branches replaying the parent's stream only differ by their own changes
+    replayed = run_stochastic_replicates(compiled_web, 20, time_steps=30,
+                                         state=fork_state(state, 2, independent_streams=False))
+    np.testing.assert_array_equal(replayed['populations'][0], replayed['populations'][1])
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from tick_server import create_tick_session, handle_connection, parse_action, queue_action
+
+
+@pytest.mark.parametrize('action', [
+    {'type': ['x']},
+    {'type': 'add_resource', 'resource': [1], 'amount': 1},
+    {'type': 'add_population', 'species': {}, 'amount': 1},
+    {'type': 'add_co2', 'amount': 10 ** 400},
+    {'type': 'add_co2', 'amount': float('nan')},
+    {'type': 'add_co2', 'amount': True},
+    {'type': 'add_resource', 'resource': 'CO2'},
+    [],
+])
+def test_malformed_actions_raise_value_error(compiled_web, action):
+    session = create_tick_session(compiled_web)
+    with pytest.raises(ValueError):
+        queue_action(session, action)
+    assert not session['pending_actions']
+
+
+def test_parse_action_returns_float_amount(compiled_web):
+    session = create_tick_session(compiled_web)
+    key, column, amount = parse_action({'type': 'add_co2', 'amount': 3}, session['species_index'],
+                                       session['resource_index'])
+    assert (key, column, amount) == ('resources', session['resource_index']['CO2'], 3.0)
+    assert isinstance(amount, float)
+
+
+def post_action(session, body, origin=None):
+    async def request():
+        server = await asyncio.start_server(lambda reader, writer: handle_connection(session, reader, writer),
+                                            '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            headers = f"POST /action HTTP/1.1\r\nContent-Length: {len(body)}\r\n"
+            if origin:
+                headers += f"Origin: {origin}\r\n"
+            writer.write(headers.encode() + b"\r\n" + body)
+            response = await reader.read()
+            writer.close()
+            return response.decode()
+
+    return asyncio.run(request())
+
+
+def test_post_with_malformed_action_returns_400(compiled_web):
+    session = create_tick_session(compiled_web)
+    response = post_action(session, b'{"type": "add_resource", "resource": [1], "amount": 1}')
+    assert response.startswith('HTTP/1.1 400')
+
+
+def test_post_from_other_origin_is_refused(compiled_web):
+    session = create_tick_session(compiled_web)
+    response = post_action(session, b'{"type": "add_co2"}', origin='http://example.com')
+    assert response.startswith('HTTP/1.1 403')
+    assert 'Access-Control-Allow-Origin' not in response
+    assert not session['pending_actions']
+
+
+def test_post_from_dev_server_is_accepted(compiled_web):
+    session = create_tick_session(compiled_web)
+    response = post_action(session, b'{"type": "add_co2"}', origin='http://localhost:5173')
+    assert response.startswith('HTTP/1.1 202')
+    assert 'Access-Control-Allow-Origin: http://localhost:5173' in response
+    assert len(session['pending_actions']) == 1
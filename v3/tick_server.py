@@ -0,0 +1,463 @@
+import asyncio
+import base64
+import hashlib
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+from compiled_web import initial_state, step
+from config_cache import load_cached_food_web
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_TICK_RATE = 10  # ticks per second
+
+# A value is only sent again once it moved by more than this fraction of itself (or of 1, near 0)
+DEFAULT_DELTA_TOLERANCE = 1e-4
+# At most this many values per array go in one delta; the ones that moved the most go first
+DEFAULT_MAX_DELTA_VALUES = 256
+# Subscribers with more than this many bytes still unsent are skipped and resynced with a snapshot
+MAX_CLIENT_BUFFER = 1 << 20
+MAX_REQUEST_HEADER = 1 << 14
+MAX_ACTION_BYTES = 1 << 12
+# Browser pages allowed to connect: the v4 Vite dev server. Requests from any other page are
+# refused, so a site open in the same browser cannot send actions to the local server.
+ALLOWED_ORIGINS = ('http://localhost:5173', 'http://127.0.0.1:5173')
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+TEXT_FRAME, CLOSE_FRAME, PING_FRAME, PONG_FRAME = 0x1, 0x8, 0x9, 0xA
+
+# Click actions the front end can send, with the fields each one needs
+ACTIONS = {
+    'add_resource': ['resource', 'amount'],
+    'add_population': ['species', 'amount'],
+}
+
+
+def create_tick_session(compiled_web, tick_rate=DEFAULT_TICK_RATE, delta_tolerance=DEFAULT_DELTA_TOLERANCE,
+                        max_delta_values=DEFAULT_MAX_DELTA_VALUES):
+    """
+    Creates a live simulation that a tick server advances and streams to its subscribers.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web.
+    - tick_rate: Simulation steps per second.
+    - delta_tolerance: Relative change below which a value is not resent (see DEFAULT_DELTA_TOLERANCE).
+    - max_delta_values: Cap on the values per array in one delta, which bounds per-tick bandwidth
+      however large the web is. Values left out keep their old sent value and go out on later ticks.
+
+    Returns:
+    - A session dictionary: the engine 'state', the 'pending_actions' to apply before the next step,
+      the 'sent_populations' / 'sent_resources' values subscribers currently hold, the
+      'subscribers' (connection writer -> per-subscriber flags) and per-tick timing 'statistics'.
+    """
+    state = initial_state(compiled_web)
+    return {
+        'compiled_web': compiled_web,
+        'species_index': {name: i for i, name in enumerate(compiled_web['species_names'])},
+        'resource_index': {name: j for j, name in enumerate(compiled_web['resource_names'])},
+        'tick_rate': tick_rate,
+        'delta_tolerance': delta_tolerance,
+        'max_delta_values': max_delta_values,
+        'state': state,
+        'pending_actions': deque(),
+        'sent_populations': state['populations'].copy(),
+        'sent_resources': state['resources'].copy(),
+        'subscribers': {},
+        'statistics': {'ticks': 0, 'tick_seconds': 0.0, 'max_tick_seconds': 0.0, 'late_ticks': 0,
+                       'messages_sent': 0, 'bytes_sent': 0},
+    }
+
+
+def parse_action(action, species_index, resource_index):
+    """
+    Validates a click action and turns it into the array update it stands for.
+
+    Parameters:
+    - action: Dictionary such as {'type': 'add_resource', 'resource': 'CO2', 'amount': 1}
+      or {'type': 'add_population', 'species': 'Algae', 'amount': 5}. {'type': 'add_co2'} is
+      shorthand for adding 1 unit of CO2, like the v4 button.
+    - species_index / resource_index: Dictionaries mapping names to array columns.
+
+    Returns:
+    - Tuple of ('populations' or 'resources', column, amount), amount a float.
+
+    Raises:
+    - ValueError if the action is unknown or malformed.
+    """
+    if not isinstance(action, dict):
+        raise ValueError("an action must be a JSON object")
+    if action.get('type') == 'add_co2':
+        action = {'type': 'add_resource', 'resource': 'CO2', 'amount': action.get('amount', 1)}
+    action_type = action.get('type')
+    if not isinstance(action_type, str) or action_type not in ACTIONS:
+        raise ValueError(f"unknown action type {action_type!r}; expected one of {sorted(ACTIONS)} or 'add_co2'")
+    missing = [field for field in ACTIONS[action_type] if field not in action]
+    if missing:
+        raise ValueError(f"{action_type} needs {', '.join(missing)}")
+
+    amount = action['amount']
+    if isinstance(amount, bool) or not isinstance(amount, (int, float)):
+        raise ValueError(f"amount should be a finite number, got {amount!r}")
+    try:
+        amount = float(amount)
+    except OverflowError:
+        raise ValueError("amount is too large") from None
+    if not np.isfinite(amount):
+        raise ValueError(f"amount should be a finite number, got {amount!r}")
+
+    if action_type == 'add_resource':
+        resource = action['resource']
+        if not isinstance(resource, str) or resource not in resource_index:
+            raise ValueError(f"unknown resource {resource!r}")
+        return 'resources', resource_index[resource], amount
+    species = action['species']
+    if not isinstance(species, str) or species not in species_index:
+        raise ValueError(f"unknown species {species!r}")
+    return 'populations', species_index[species], amount
+
+
+def queue_action(session, action):
+    """
+    Validates a click action (see parse_action) and queues it; it takes effect just before the next step.
+
+    Parameters:
+    - session: Session dictionary from create_tick_session.
+    - action: Action dictionary.
+
+    Raises:
+    - ValueError if the action is unknown or malformed.
+    """
+    session['pending_actions'].append(parse_action(action, session['species_index'], session['resource_index']))
+
+
+def apply_action(values, index, amount):
+    """
+    Applies one parsed action (see parse_action) to an array in place: the amount is added and the
+    result floored at 0. Actions are applied one at a time in the order they came in, so removing
+    more than is there and then adding leaves exactly the added amount, in single and batched
+    sessions alike.
+
+    Parameters:
+    - values: Array to update, e.g. a session's populations.
+    - index: Position in values (a column, or a (row, column) tuple for batches).
+    - amount: Amount to add.
+    """
+    values[index] = max(values[index] + amount, 0)
+
+
+def apply_pending_actions(session):
+    """
+    Applies every queued action to the session state (see apply_action).
+    """
+    if not session['pending_actions']:
+        return
+    state = session['state']
+    updated = {'populations': state['populations'].copy(), 'resources': state['resources'].copy()}
+    while session['pending_actions']:
+        key, index, amount = session['pending_actions'].popleft()
+        apply_action(updated[key], index, amount)
+    session['state'] = {**state, **updated}
+
+
+def changed_values(current, sent, tolerance, max_values):
+    """
+    Finds the values that moved by more than the tolerance since they were last sent, and marks
+    them as sent.
+
+    Parameters:
+    - current: Current values.
+    - sent: Values the subscribers hold, updated in place.
+    - tolerance: Relative tolerance.
+    - max_values: Most values to return; the ones with the largest relative change are kept.
+
+    Returns:
+    - A list of [index, value] pairs, value None for inf / nan (which JSON cannot carry).
+    """
+    with np.errstate(invalid='ignore'):
+        relative_change = np.abs(current - sent) / np.maximum(np.abs(sent), 1)
+    relative_change[np.isfinite(current) != np.isfinite(sent)] = np.inf
+    indices = np.flatnonzero(relative_change > tolerance)
+    if len(indices) > max_values:
+        indices = np.sort(indices[np.argpartition(-relative_change[indices], max_values)[:max_values]])
+    sent[indices] = current[indices]
+    return [[int(i), float(v) if np.isfinite(v) else None] for i, v in zip(indices, current[indices])]
+
+
+def advance_tick(session):
+    """
+    Applies queued actions, steps the simulation once and builds the delta for subscribers.
+
+    Parameters:
+    - session: Session dictionary from create_tick_session.
+
+    Returns:
+    - A delta message {'type': 'delta', 'tick', 'populations', 'resources'} listing [index, value]
+      for the values that changed, or None if nothing changed noticeably. A delta holds at most
+      max_delta_values values per array, so its size does not grow with the web.
+    """
+    apply_pending_actions(session)
+    session['state'] = step(session['compiled_web'], session['state'])
+    state = session['state']
+
+    populations = changed_values(state['populations'], session['sent_populations'], session['delta_tolerance'],
+                                 session['max_delta_values'])
+    resources = changed_values(state['resources'], session['sent_resources'], session['delta_tolerance'],
+                               session['max_delta_values'])
+    if not populations and not resources:
+        return None
+    return {'type': 'delta', 'tick': state['step'], 'populations': populations, 'resources': resources}
+
+
+def snapshot_message(session):
+    """
+    Builds the full-state message a subscriber receives first (and after falling behind).
+
+    The values are the ones deltas are computed against, so snapshot + later deltas always add up.
+    """
+    def json_values(values):
+        return [float(v) if np.isfinite(v) else None for v in values]
+
+    return {
+        'type': 'snapshot',
+        'tick': session['state']['step'],
+        'tick_rate': session['tick_rate'],
+        'species_names': session['compiled_web']['species_names'],
+        'resource_names': session['compiled_web']['resource_names'],
+        'populations': json_values(session['sent_populations']),
+        'resources': json_values(session['sent_resources']),
+    }
+
+
+def encode_message(message):
+    """
+    Encodes a message as compact JSON bytes.
+    """
+    return json.dumps(message, separators=(',', ':')).encode()
+
+
+def websocket_frame(payload, opcode=TEXT_FRAME):
+    """
+    Wraps a payload in a single unmasked WebSocket frame (server to client, RFC 6455).
+    """
+    length = len(payload)
+    if length < 126:
+        header = bytes([0x80 | opcode, length])
+    elif length < 1 << 16:
+        header = bytes([0x80 | opcode, 126]) + length.to_bytes(2, 'big')
+    else:
+        header = bytes([0x80 | opcode, 127]) + length.to_bytes(8, 'big')
+    return header + payload
+
+
+async def read_websocket_frame(reader):
+    """
+    Reads one client frame.
+
+    Parameters:
+    - reader: asyncio.StreamReader of the connection.
+
+    Returns:
+    - Tuple of (opcode, payload bytes).
+
+    Raises:
+    - ValueError for fragmented, unmasked or oversized frames, which this server does not accept.
+    """
+    first, second = await reader.readexactly(2)
+    opcode, length = first & 0x0F, second & 0x7F
+    if not first & 0x80 or not second & 0x80:
+        raise ValueError("fragmented or unmasked client frame")
+    if length == 126:
+        length = int.from_bytes(await reader.readexactly(2), 'big')
+    elif length == 127:
+        length = int.from_bytes(await reader.readexactly(8), 'big')
+    if length > MAX_ACTION_BYTES:
+        raise ValueError("client frame too large")
+    mask = await reader.readexactly(4)
+    payload = await reader.readexactly(length)
+    return opcode, bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+
+
+def send_to_subscribers(session, message):
+    """
+    Encodes a message once and queues it on every subscriber's connection.
+
+    A subscriber whose connection has more than MAX_CLIENT_BUFFER bytes still unsent is skipped and
+    flagged to get a fresh snapshot instead once it catches up, so one slow client neither grows
+    the server's memory nor receives an ever-growing backlog.
+    """
+    frame = websocket_frame(encode_message(message))
+    snapshot_frame = None
+    for writer, subscriber in list(session['subscribers'].items()):
+        if writer.is_closing():
+            del session['subscribers'][writer]
+            continue
+        if writer.transport.get_write_buffer_size() > MAX_CLIENT_BUFFER:
+            subscriber['needs_snapshot'] = True
+            continue
+        if subscriber['needs_snapshot']:
+            if snapshot_frame is None:
+                snapshot_frame = websocket_frame(encode_message(snapshot_message(session)))
+            writer.write(snapshot_frame)
+            subscriber['needs_snapshot'] = False
+            session['statistics']['bytes_sent'] += len(snapshot_frame)
+        else:
+            writer.write(frame)
+            session['statistics']['bytes_sent'] += len(frame)
+        session['statistics']['messages_sent'] += 1
+
+
+async def run_tick_loop(session):
+    """
+    Advances the session at its tick rate forever, pushing deltas to subscribers.
+
+    Ticks are scheduled on a fixed clock; if a step overruns, the missed ticks are skipped (and
+    counted in 'late_ticks') rather than run back to back.
+    """
+    loop = asyncio.get_running_loop()
+    interval = 1 / session['tick_rate']
+    next_tick = loop.time()
+    statistics = session['statistics']
+    while True:
+        start = time.perf_counter()
+        message = advance_tick(session)
+        if message is not None:
+            # the snapshot sent to a client resyncing this tick already includes the delta
+            send_to_subscribers(session, message)
+        elapsed = time.perf_counter() - start
+        statistics['ticks'] += 1
+        statistics['tick_seconds'] += elapsed
+        statistics['max_tick_seconds'] = max(statistics['max_tick_seconds'], elapsed)
+
+        next_tick += interval
+        delay = next_tick - loop.time()
+        if delay < 0:
+            skipped = int(-delay // interval) + 1
+            statistics['late_ticks'] += skipped
+            next_tick += skipped * interval
+            delay = next_tick - loop.time()
+        await asyncio.sleep(delay)
+
+
+def http_response(status, body=b'', content_type='application/json', origin=None):
+    """
+    Builds an HTTP/1.1 response that closes the connection. An allowed origin (the Vite dev
+    server, on another port) is echoed in the CORS headers so it can call the server.
+    """
+    cors = (f"Access-Control-Allow-Origin: {origin}\r\n"
+            "Vary: Origin\r\n"
+            "Access-Control-Allow-Methods: GET, POST, OPTIONS\r\n"
+            "Access-Control-Allow-Headers: Content-Type\r\n") if origin else ""
+    return (f"HTTP/1.1 {status}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"{cors}"
+            "Connection: close\r\n\r\n").encode() + body
+
+
+async def serve_websocket(session, reader, writer, headers):
+    """
+    Completes the WebSocket handshake, sends a snapshot and then relays client actions until the
+    connection closes. Deltas are written by the tick loop.
+    """
+    accept = base64.b64encode(hashlib.sha1((headers['sec-websocket-key'] + WEBSOCKET_GUID).encode()).digest())
+    writer.write(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                 b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+    writer.write(websocket_frame(encode_message(snapshot_message(session))))
+    session['subscribers'][writer] = {'needs_snapshot': False}
+    try:
+        while True:
+            opcode, payload = await read_websocket_frame(reader)
+            if opcode == CLOSE_FRAME:
+                writer.write(websocket_frame(payload[:2], CLOSE_FRAME))
+                break
+            if opcode == PING_FRAME:
+                writer.write(websocket_frame(payload, PONG_FRAME))
+            elif opcode == TEXT_FRAME:
+                try:
+                    queue_action(session, json.loads(payload))
+                except (TypeError, ValueError) as error:
+                    writer.write(websocket_frame(encode_message({'type': 'error', 'message': str(error)})))
+    except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+        pass
+    finally:
+        session['subscribers'].pop(writer, None)
+
+
+async def handle_connection(session, reader, writer, allowed_origins=ALLOWED_ORIGINS):
+    """
+    Serves one connection:
+    - GET /ws: WebSocket stream of a snapshot then per-tick deltas; JSON actions can be sent back.
+    - GET /state: the current snapshot as JSON.
+    - GET /stats: tick timing and bandwidth statistics.
+    - POST /action: queue one JSON action (see queue_action).
+    Requests sent by a browser page outside allowed_origins get 403 Forbidden. Requests without an
+    Origin header (curl, scripts) are served.
+    """
+    try:
+        request = await reader.readuntil(b'\r\n\r\n')
+        if len(request) > MAX_REQUEST_HEADER:
+            raise ValueError("request header too large")
+        request_line, *header_lines = request.decode('latin-1').split('\r\n')
+        method, path = request_line.split(' ')[:2]
+        headers = {}
+        for line in header_lines:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        origin = headers.get('origin')
+
+        if origin is not None and origin not in allowed_origins:
+            writer.write(http_response('403 Forbidden', encode_message({'error': f"origin {origin!r} not allowed"})))
+        elif path == '/ws' and headers.get('upgrade', '').lower() == 'websocket' and 'sec-websocket-key' in headers:
+            await serve_websocket(session, reader, writer, headers)
+        elif method == 'OPTIONS':
+            writer.write(http_response('204 No Content', origin=origin))
+        elif method == 'GET' and path == '/state':
+            writer.write(http_response('200 OK', encode_message(snapshot_message(session)), origin=origin))
+        elif method == 'GET' and path == '/stats':
+            writer.write(http_response('200 OK', encode_message(session['statistics']), origin=origin))
+        elif method == 'POST' and path == '/action':
+            length = int(headers.get('content-length', 0))
+            if length > MAX_ACTION_BYTES:
+                raise ValueError("action too large")
+            try:
+                queue_action(session, json.loads(await reader.readexactly(length)))
+                writer.write(http_response('202 Accepted', b'{}', origin=origin))
+            except (TypeError, ValueError) as error:
+                writer.write(http_response('400 Bad Request', encode_message({'error': str(error)}), origin=origin))
+        else:
+            writer.write(http_response('404 Not Found', b'{}', origin=origin))
+        await writer.drain()
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(compiled_web, host=DEFAULT_HOST, port=DEFAULT_PORT, tick_rate=DEFAULT_TICK_RATE,
+                allowed_origins=ALLOWED_ORIGINS):
+    """
+    Runs the tick server until cancelled.
+
+    Parameters:
+    - compiled_web: Output of compile_food_web (or config_cache.load_cached_food_web).
+    - host / port: Address to listen on. Keep the default localhost unless the front end runs elsewhere.
+    - tick_rate: Simulation steps per second.
+    - allowed_origins: Browser origins allowed to connect (see ALLOWED_ORIGINS).
+    """
+    session = create_tick_session(compiled_web, tick_rate)
+    server = await asyncio.start_server(
+        lambda reader, writer: handle_connection(session, reader, writer, allowed_origins),
+        host, port, limit=MAX_REQUEST_HEADER)
+    print(f"Serving {len(compiled_web['species_names'])} species on http://{host}:{port} "
+          f"(WebSocket at /ws), {tick_rate} ticks/s")
+    async with server:
+        await asyncio.gather(server.serve_forever(), run_tick_loop(session))
+
+
+## TEST STATEMENTS WHEN I CALL THIS SCRIPT FROM COMMAND LINE
+if __name__ == '__main__':
+    asyncio.run(serve(load_cached_food_web('food_web.json')))
@@ -0,0 +1,70 @@
+import { createSlice, PayloadAction } from '@reduxjs/toolkit';
+
+// Values are null when the server sends inf / nan
+type Value = number | null;
+
+export interface SnapshotMessage {
+  type: 'snapshot';
+  tick: number;
+  tick_rate: number;
+  species_names: string[];
+  resource_names: string[];
+  populations: Value[];
+  resources: Value[];
+}
+
+export interface DeltaMessage {
+  type: 'delta';
+  tick: number;
+  populations: [number, Value][];
+  resources: [number, Value][];
+}
+
+interface EcosystemState {
+  connected: boolean;
+  tick: number;
+  speciesNames: string[];
+  resourceNames: string[];
+  populations: Value[];
+  resources: Value[];
+}
+
+const initialState: EcosystemState = {
+  connected: false,
+  tick: 0,
+  speciesNames: [],
+  resourceNames: [],
+  populations: [],
+  resources: [],
+};
+
+// Mirrors the simulation owned by v3/tick_server.py
+export const ecosystemSlice = createSlice({
+  name: 'ecosystem',
+  initialState,
+  reducers: {
+    connectionChanged: (state, action: PayloadAction<boolean>) => {
+      state.connected = action.payload;
+    },
+    snapshotReceived: (state, action: PayloadAction<SnapshotMessage>) => {
+      state.tick = action.payload.tick;
+      state.speciesNames = action.payload.species_names;
+      state.resourceNames = action.payload.resource_names;
+      state.populations = action.payload.populations;
+      state.resources = action.payload.resources;
+    },
+    deltaReceived: (state, action: PayloadAction<DeltaMessage>) => {
+      state.tick = action.payload.tick;
+      for (const [index, value] of action.payload.populations) {
+        state.populations[index] = value;
+      }
+      for (const [index, value] of action.payload.resources) {
+        state.resources[index] = value;
+      }
+    },
+  },
+});
+
+export const { connectionChanged, snapshotReceived, deltaReceived } = ecosystemSlice.actions;
+
+export default ecosystemSlice.reducer;
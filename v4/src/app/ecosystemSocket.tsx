@@ -0,0 +1,34 @@
+import { connectionChanged, deltaReceived, snapshotReceived } from './ecosystemSlice';
+import { store } from './store';
+
+// Address of v3/tick_server.py
+const SERVER_URL = 'ws://127.0.0.1:8765/ws';
+const RECONNECT_DELAY_MS = 2000;
+
+let socket: WebSocket | null = null;
+
+export const connectToEcosystem = () => {
+  socket = new WebSocket(SERVER_URL);
+  socket.onopen = () => store.dispatch(connectionChanged(true));
+  socket.onmessage = event => {
+    const message = JSON.parse(event.data);
+    if (message.type === 'snapshot') {
+      store.dispatch(snapshotReceived(message));
+    } else if (message.type === 'delta') {
+      store.dispatch(deltaReceived(message));
+    } else if (message.type === 'error') {
+      console.warn('Ecosystem server rejected an action:', message.message);
+    }
+  };
+  socket.onclose = () => {
+    store.dispatch(connectionChanged(false));
+    setTimeout(connectToEcosystem, RECONNECT_DELAY_MS);
+  };
+};
+
+// Queues a click action on the server; it is applied before the next tick
+export const sendEcosystemAction = (action: object) => {
+  if (socket && socket.readyState === WebSocket.OPEN) {
+    socket.send(JSON.stringify(action));
+  }
+};
@@ -1,9 +1,11 @@
 // src/app/store.js
 import { configureStore } from '@reduxjs/toolkit';
 import co2Reducer from './co2slice';
+import ecosystemReducer from './ecosystemSlice';
 
 export const store = configureStore({
   reducer: {
     co2: co2Reducer,
+    ecosystem: ecosystemReducer,
   },
 });
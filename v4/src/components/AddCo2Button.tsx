@@ -1,11 +1,15 @@
 import { useDispatch } from 'react-redux';
 import { addCo2 } from '../app/co2slice.tsx';
+import { sendEcosystemAction } from '../app/ecosystemSocket.tsx';
 
 const AddCo2Button = () => {
   const dispatch = useDispatch();
 
   return (
-    <button onClick={() => dispatch(addCo2())}>Add CO2</button>
+    <button onClick={() => {
+      dispatch(addCo2());
+      sendEcosystemAction({ type: 'add_co2' });
+    }}>Add CO2</button>
   );
 };
 
@@ -4,6 +4,9 @@ import App from './App.tsx'
 import './index.css'
 import { Provider } from 'react-redux';
 import { store } from './app/store';
+import { connectToEcosystem } from './app/ecosystemSocket';
+
+connectToEcosystem();
 
 ReactDOM.createRoot(document.getElementById('root')!).render(
   <React.StrictMode>